@@ -1,18 +1,30 @@
 import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import sys
 import os
+import math
 import time
 
 # Agregar el directorio src al path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
-from data_processor import ERPDataProcessor
-from analyzer import StockAnalyzer
+from data_processor import ERPDataProcessor, NO_CONSUMPTION_DAYS
+from analyzer import StockAnalyzer, data_fingerprint
 from utils import ExcelExporter, AlertManager, format_number, format_currency
+from result_cache import ParseCache, file_digest, read_file_bytes
+from snapshot_store import DEFAULT_SITE, SnapshotStore
+from history_store import HistoryStore
+from export_cache import ExportCache, csv_bytes
+from report_jobs import ReportJobManager, DONE, FAILED, CANCELLED
+import parallel_parse
+
+# Opciones de filas por página de las tablas de productos
+PAGE_SIZES = [25, 50, 100, 250]
 
 # Configuración de la página
 st.set_page_config(
@@ -259,6 +271,52 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_parse_cache() -> ParseCache:
+    """Caché de archivos parseados compartida por todas las sesiones"""
+    return ParseCache()
+
+@st.cache_resource
+def get_parse_pool():
+    """Pool de procesos para parsear ambos archivos en paralelo (None si está desactivado); se recrea si un proceso muere"""
+    return parallel_parse.create_pool() if parallel_parse.parallel_enabled() else None
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    """Snapshots Parquet de los análisis (por sitio y período)"""
+    return SnapshotStore()
+
+@st.cache_resource
+def get_history_store() -> HistoryStore:
+    """Historial diario de análisis por sitio (SQLite)"""
+    return HistoryStore()
+
+@st.cache_resource
+def get_export_cache() -> ExportCache:
+    """Exportaciones CSV/Excel generadas, por huella de los datos"""
+    return ExportCache()
+
+def report_session_alive(session_id: str) -> bool:
+    """La sesión de Streamlit sigue abierta (sin runtime, como en AppTest, se asume abierta)"""
+    return not runtime.exists() or runtime.get_instance().is_active_session(session_id)
+
+@st.cache_resource
+def get_report_jobs() -> ReportJobManager:
+    """Reportes Excel en generación (hilos compartidos por todas las sesiones)"""
+    return ReportJobManager(session_alive=report_session_alive)
+
+def follow_report_job(job_id):
+    """Cambia el reporte que sigue esta sesión; el anterior deja de contarla"""
+    previous = st.session_state.get('report_job_id')
+    if previous is not None and previous != job_id:
+        get_report_jobs().release(previous, get_script_run_ctx().session_id)
+    st.session_state.report_job_id = job_id
+
+@st.cache_resource(max_entries=16)
+def get_analyzer(fingerprint: str, _data: pd.DataFrame) -> StockAnalyzer:
+    """Analizador (con KPIs y gráficos memoizados) por huella de los datos"""
+    return StockAnalyzer(_data)
+
 def main():
     # Inicializar session state
     if 'step' not in st.session_state:
@@ -352,9 +410,43 @@ def show_welcome_screen():
         # Botón de inicio
         st.markdown("<br>", unsafe_allow_html=True)
         
+        # Sin key: el estado de un widget se descarta en los pasos donde no se muestra
+        st.session_state.site = st.text_input(
+            "🏢 Sitio", value=st.session_state.get('site', DEFAULT_SITE),
+            help="Los análisis se guardan por sitio y período para reabrirlos sin subir los archivos"
+        )
+        
         if st.button("🚀 Comenzar Análisis", key="start_analysis"):
             st.session_state.step = 1
             st.rerun()
+        
+        show_saved_analyses()
+
+def show_saved_analyses():
+    """Reabrir un análisis guardado desde su snapshot Parquet"""
+    snapshots = get_snapshot_store().list_snapshots()
+    if snapshots.empty:
+        return
+    
+    with st.expander(f"📂 Reabrir análisis guardado ({len(snapshots)})"):
+        labels = [f"{row.sitio} · {row.inicio} al {row.fin} · {row.productos} productos"
+                  for row in snapshots.itertuples()]
+        choice = st.selectbox("Análisis", range(len(labels)), format_func=labels.__getitem__,
+                              key="snapshot_choice")
+        if st.button("📂 Abrir", key="open_snapshot"):
+            try:
+                processor = get_snapshot_store().load_path(snapshots['ruta'].iloc[choice])
+            except Exception as e:
+                st.error(f"No se pudo abrir el análisis: {str(e)}")
+                return
+            st.session_state.analysis_data = processor.consolidated_data
+            st.session_state.analysis_fingerprint = data_fingerprint(processor.consolidated_data)
+            st.session_state.processor = processor
+            st.session_state.site = snapshots['sitio'].iloc[choice]
+            st.session_state.parse_timings = None
+            st.session_state.analysis_complete = True
+            st.session_state.step = 4
+            st.rerun()
 
 def show_upload_curva_abc():
     """Paso 1: Upload de archivo Curva ABC"""
@@ -508,18 +600,41 @@ def show_processing():
         
         # Procesamiento real
         try:
-            processor = ERPDataProcessor()
+            sources = {'curva_abc': st.session_state.curva_abc_file, 'stock': st.session_state.stock_file}
+            processor = st.session_state.get('processor')
+            if (processor is not None and processor.consolidated_data is not None and
+                    processor.source_digests.get('curva_abc') ==
+                    file_digest(read_file_bytes(sources['curva_abc']))):
+                # Misma Curva ABC: solo se procesa el stock y el análisis
+                # recalcula únicamente los productos cuyo stock cambió
+                sources = {'stock': sources['stock']}
+            else:
+                processor = ERPDataProcessor()
             
-            # Procesar archivos
-            curva_abc_data = processor.process_curva_abc(st.session_state.curva_abc_file)
-            stock_data = processor.process_stock(st.session_state.stock_file)
+            # Procesar ambos archivos en paralelo (se reutiliza el parseo si ya se subieron)
+            st.session_state.parse_timings = parallel_parse.process_files(
+                processor,
+                sources,
+                cache=get_parse_cache(),
+                pool=get_parse_pool()
+            )
             analysis_data = processor.calculate_coverage_analysis(processor.analysis_days)  # Usar días detectados automáticamente
             
             # Guardar en session state
             st.session_state.analysis_data = analysis_data
+            st.session_state.analysis_fingerprint = data_fingerprint(analysis_data)
             st.session_state.processor = processor
             st.session_state.analysis_complete = True
             
+            # Snapshot para reabrir el análisis sin parsear e historial diario
+            # del sitio (un error no detiene el análisis)
+            site = st.session_state.get('site') or DEFAULT_SITE
+            try:
+                get_snapshot_store().save(site, processor)
+                get_history_store().append(site, analysis_data)
+            except Exception as e:
+                st.warning(f"⚠️ No se pudo guardar el análisis: {str(e)}")
+            
             progress_text.text("🎉 ¡Análisis completado exitosamente!")
             progress_bar.progress(1.0)
             
@@ -577,7 +692,9 @@ def show_results():
         return
     
     data = st.session_state.analysis_data
-    analyzer = StockAnalyzer(data)
+    if 'analysis_fingerprint' not in st.session_state:
+        st.session_state.analysis_fingerprint = data_fingerprint(data)
+    analyzer = get_analyzer(st.session_state.analysis_fingerprint, data)
     
     # Header de resultados
     st.markdown("""
@@ -586,9 +703,16 @@ def show_results():
         <p style="color: #7f8c8d; font-size: 1.2rem;">Dashboard ejecutivo generado automáticamente</p>
     </div>
     """, unsafe_allow_html=True)
-    
+
+    # Tiempos de parseo por archivo
+    timings = st.session_state.get('parse_timings')
+    if timings:
+        curva_abc = f"{timings['curva_abc']:.1f} s" if 'curva_abc' in timings else "reutilizada"
+        st.caption(f"⏱️ Curva ABC: {curva_abc} · Stock: {timings['stock']:.1f} s · "
+                   f"Total: {timings['total']:.1f} s")
+
     # Alertas críticas
-    alerts = AlertManager.check_critical_alerts(data)
+    alerts = AlertManager.check_critical_alerts(data, analyzer)
     if alerts:
         for alert in alerts:
             if alert['type'] == 'error':
@@ -607,29 +731,36 @@ def show_results():
     # KPIs principales
     show_main_kpis(analyzer)
     
-    # Tabs con análisis detallado
+    # Tabs con análisis detallado. Solo se ejecuta el tab seleccionado (cambiar
+    # de tab hace un rerun); los gráficos y agregados quedan memoizados en el
+    # analizador, así que volver a un tab no los recalcula
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "📊 Dashboard Principal", 
         "🎯 Análisis por Curva ABC", 
         "🍽️ Análisis por Servicios",
         "📈 Análisis Avanzado",
         "📤 Exportar Reportes"
-    ])
+    ], key="results_tab", on_change="rerun")
     
-    with tab1:
-        show_dashboard_tab(analyzer)
+    if tab1.open:
+        with tab1:
+            show_lazy_tab(show_dashboard_tab, analyzer)
     
-    with tab2:
-        show_curva_abc_tab(analyzer)
+    if tab2.open:
+        with tab2:
+            show_lazy_tab(show_curva_abc_tab, analyzer)
     
-    with tab3:
-        show_services_analysis_tab(analyzer)
+    if tab3.open:
+        with tab3:
+            show_lazy_tab(show_services_analysis_tab, analyzer)
     
-    with tab4:
-        show_advanced_analysis_tab(analyzer)
+    if tab4.open:
+        with tab4:
+            show_lazy_tab(show_advanced_analysis_tab, analyzer)
     
-    with tab5:
-        show_export_tab(analyzer, data)
+    if tab5.open:
+        with tab5:
+            show_lazy_tab(show_export_tab, analyzer, data)
     
     # Botón para nuevo análisis
     st.markdown("<br><br>", unsafe_allow_html=True)
@@ -638,6 +769,7 @@ def show_results():
     with col2:
         if st.button("🔄 Realizar Nuevo Análisis", key="new_analysis"):
             # Reset session state
+            follow_report_job(None)
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
@@ -654,6 +786,48 @@ def show_results():
     </div>
     """, unsafe_allow_html=True)
 
+@st.fragment
+def show_lazy_tab(render, *args):
+    """
+    Cuerpo del tab abierto como fragmento: sus filtros y botones re-ejecutan
+    solo el tab, sin recalcular alertas ni KPIs
+    """
+    render(*args)
+
+def show_paged_table(analyzer, rows, columns, column_config, key):
+    """
+    Tabla paginada del lado del servidor: rows son las posiciones ya
+    filtradas y ordenadas (analyzer.product_rows) y al navegador solo se
+    envía la página visible
+    """
+    col1, col2, col3 = st.columns([1, 1, 2])
+    
+    with col1:
+        page_size = st.selectbox("Filas por página:", options=PAGE_SIZES, index=1, key=f"{key}_page_size")
+    
+    pages = max(1, math.ceil(len(rows) / page_size))
+    page_key = f"{key}_page"
+    # Un filtro más estricto puede dejar la página actual fuera de rango
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    
+    with col2:
+        page = st.number_input("Página:", min_value=1, max_value=pages, step=1, key=page_key)
+    
+    start = (page - 1) * page_size
+    end = min(start + page_size, len(rows))
+    
+    with col3:
+        st.markdown(f"<br>Filas {start + 1}–{end} de {len(rows)} · página {page} de {pages}",
+                    unsafe_allow_html=True)
+    
+    st.dataframe(
+        analyzer.data.iloc[rows[start:end]][columns],
+        width='stretch',
+        hide_index=True,
+        column_config=column_config
+    )
+
 def show_progress_bar(current_step, total_steps):
     """Muestra barra de progreso del flujo"""
     progress_percentage = (current_step / total_steps) * 100
@@ -734,8 +908,8 @@ def show_main_kpis(analyzer):
     
     with col3:
         # Calcular cobertura promedio SOLO para productos con consumo
-        data_with_consumption = data[data['consumo_diario'] > 0]
-        avg_coverage = data_with_consumption['dias_cobertura'].mean() if len(data_with_consumption) > 0 else 0
+        with_consumption = analyzer.rows(consumo='con')
+        avg_coverage = data['dias_cobertura'].iloc[with_consumption].mean() if len(with_consumption) > 0 else 0
         coverage_icon = "📈" if avg_coverage > 15 else "📊" if avg_coverage > 7 else "📉"
         
         st.markdown(f"""
@@ -751,7 +925,7 @@ def show_main_kpis(analyzer):
     
     with col4:
         # Valor total en riesgo (productos críticos)
-        critical_products = data[data['estado_stock'] == 'CRÍTICO']
+        critical_products = analyzer.get_products_by_status('CRÍTICO')
         risk_value = (critical_products['stock'] * critical_products.get('precio', 0)).sum()
         
         st.markdown(f"""
@@ -776,18 +950,18 @@ def show_main_kpis(analyzer):
     
     # Insights inteligentes
     st.markdown("<br>", unsafe_allow_html=True)
-    show_intelligent_insights(data, metrics)
+    show_intelligent_insights(analyzer, metrics)
 
-def show_intelligent_insights(data, metrics):
+def show_intelligent_insights(analyzer, metrics):
     """Muestra insights inteligentes basados en los datos"""
     
     # Análisis automático
     critical_pct = (metrics['productos_criticos'] / metrics['total_productos'] * 100) if metrics['total_productos'] > 0 else 0
-    avg_coverage = data['dias_cobertura'].mean()
+    avg_coverage = analyzer.data['dias_cobertura'].mean()
     
     # Productos más críticos por curva
-    curva_a_critical = len(data[(data['curva'] == 'A') & (data['estado_stock'] == 'CRÍTICO')])
-    curva_b_critical = len(data[(data['curva'] == 'B') & (data['estado_stock'] == 'CRÍTICO')])
+    curva_a_critical = analyzer.count(curva='A', estado_stock='CRÍTICO')
+    curva_b_critical = analyzer.count(curva='B', estado_stock='CRÍTICO')
     
     st.markdown("### 🧠 Insights Inteligentes")
     
@@ -843,7 +1017,7 @@ def show_intelligent_insights(data, metrics):
         """, unsafe_allow_html=True)
         
         # Top 3 productos más críticos
-        top_critical = data[data['estado_stock'] == 'CRÍTICO'].nsmallest(3, 'dias_cobertura')
+        top_critical = analyzer.take(analyzer.most_critical(3))
         if len(top_critical) > 0:
             st.markdown("**🔥 Más Urgentes:**")
             for _, product in top_critical.iterrows():
@@ -910,9 +1084,8 @@ def show_curva_abc_tab(analyzer):
     col1, col2, col3 = st.columns(3)
     
     for i, curva in enumerate(['A', 'B', 'C']):
-        curva_data = data[data['curva'] == curva] if curva in available_curvas else pd.DataFrame()
-        total_products = len(curva_data)
-        critical_count = len(curva_data[curva_data['estado_stock'] == 'CRÍTICO']) if len(curva_data) > 0 else 0
+        total_products = analyzer.count(curva=curva)
+        critical_count = analyzer.count(curva=curva, estado_stock='CRÍTICO')
         
         with [col1, col2, col3][i]:
             color = ['#FF6B6B', '#4ECDC4', '#45B7D1'][i]
@@ -974,8 +1147,8 @@ def show_services_analysis_tab(analyzer):
         period_days = 8
     
     # Calcular estadísticas para mostrar
-    productos_con_consumo = len(data[data['consumo_diario'] > 0])
-    productos_sin_consumo = len(data[data['consumo_diario'] == 0])
+    productos_con_consumo = analyzer.count(consumo='con')
+    productos_sin_consumo = analyzer.count(consumo='sin')
     
     st.markdown(f"""
     <div style="background: #e8f5e8; padding: 1.5rem; border-radius: 8px; border-left: 4px solid #28a745; margin-bottom: 2rem;">
@@ -1049,7 +1222,7 @@ def show_services_analysis_tab(analyzer):
     )
     
     # Análisis del servicio seleccionado
-    service_data = data[data['servicio'] == selected_service]
+    service_data = analyzer.take(analyzer.rows(servicio=selected_service))
     
     if len(service_data) == 0:
         st.warning(f"No hay datos para el servicio {selected_service}")
@@ -1059,7 +1232,7 @@ def show_services_analysis_tab(analyzer):
     col1, col2, col3, col4 = st.columns(4)
     
     total_products = len(service_data)
-    critical_count = len(service_data[service_data['estado_stock'] == 'CRÍTICO'])
+    critical_count = analyzer.count(servicio=selected_service, estado_stock='CRÍTICO')
     avg_consumption = service_data['consumo_diario'].mean()
     total_consumption = service_data['consumo_diario'].sum()
     
@@ -1079,6 +1252,7 @@ def show_services_analysis_tab(analyzer):
     st.markdown("#### 📊 Distribución por Curva ABC en este Servicio")
     
     curva_dist = service_data['curva'].value_counts()
+    curva_dist = curva_dist[curva_dist > 0]
     
     col1, col2 = st.columns(2)
     
@@ -1128,11 +1302,8 @@ def show_services_analysis_tab(analyzer):
     # Comparación entre servicios
     st.markdown("#### 📈 Comparación entre Servicios")
     
-    services_comparison = data.groupby('servicio').agg({
-        'codigo': 'count',
-        'consumo_diario': ['sum', 'mean'],
-        'estado_stock': lambda x: (x == 'CRÍTICO').sum()
-    }).round(2)
+    services = analyzer.rollup(['servicio'])
+    services_comparison = services[['productos', 'consumo_diario', 'consumo_promedio', 'criticos']].round(2)
     
     services_comparison.columns = ['Total Productos', 'Consumo Total', 'Consumo Promedio', 'Productos Críticos']
     services_comparison = services_comparison.reset_index()
@@ -1149,15 +1320,15 @@ def show_consolidated_expert_analysis(analyzer, data):
     
     # Calcular métricas de riesgo
     total_products = len(data)
-    critical_products = len(data[data['estado_stock'] == 'CRÍTICO'])
-    low_products = len(data[data['estado_stock'] == 'BAJO'])
+    critical_products = analyzer.count(estado_stock='CRÍTICO')
+    low_products = analyzer.count(estado_stock='BAJO')
     risk_products = critical_products + low_products
     
     # Productos sin stock
     zero_stock = len(data[data['stock'] <= 0])
     
     # Productos de alta rotación en riesgo (Curva A críticos)
-    high_rotation_risk = len(data[(data['curva'] == 'A') & (data['estado_stock'].isin(['CRÍTICO', 'BAJO']))])
+    high_rotation_risk = analyzer.count(curva='A', estado_stock=['CRÍTICO', 'BAJO'])
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -1198,7 +1369,7 @@ def show_consolidated_expert_analysis(analyzer, data):
     st.markdown("#### 🎯 Matriz de Criticidad Inteligente")
     
     # Crear matriz de criticidad: Curva ABC vs Estado de Stock
-    criticality_matrix = pd.crosstab(data['curva'], data['estado_stock'], margins=True)
+    criticality_matrix = analyzer.get_criticality_matrix()
     
     col1, col2 = st.columns(2)
     
@@ -1296,7 +1467,7 @@ def show_consolidated_expert_analysis(analyzer, data):
             st.markdown(f"• 📦 **Revisar:** {excess_stock} productos con +30 días de cobertura")
         
         # Balance por curva
-        curva_balance = data.groupby('curva')['dias_cobertura'].mean()
+        curva_balance = analyzer.rollup(['curva'])['cobertura_promedio']
         for curva, avg_days in curva_balance.items():
             target_days = {'A': 7, 'B': 14, 'C': 21}
             target = target_days.get(curva, 14)
@@ -1313,8 +1484,10 @@ def show_consolidated_expert_analysis(analyzer, data):
     next_days = [1, 2, 3, 7]
     breakage_forecast = []
     
+    breaking = analyzer.breakage_counts(next_days)
+    
     for days in next_days:
-        products_breaking = len(data[data['dias_cobertura'] <= days])
+        products_breaking = int(breaking[days])
         breakage_forecast.append({
             'Plazo': f"≤ {days} día{'s' if days > 1 else ''}",
             'Productos': products_breaking,
@@ -1339,6 +1512,60 @@ def show_consolidated_expert_analysis(analyzer, data):
             color_continuous_scale='Reds'
         )
         st.plotly_chart(fig_forecast, use_container_width=True, key="breakage_forecast")
+    
+    show_breakage_projection(analyzer)
+
+def show_breakage_projection(analyzer):
+    """Proyección diaria de quiebres acumulados, total o por curva/servicio"""
+    
+    st.markdown("#### 📆 Proyección Diaria de Quiebres")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        horizon = st.slider("Horizonte (días):", min_value=7, max_value=90, value=30, key="breakage_horizon")
+    
+    with col2:
+        breakdowns = {'Total': None, 'Curva ABC': 'curva'}
+        if 'servicio' in analyzer.data.columns and analyzer.data['servicio'].nunique() > 1:
+            breakdowns['Servicio'] = 'servicio'
+        breakdown = st.selectbox("Desglose:", options=list(breakdowns), key="breakage_by")
+    
+    days = list(range(1, horizon + 1))
+    by = breakdowns[breakdown]
+    counts = analyzer.breakage_counts(days, by=by)
+    
+    if by is None:
+        projection = pd.DataFrame({'Día': days, 'Productos': counts.to_numpy()})
+        fig_projection = px.area(projection, x='Día', y='Productos',
+                                 title=f'Productos Quebrados Acumulados - Próximos {horizon} días')
+    else:
+        projection = counts.rename_axis(columns='Día').stack().rename('Productos').reset_index()
+        projection[by] = projection[by].astype(str)
+        fig_projection = px.line(projection, x='Día', y='Productos', color=by, markers=True,
+                                 title=f'Productos Quebrados Acumulados por {breakdown} - Próximos {horizon} días')
+    
+    fig_projection.update_layout(hovermode='x unified')
+    st.plotly_chart(fig_projection, use_container_width=True, key="breakage_projection")
+    
+    rows = analyzer.breaking_rows(horizon)
+    with st.expander(f"📋 Productos que se quiebran en {horizon} días ({len(rows)})"):
+        if len(rows) > 0:
+            show_paged_table(
+                analyzer, rows,
+                ['codigo', 'descripcion', 'curva', 'stock', 'consumo_diario', 'dias_cobertura'],
+                key="breakage_table",
+                column_config={
+                    'codigo': st.column_config.TextColumn('Código', width='small'),
+                    'descripcion': st.column_config.TextColumn('Descripción', width='large'),
+                    'curva': st.column_config.TextColumn('Curva', width='small'),
+                    'stock': st.column_config.NumberColumn('Stock', format='%.2f'),
+                    'consumo_diario': st.column_config.NumberColumn('Consumo Diario', format='%.2f'),
+                    'dias_cobertura': st.column_config.NumberColumn('Días Cobertura', format='%.1f')
+                }
+            )
+        else:
+            st.info("Ningún producto se quiebra en este horizonte")
 
 def show_intuitive_service_breakdown(analyzer, data):
     """Análisis intuitivo por servicios con explicaciones claras"""
@@ -1493,7 +1720,7 @@ def show_intuitive_service_breakdown(analyzer, data):
 def show_detailed_curva_analysis(analyzer, data, curva):
     """Análisis detallado de una curva específica"""
     
-    curva_data = data[data['curva'] == curva]
+    curva_data = analyzer.get_products_by_curva(curva)
     
     if len(curva_data) == 0:
         st.warning(f"No hay productos en la Curva {curva}")
@@ -1535,7 +1762,7 @@ def show_detailed_curva_analysis(analyzer, data, curva):
     col1, col2, col3, col4 = st.columns(4)
     
     total_products = len(curva_data)
-    critical_count = len(curva_data[curva_data['estado_stock'] == 'CRÍTICO'])
+    critical_count = analyzer.count(curva=curva, estado_stock='CRÍTICO')
     avg_consumption = curva_data['consumo_diario'].mean()
     avg_coverage = curva_data['dias_cobertura'].mean()
     
@@ -1556,6 +1783,7 @@ def show_detailed_curva_analysis(analyzer, data, curva):
     st.markdown("#### 📊 Distribución por Estado de Stock")
     
     status_dist = curva_data['estado_stock'].value_counts()
+    status_dist = status_dist[status_dist > 0]
     
     col1, col2 = st.columns(2)
     
@@ -1590,7 +1818,7 @@ def show_detailed_curva_analysis(analyzer, data, curva):
             st.markdown(f"{icon} **{estado}**: {count} productos ({pct:.1f}%)")
     
     # Productos más críticos de esta curva
-    critical_products = curva_data[curva_data['estado_stock'] == 'CRÍTICO'].nsmallest(10, 'dias_cobertura')
+    critical_products = analyzer.take(analyzer.rows(order_by='dias_cobertura', curva=curva, estado_stock='CRÍTICO')[:10])
     
     if len(critical_products) > 0:
         st.markdown(f"#### 🚨 Productos Críticos en Curva {curva}")
@@ -1648,20 +1876,17 @@ def show_detailed_curva_analysis(analyzer, data, curva):
             key=f"sort_choice_{curva}"
         )
     
-    # Aplicar filtros
-    filtered_data = curva_data[curva_data['estado_stock'].isin(status_filter)]
-    
-    # Aplicar ordenamiento
+    # Aplicar filtros y ordenamiento (posiciones memoizadas en el analizador)
     sort_col, ascending = sort_options[sort_choice]
-    filtered_data = filtered_data.sort_values(sort_col, ascending=ascending)
+    rows = analyzer.product_rows([sort_col], ascending, curva=curva, states=status_filter)
     
-    if len(filtered_data) > 0:
-        st.markdown(f"**Mostrando {len(filtered_data)} de {len(curva_data)} productos**")
+    if len(rows) > 0:
+        st.markdown(f"**Mostrando {len(rows)} de {len(curva_data)} productos**")
         
-        st.dataframe(
-            filtered_data[['codigo', 'descripcion', 'stock', 'consumo_diario', 'dias_cobertura', 'estado_stock']],
-            width='stretch',
-            hide_index=True,
+        show_paged_table(
+            analyzer, rows,
+            ['codigo', 'descripcion', 'stock', 'consumo_diario', 'dias_cobertura', 'estado_stock'],
+            key=f"curva_table_{curva}",
             column_config={
                 'codigo': st.column_config.TextColumn('Código', width='small'),
                 'descripcion': st.column_config.TextColumn('Descripción', width='large'),
@@ -1751,7 +1976,7 @@ def show_curva_analysis(analyzer, data):
         )
     
     with col2:
-        critical_count = len(curva_data[curva_data['estado_stock'] == 'CRÍTICO'])
+        critical_count = analyzer.count(curva=curva_selected, estado_stock='CRÍTICO')
         critical_pct = (critical_count / len(curva_data) * 100) if len(curva_data) > 0 else 0
         st.metric(
             "🚨 Críticos", 
@@ -1780,6 +2005,7 @@ def show_curva_analysis(analyzer, data):
     st.markdown("#### 📊 Distribución por Estado de Stock")
     
     status_dist = curva_data['estado_stock'].value_counts()
+    status_dist = status_dist[status_dist > 0]
     
     col1, col2 = st.columns(2)
     
@@ -1843,24 +2069,18 @@ def show_curva_analysis(analyzer, data):
             value=int(curva_data['dias_cobertura'].max())
         )
     
-    # Aplicar filtros
-    filtered_data = curva_data[
-        (curva_data['estado_stock'].isin(status_filter)) &
-        (curva_data['dias_cobertura'] >= min_coverage) &
-        (curva_data['dias_cobertura'] <= max_coverage)
-    ]
+    # Aplicar filtros, ordenando por criticidad
+    rows = analyzer.product_rows(['estado_stock', 'dias_cobertura'], curva=curva_selected, states=status_filter,
+                                 coverage=(min_coverage, max_coverage))
     
     # Mostrar datos filtrados
-    if len(filtered_data) > 0:
-        st.markdown(f"**Mostrando {len(filtered_data)} de {len(curva_data)} productos**")
-        
-        # Ordenar por criticidad
-        display_data = filtered_data.sort_values(['estado_stock', 'dias_cobertura'])
+    if len(rows) > 0:
+        st.markdown(f"**Mostrando {len(rows)} de {len(curva_data)} productos**")
         
-        st.dataframe(
-            display_data[['codigo', 'descripcion', 'stock', 'consumo_diario', 'dias_cobertura', 'estado_stock']],
-            width='stretch',
-            hide_index=True,
+        show_paged_table(
+            analyzer, rows,
+            ['codigo', 'descripcion', 'stock', 'consumo_diario', 'dias_cobertura', 'estado_stock'],
+            key=f"products_table_{curva_selected}",
             column_config={
                 'codigo': st.column_config.TextColumn('Código', width='small'),
                 'descripcion': st.column_config.TextColumn('Descripción', width='large'),
@@ -1881,7 +2101,7 @@ def show_status_analysis(analyzer, data):
     
     for status in ['CRÍTICO', 'BAJO', 'NORMAL', 'ALTO']:
         if status in status_counts.index:
-            status_data = data[data['estado_stock'] == status]
+            status_data = analyzer.get_products_by_status(status)
             count = len(status_data)
             pct = (count / len(data) * 100)
             
@@ -1904,14 +2124,9 @@ def show_family_analysis(analyzer, data):
         st.warning("No hay información de familias de productos disponible")
         return
     
-    family_analysis = data.groupby('familia').agg({
-        'codigo': 'count',
-        'dias_cobertura': 'mean',
-        'estado_stock': lambda x: (x == 'CRÍTICO').sum()
-    }).rename(columns={
-        'codigo': 'total_productos',
-        'dias_cobertura': 'cobertura_promedio',
-        'estado_stock': 'productos_criticos'
+    family_analysis = analyzer.rollup(['familia'])[['productos', 'cobertura_promedio', 'criticos']].rename(columns={
+        'productos': 'total_productos',
+        'criticos': 'productos_criticos'
     })
     
     family_analysis['pct_criticos'] = (family_analysis['productos_criticos'] / family_analysis['total_productos'] * 100)
@@ -1956,12 +2171,68 @@ def show_trends_analysis(analyzer, data):
             labels={'x': 'Rango de Días', 'y': 'Cantidad de Productos'}
         )
         st.plotly_chart(fig_bar, use_container_width=True, key="coverage_ranges_bar")
+    
+    show_history_trends(analyzer)
+
+def show_history_trends(analyzer):
+    """Evolución diaria del sitio desde el historial de análisis"""
+    site = st.session_state.get('site') or DEFAULT_SITE
+    store = get_history_store()
+    
+    st.markdown(f"#### 🗓️ Evolución Histórica · {site}")
+    dates = store.dates(site)
+    if len(dates) < 2:
+        st.info(f"📅 El historial tiene {len(dates)} día(s) de análisis. La evolución se muestra desde el segundo día.")
+        return
+    
+    days = st.select_slider("Período (días)", options=[30, 60, 90, 180, 365], value=90, key="history_days")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        status = store.status_history(site, days)
+        fig_status = px.line(status, x='fecha', y='productos', color='estado_stock', markers=True,
+                             title="Productos por Estado de Stock",
+                             labels={'fecha': 'Fecha', 'productos': 'Productos', 'estado_stock': 'Estado'})
+        st.plotly_chart(fig_status, use_container_width=True, key="history_status")
+    with col2:
+        families = store.family_history(site, days)
+        fig_families = px.line(families, x='fecha', y='cobertura_promedio', color='familia', markers=True,
+                               title="Cobertura Promedio por Familia",
+                               labels={'fecha': 'Fecha', 'cobertura_promedio': 'Días de Cobertura',
+                                       'familia': 'Familia'})
+        st.plotly_chart(fig_families, use_container_width=True, key="history_families")
+    
+    # Evolución por producto: por defecto los críticos con menor cobertura
+    data = analyzer.data
+    descriptions = dict(zip(data['codigo'].astype(str), data['descripcion'].astype(str)))
+    critical = analyzer.take(analyzer.most_critical(5))['codigo'].astype(str)
+    codes = st.multiselect("Productos", options=list(descriptions), default=list(critical), max_selections=10,
+                           format_func=lambda code: f"{code} - {descriptions[code]}", key="history_codes")
+    if codes:
+        history = store.sku_history(site, codes, days)
+        history['dias_cobertura'] = history['dias_cobertura'].where(history['dias_cobertura'] < NO_CONSUMPTION_DAYS)
+        fig_sku = px.line(history, x='fecha', y='dias_cobertura', color='codigo', markers=True,
+                          hover_data=['descripcion', 'stock', 'estado_stock'],
+                          title="Días de Cobertura por Producto",
+                          labels={'fecha': 'Fecha', 'dias_cobertura': 'Días de Cobertura', 'codigo': 'Código'})
+        st.plotly_chart(fig_sku, use_container_width=True, key="history_skus")
 
 def show_export_tab(analyzer, data):
     """Tab de exportación"""
     
     st.subheader("📤 Descargar Reportes Profesionales")
     
+    # Las descargas se generan al hacer clic y quedan en caché por huella de
+    # los datos: los reruns no serializan nada
+    exports = get_export_cache()
+    fingerprint = st.session_state.analysis_fingerprint
+    processor = st.session_state.processor
+    
+    def excel_report(progress):
+        exporter = ExcelExporter()
+        return exporter.create_professional_report(data, analyzer.get_summary_metrics(), processor, progress,
+                                                   analyzer=analyzer)
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -1976,28 +2247,7 @@ def show_export_tab(analyzer, data):
         - Gráficos y métricas por curva ABC
         """)
         
-        if st.button("📥 Generar Reporte Excel", key="generate_excel"):
-            with st.spinner("Generando reporte profesional..."):
-                try:
-                    exporter = ExcelExporter()
-                    analysis_summary = analyzer.get_summary_metrics()
-                    
-                    excel_file = exporter.create_professional_report(data, analysis_summary, st.session_state.processor)
-                    
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"reporte_stock_critico_{timestamp}.xlsx"
-                    
-                    st.download_button(
-                        label="📥 Descargar Reporte Completo",
-                        data=excel_file,
-                        file_name=filename,
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                    
-                    st.success("✅ Reporte generado exitosamente!")
-                    
-                except Exception as e:
-                    st.error(f"Error generando reporte: {str(e)}")
+        show_report_job(exports, fingerprint, excel_report)
     
     with col2:
         st.markdown("**📋 Exportaciones Rápidas**")
@@ -2005,22 +2255,85 @@ def show_export_tab(analyzer, data):
         # Export productos críticos
         critical_products = analyzer.get_critical_products()
         if len(critical_products) > 0:
-            csv_critical = critical_products.to_csv(index=False)
             st.download_button(
                 label="📥 Productos Críticos (CSV)",
-                data=csv_critical,
+                data=lambda: exports.get(fingerprint, 'criticos_csv', lambda: csv_bytes(critical_products)),
                 file_name="productos_criticos.csv",
                 mime="text/csv"
             )
         
         # Export datos completos
-        csv_complete = data.to_csv(index=False)
         st.download_button(
             label="📥 Análisis Completo (CSV)",
-            data=csv_complete,
+            data=lambda: exports.get(fingerprint, 'completo_csv', lambda: csv_bytes(data)),
             file_name="analisis_completo.csv",
             mime="text/csv"
         )
 
+def show_report_job(exports, fingerprint, excel_report):
+    """Reporte Excel en segundo plano: generar, seguir el progreso y descargar"""
+    jobs = get_report_jobs()
+    job = jobs.get(st.session_state.get('report_job_id'))
+    if job is not None and job.key != fingerprint:
+        follow_report_job(None)  # trabajo de un análisis anterior
+        job = None
+    
+    report = exports.peek(fingerprint, 'excel')
+    if report is None and job is not None and job.status == DONE:
+        report = job.result
+    
+    if report is not None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.download_button(
+            label="📥 Descargar Reporte Completo",
+            data=report,
+            file_name=f"reporte_stock_critico_{timestamp}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="download_excel"
+        )
+        if job is not None and job.seconds is not None:
+            st.success(f"✅ Reporte generado exitosamente en {job.seconds:.1f}s")
+        return
+    
+    if job is None or job.finished:
+        if job is not None and job.status == FAILED:
+            st.error(f"Error generando reporte: {job.error}")
+        elif job is not None and job.status == CANCELLED:
+            st.info("Generación del reporte cancelada")
+        
+        if not st.button("📥 Generar Reporte Excel", key="generate_excel"):
+            return
+        job = jobs.submit(fingerprint, lambda job: exports.get(
+            fingerprint, 'excel', lambda: excel_report(job.report)
+        ), get_script_run_ctx().session_id)
+        follow_report_job(job.id)
+    
+    show_report_progress(job.id)
+
+@st.fragment(run_every=1)
+def show_report_progress(job_id):
+    """
+    Progreso del reporte en generación. Solo este fragmento se actualiza
+    cada segundo; el resto de la página sigue disponible
+    """
+    jobs = get_report_jobs()
+    job = jobs.get(job_id)
+    if job is None or job.finished:
+        # Rerun completo para mostrar la descarga, el error o la cancelación
+        st.rerun()
+    
+    if job.cancel_requested:
+        text = "Cancelando..."
+    elif job.step:
+        text = f"Generando reporte: {job.label} ({job.step}/{job.total_steps})"
+    else:
+        text = "Reporte en cola..."
+    st.progress(job.fraction, text=text)
+    if st.button("✖️ Cancelar", key="cancel_excel", disabled=job.cancel_requested):
+        if not jobs.cancel(job.id, get_script_run_ctx().session_id):
+            # Otra sesión sigue el mismo reporte: esta solo se desvincula
+            st.session_state.report_job_id = None
+            st.rerun()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""
+Análisis nocturno por lotes de varios sitios, sin Streamlit.
+
+Uso:
+    python batch.py DIRECTORIO -o salida/          # una subcarpeta por sitio
+    python batch.py --manifest sitios.csv -o salida/ [--workers 8] [--excel] [--snapshots data/snapshots]
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from batch_analysis import discover_pairs, read_manifest, run_batch
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Análisis de stock crítico por lotes (Curva ABC + stock por sitio)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('directory', nargs='?', help="directorio con una subcarpeta por sitio")
+    source.add_argument('--manifest', help="CSV con columnas sitio,curva_abc,stock")
+    parser.add_argument('-o', '--output', required=True, help="directorio de resultados")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="procesos en paralelo (default: núcleos)")
+    parser.add_argument('--excel', action='store_true', help="generar también reporte.xlsx por sitio")
+    parser.add_argument('--snapshots', help="directorio donde guardar el snapshot Parquet de cada sitio")
+    args = parser.parse_args(argv)
+
+    try:
+        pairs = read_manifest(args.manifest) if args.manifest else discover_pairs(args.directory)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not pairs:
+        print("No se encontraron pares Curva ABC + stock", file=sys.stderr)
+        return 1
+
+    summary = run_batch(pairs, args.output, workers=args.workers, excel=args.excel,
+                        snapshot_dir=args.snapshots)
+    print(summary[['sitio', 'estado', 'total_productos', 'productos_criticos', 'segundos']].to_string(index=False))
+    return 0 if (summary['estado'] == 'ok').all() else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Benchmark del análisis por lotes: n sitios sintéticos de igual tamaño
+procesados con 1, 2, 4, ... workers hasta los núcleos disponibles.
+Reporta sitios por segundo y el escalamiento respecto de 1 worker.
+
+Uso:
+    python benchmarks/bench_batch.py [n_sitios] [n_productos]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from batch_analysis import SitePair, run_batch
+from parallel_parse import available_cpus
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def main(n_sites=8, n_products=5_000):
+    cpus = available_cpus()
+    worker_counts = sorted({1, *[2 ** k for k in range(1, 8) if 2 ** k <= cpus], cpus})
+    print(f"{n_sites} sitios de {n_products} productos, {cpus} CPUs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        abc_path = os.path.join(tmp, 'curva_abc.xlsx')
+        stock_path = os.path.join(tmp, 'stock.xlsx')
+        make_curva_abc_sheet(n_products).to_excel(abc_path, header=False, index=False)
+        make_stock_sheet(n_products).to_excel(stock_path, header=False, index=False)
+        pairs = [SitePair(f"sitio_{i:02d}", abc_path, stock_path) for i in range(n_sites)]
+
+        baseline = None
+        for workers in worker_counts:
+            start = time.perf_counter()
+            summary = run_batch(pairs, os.path.join(tmp, f"salida_{workers}"), workers=workers)
+            elapsed = time.perf_counter() - start
+            assert (summary['estado'] == 'ok').all()
+
+            baseline = baseline or elapsed
+            print(f"  {workers:3d} workers  {elapsed:7.2f} s  {n_sites / elapsed:6.2f} sitios/s  "
+                  f"escalamiento {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,129 @@
+"""
+Benchmark del parser de Curva ABC: recorrido fila a fila (iterrows)
+versus el motor columnar de ERPDataProcessor.
+
+Uso:
+    python benchmarks/bench_curva_abc.py [n_productos] [corridas]
+"""
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_processor import ERPDataProcessor
+from synthetic import make_curva_abc_sheet
+
+
+def legacy_parse_curva_abc(processor: ERPDataProcessor, df: pd.DataFrame) -> pd.DataFrame:
+    """Parser fila a fila original (sin prints), usado como referencia"""
+    consolidated_data = []
+    current_service = "Servicio General"
+    current_curva = "C"
+
+    for idx, row in df.iterrows():
+        try:
+            row_str = ' '.join([str(cell) for cell in row if pd.notna(cell)])
+
+            if ("Servicio" in row_str and ":" in row_str) or ("10000" in row_str and "Desayuno" in row_str) or ("10001" in row_str and "Almuerzo" in row_str) or ("10003" in row_str and "Cena" in row_str):
+                current_service = processor._extract_service_name(row_str)
+                continue
+
+            if "Curva A" in row_str:
+                current_curva = "A"
+                continue
+            elif "Curva B" in row_str:
+                current_curva = "B"
+                continue
+            elif "Curva C" in row_str:
+                current_curva = "C"
+                continue
+
+            for col_idx in range(min(6, len(row))):
+                cell = row.iloc[col_idx]
+                if pd.isna(cell):
+                    continue
+
+                cell_str = str(cell).strip()
+
+                try:
+                    code = int(float(cell_str))
+                    if 1 <= code <= 999999:
+                        description = "Sin descripción"
+                        consumption = 0
+
+                        for desc_col in range(col_idx + 1, len(row)):
+                            desc_cell = row.iloc[desc_col]
+                            if pd.isna(desc_cell):
+                                continue
+                            desc_str = str(desc_cell).strip()
+                            if (len(desc_str) > 2 and
+                                not desc_str.replace('.', '').replace(',', '').isdigit() and
+                                "Total" not in desc_str):
+                                description = desc_str
+                                break
+
+                        for cons_col in range(col_idx + 1, len(row)):
+                            cons_cell = row.iloc[cons_col]
+                            if pd.isna(cons_cell):
+                                continue
+                            try:
+                                cons_val = float(str(cons_cell).replace(',', '.'))
+                                if cons_val > 0:
+                                    consumption = cons_val
+                                    break
+                            except:
+                                continue
+
+                        if (description != "Sin descripción" and consumption > 0) or \
+                           (len(str(description).strip()) > 1 and consumption > 0):
+                            consolidated_data.append([
+                                str(code), description, "Und", consumption,
+                                0, 0, current_curva, current_service,
+                                "01/09/2025", "08/09/2025"
+                            ])
+                            break
+                except ValueError:
+                    continue
+        except Exception:
+            continue
+
+    columns = ['codigo', 'descripcion', 'unidad', 'consumo', 'costo_unit',
+               'costo_total', 'curva', 'servicio', 'fecha_inicio', 'fecha_fin']
+    return processor._clean_curva_dataframe(pd.DataFrame(consolidated_data, columns=columns))
+
+
+def median_time(parse, runs: int):
+    """Mediana de varias corridas (el ruido del sistema pesa en una sola) y el último resultado"""
+    timings = []
+    for _ in range(runs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = parse()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings), timings, result
+
+
+def main(n_products: int = 100_000, runs: int = 5):
+    df = make_curva_abc_sheet(n_products)
+    processor = ERPDataProcessor()
+    print(f"Hoja sintética: {df.shape[0]} filas x {df.shape[1]} columnas, mediana de {runs} corridas")
+
+    legacy_time, legacy_runs, expected = median_time(lambda: legacy_parse_curva_abc(processor, df), runs)
+    columnar_time, columnar_runs, result = median_time(lambda: processor._parse_curva_abc_frame(df), runs)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+    for name, median, timings in (('iterrows', legacy_time, legacy_runs), ('columnar', columnar_time, columnar_runs)):
+        print(f"{name}:  {median:8.3f} s  (corridas: {', '.join(f'{t:.3f}' for t in timings)})")
+    print(f"speedup:   {legacy_time / columnar_time:8.1f}x  ({len(result)} productos, resultado idéntico)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,55 @@
+"""
+Benchmark del reporte Excel: tiempo y memoria máxima (tracemalloc) de
+create_professional_report con el análisis de n productos sintéticos,
+escribiendo en memoria y en modo constant_memory.
+
+Uso:
+    python benchmarks/bench_excel_export.py [n_productos ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from analyzer import StockAnalyzer
+from data_processor import ERPDataProcessor
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+from utils import ExcelExporter
+
+
+def main(sizes=(10_000, 100_000)):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_products in sizes:
+            abc_path = os.path.join(tmp, f"abc_{n_products}.xlsx")
+            stock_path = os.path.join(tmp, f"stock_{n_products}.xlsx")
+            make_curva_abc_sheet(n_products).to_excel(abc_path, header=False, index=False)
+            make_stock_sheet(n_products).to_excel(stock_path, header=False, index=False)
+
+            processor = ERPDataProcessor()
+            processor.process_curva_abc(abc_path)
+            processor.process_stock(stock_path)
+            analysis = processor.calculate_coverage_analysis(processor.analysis_days)
+            summary = StockAnalyzer(analysis).get_summary_metrics()
+            print(f"{len(analysis)} filas de análisis")
+
+            for constant_memory in (False, True):
+                tracemalloc.start()
+                start = time.perf_counter()
+                report = ExcelExporter(constant_memory=constant_memory).create_professional_report(
+                    analysis, summary, processor
+                )
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                mode = 'constant_memory' if constant_memory else 'en memoria     '
+                print(f"  {mode}  {elapsed:7.2f} s  pico {peak / 2 ** 20:7.1f} MiB  "
+                      f"archivo {len(report.getvalue()) / 2 ** 20:6.1f} MiB")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (10_000, 100_000))
@@ -0,0 +1,47 @@
+"""
+Benchmark de los backends de lectura Excel sobre workbooks sintéticos
+de tamaño creciente. Verifica que todos entreguen el mismo DataFrame.
+
+Uso:
+    python benchmarks/bench_excel_reader.py [n_productos ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import excel_reader
+from synthetic import make_stock_sheet
+
+
+def main(sizes=(5_000, 20_000, 80_000)):
+    backends = excel_reader.available_backends()
+    print(f"Backends disponibles: {', '.join(backends)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_products in sizes:
+            path = os.path.join(tmp, f"stock_{n_products}.xlsx")
+            make_stock_sheet(n_products).to_excel(path, header=False, index=False, engine='xlsxwriter')
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"\n{n_products} productos ({size_mb:.1f} MB)")
+
+            reference = None
+            for backend in backends:
+                start = time.perf_counter()
+                df, used = excel_reader.read_sheet(path, [backend])
+                elapsed = time.perf_counter() - start
+
+                if reference is None:
+                    reference = df
+                else:
+                    pd.testing.assert_frame_equal(df, reference)
+                print(f"  {used:16s} {elapsed:8.3f} s")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (5_000, 20_000, 80_000))
@@ -0,0 +1,54 @@
+"""
+Benchmark del historial SQLite: agrega n días de un análisis sintético y
+mide las consultas de tendencias (estados, familias y evolución por SKU).
+
+Uso:
+    python benchmarks/bench_history.py [n_productos] [n_dias]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_processor import ERPDataProcessor
+from history_store import HistoryStore
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main(n_products=20_000, n_days=95):
+    processor = ERPDataProcessor()
+    processor.curva_abc_data = processor._parse_curva_abc_frame(make_curva_abc_sheet(n_products))
+    processor.stock_data = processor._parse_stock_frame(make_stock_sheet(n_products))
+    analysis = processor.calculate_coverage_analysis(processor.analysis_days)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, 'historial.sqlite'))
+        append_seconds, _ = timed(lambda: [store.append('sitio', analysis, date.today() - timedelta(days=day))
+                                           for day in range(n_days)])
+        size = os.path.getsize(store.path)
+        print(f"{n_products} productos x {n_days} días ({size / 1e6:.0f} MB)")
+        print(f"  agregar un día      {append_seconds / n_days * 1000:8.1f} ms")
+
+        codes = analysis['codigo'].sample(10, random_state=0).tolist()
+        for name, query in (
+            ('estados 90 días', lambda: store.status_history('sitio', 90)),
+            ('familias 90 días', lambda: store.family_history('sitio', 90)),
+            ('10 SKUs 90 días', lambda: store.sku_history('sitio', codes, 90)),
+        ):
+            seconds, result = timed(query)
+            print(f"  {name:18s}  {seconds * 1000:8.1f} ms  ({len(result)} filas)")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args)
@@ -0,0 +1,70 @@
+"""
+Benchmark del análisis incremental: con la Curva ABC ya consolidada se
+sube un stock nuevo donde cambió una fracción de los productos, y se
+compara el análisis incremental con el cálculo completo en un procesador
+nuevo (resultado idéntico).
+
+Uso:
+    python benchmarks/bench_incremental.py [n_productos] [fraccion_cambiada]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import schema
+from data_processor import ERPDataProcessor
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def best_of(runs, fn):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+
+def main(n_products=50_000, changed_fraction=0.05):
+    processor = ERPDataProcessor()
+    processor.curva_abc_data = processor._parse_curva_abc_frame(make_curva_abc_sheet(n_products))
+    processor.stock_data = processor._parse_stock_frame(make_stock_sheet(n_products))
+    processor.calculate_coverage_analysis(processor.analysis_days)
+
+    # Stock nuevo: cambia una fracción de los productos
+    new_stock = schema.widen_floats(processor.stock_data)
+    rng = np.random.default_rng(0)
+    changed = rng.choice(len(new_stock), size=int(len(new_stock) * changed_fraction), replace=False)
+    new_stock.loc[changed, 'stock'] = new_stock.loc[changed, 'stock'] + 1
+    new_stock = schema.apply_schema(new_stock, schema.STOCK_SCHEMA)
+
+    def incremental():
+        processor.stock_data = new_stock.copy()
+        return processor.calculate_coverage_analysis(processor.analysis_days)
+
+    def full():
+        fresh = ERPDataProcessor()
+        fresh.curva_abc_data = processor.curva_abc_data
+        fresh.stock_data = new_stock.copy()
+        return fresh.calculate_coverage_analysis(processor.analysis_days)
+
+    full_seconds, reference = best_of(3, full)
+    incremental_seconds, result = best_of(3, incremental)
+    pd.testing.assert_frame_equal(result, reference, check_categorical=False)
+
+    print(f"{n_products} productos, {len(changed)} con stock cambiado")
+    print(f"  completo     {full_seconds * 1000:8.1f} ms")
+    print(f"  incremental  {incremental_seconds * 1000:8.1f} ms  ({full_seconds / incremental_seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 50_000, float(args[1]) if len(args) > 1 else 0.05)
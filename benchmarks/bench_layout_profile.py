@@ -0,0 +1,52 @@
+"""
+Benchmark del perfil de layout: parsea hojas sintéticas de Curva ABC y
+stock con la búsqueda por celdas (sin perfil conocido) y con el perfil
+inferido del primer parseo, y verifica que el resultado sea idéntico.
+
+Uso:
+    python benchmarks/bench_layout_profile.py [n_productos ...]
+"""
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import layout_profile
+from data_processor import ERPDataProcessor
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def best_of(runs, fn, forget_profiles):
+    best = None
+    for _ in range(runs):
+        if forget_profiles:
+            layout_profile.clear()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, result)
+    return best
+
+
+def main(sizes=(5_000, 50_000)):
+    processor = ERPDataProcessor()
+    for n_products in sizes:
+        print(f"\n{n_products} productos")
+        for name, sheet, parse in (
+            ('curva_abc', make_curva_abc_sheet(n_products), processor._parse_curva_abc_frame),
+            ('stock', make_stock_sheet(n_products), processor._parse_stock_frame),
+        ):
+            search_seconds, reference = best_of(5, lambda: parse(sheet), forget_profiles=True)
+            profile_seconds, result = best_of(5, lambda: parse(sheet), forget_profiles=False)
+            pd.testing.assert_frame_equal(result, reference)
+            print(f"  {name:10s} búsqueda {search_seconds * 1000:7.1f} ms  perfil {profile_seconds * 1000:7.1f} ms  "
+                  f"({search_seconds / profile_seconds:.2f}x)")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (5_000, 50_000))
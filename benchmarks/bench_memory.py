@@ -0,0 +1,83 @@
+"""
+Benchmark de memoria del esquema compacto de dtypes: bytes por SKU de
+curva_abc_data, stock_data y del análisis consolidado, sin esquema
+(object/float64) y con el esquema de src/schema.py.
+
+Los bytes se cuentan una sola vez por objeto: un str compartido por
+varias filas (o una categoría) suma su tamaño una vez, a diferencia de
+memory_usage(deep=True).
+
+Uso:
+    python benchmarks/bench_memory.py [n_productos ...]
+"""
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_processor import ERPDataProcessor
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Bytes de los arreglos más cada objeto Python distinto una sola vez"""
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    seen = set()
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            objects = values.cat.categories
+        elif values.dtype == object:
+            objects = values
+        else:
+            continue
+        for value in objects:
+            if id(value) not in seen:
+                seen.add(id(value))
+                total += sys.getsizeof(value)
+    return total
+
+
+def run_pipeline(abc_path: str, stock_path: str):
+    processor = ERPDataProcessor()
+    processor.process_curva_abc(abc_path)
+    processor.process_stock(stock_path)
+    processor.calculate_coverage_analysis(processor.analysis_days)
+    return {
+        'curva_abc_data': processor.curva_abc_data,
+        'stock_data': processor.stock_data,
+        'consolidated_data': processor.consolidated_data,
+    }
+
+
+def main(sizes=(5_000, 20_000, 80_000)):
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_products in sizes:
+            abc_path = os.path.join(tmp, f"abc_{n_products}.xlsx")
+            stock_path = os.path.join(tmp, f"stock_{n_products}.xlsx")
+            make_curva_abc_sheet(n_products).to_excel(abc_path, header=False, index=False)
+            make_stock_sheet(n_products).to_excel(stock_path, header=False, index=False)
+
+            with mock.patch('schema.apply_schema', lambda df, _: df):
+                before = run_pipeline(abc_path, stock_path)
+            after = run_pipeline(abc_path, stock_path)
+
+            print(f"\n{n_products} productos")
+            for name in before:
+                pd.testing.assert_frame_equal(before[name], after[name], check_dtype=False,
+                                              check_categorical=False)
+                rows = len(after[name])
+                old, new = frame_bytes(before[name]) / rows, frame_bytes(after[name]) / rows
+                print(f"  {name:18s} {old:7.0f} -> {new:6.0f} bytes/SKU  ({old / new:.1f}x)")
+
+            dtypes = after['consolidated_data'].dtypes
+            print("  análisis: " + ', '.join(f"{column}={dtype}" for column, dtype in dtypes.items()))
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (5_000, 20_000, 80_000))
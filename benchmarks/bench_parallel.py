@@ -0,0 +1,84 @@
+"""
+Benchmark del parseo concurrente: procesa un par Curva ABC + stock de
+tamaño similar en secuencia y con el pool de procesos (ya iniciado,
+como en la app), y reporta los tiempos por archivo y el total. Al final
+mata un proceso del pool y verifica que los dos análisis siguientes
+terminan: el primero en el proceso principal y el segundo con un pool nuevo.
+
+Uso:
+    python benchmarks/bench_parallel.py [n_productos ...]
+"""
+import os
+import sys
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+import parallel_parse
+from data_processor import ERPDataProcessor
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def best_of(runs, sources, pool):
+    best = None
+    for _ in range(runs):
+        processor = ERPDataProcessor()
+        timings = parallel_parse.process_files(processor, sources, pool=pool)
+        if best is None or timings['total'] < best[0]['total']:
+            best = (timings, processor)
+    return best
+
+
+def main(sizes=(5_000, 20_000, 50_000)):
+    print(f"CPUs disponibles: {parallel_parse.available_cpus()}")
+    pool = parallel_parse.create_pool()
+    # Primer envío: arranca los procesos e importa pandas en cada uno
+    pool.submit(sum, []).result()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_products in sizes:
+            sources = {'curva_abc': os.path.join(tmp, f"abc_{n_products}.xlsx"),
+                       'stock': os.path.join(tmp, f"stock_{n_products}.xlsx")}
+            make_curva_abc_sheet(n_products).to_excel(sources['curva_abc'], header=False, index=False)
+            make_stock_sheet(n_products).to_excel(sources['stock'], header=False, index=False)
+
+            sequential, reference = best_of(3, sources, None)
+            parallel, processor = best_of(3, sources, pool)
+            pd.testing.assert_frame_equal(processor.curva_abc_data, reference.curva_abc_data)
+            pd.testing.assert_frame_equal(processor.stock_data, reference.stock_data)
+
+            print(f"\n{n_products} productos")
+            for name, timings in (('secuencial', sequential), ('paralelo', parallel)):
+                print(f"  {name:10s} curva_abc {timings['curva_abc']:6.2f} s  stock {timings['stock']:6.2f} s  "
+                      f"total {timings['total']:6.2f} s")
+            print(f"  speedup total: {sequential['total'] / parallel['total']:.2f}x")
+
+        check_recovery(pool, sources, reference)
+
+    pool.shutdown()
+
+
+def check_recovery(pool, sources, reference):
+    """Mata un proceso del pool y corre dos análisis más con el mismo pool"""
+    broken = pool.executor
+    try:
+        broken.submit(os._exit, 1).result()
+    except BrokenProcessPool:
+        pass
+    print("\nproceso del pool terminado")
+
+    for attempt in (1, 2):
+        processor = ERPDataProcessor()
+        timings = parallel_parse.process_files(processor, sources, pool=pool)
+        pd.testing.assert_frame_equal(processor.curva_abc_data, reference.curva_abc_data)
+        pd.testing.assert_frame_equal(processor.stock_data, reference.stock_data)
+        print(f"  análisis {attempt} tras la falla: total {timings['total']:6.2f} s  "
+              f"pool nuevo: {pool.executor is not broken}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (5_000, 20_000, 50_000))
@@ -0,0 +1,56 @@
+"""
+Benchmark de los snapshots Parquet: reabrir un análisis desde su snapshot
+frente a parsear de nuevo los Excel y recalcular la cobertura.
+
+Uso:
+    python benchmarks/bench_snapshot.py [n_productos ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_processor import ERPDataProcessor
+from snapshot_store import SnapshotStore
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+
+
+def main(sizes=(5_000, 50_000)):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(os.path.join(tmp, 'snapshots'))
+        for n_products in sizes:
+            abc_path = os.path.join(tmp, f"abc_{n_products}.xlsx")
+            stock_path = os.path.join(tmp, f"stock_{n_products}.xlsx")
+            make_curva_abc_sheet(n_products).to_excel(abc_path, header=False, index=False)
+            make_stock_sheet(n_products).to_excel(stock_path, header=False, index=False)
+
+            start = time.perf_counter()
+            processor = ERPDataProcessor()
+            processor.process_curva_abc(abc_path)
+            processor.process_stock(stock_path)
+            processor.calculate_coverage_analysis(processor.analysis_days)
+            parse_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            directory = store.save(f"sitio_{n_products}", processor)
+            save_seconds = time.perf_counter() - start
+            size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+            start = time.perf_counter()
+            loaded = store.load_path(directory)
+            load_seconds = time.perf_counter() - start
+            pd.testing.assert_frame_equal(loaded.consolidated_data, processor.consolidated_data)
+
+            print(f"\n{n_products} productos ({size / 1024:.0f} KB en disco)")
+            print(f"  Excel + análisis  {parse_seconds * 1000:8.1f} ms")
+            print(f"  guardar snapshot  {save_seconds * 1000:8.1f} ms")
+            print(f"  abrir snapshot    {load_seconds * 1000:8.1f} ms  ({parse_seconds / load_seconds:.0f}x)")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (5_000, 50_000))
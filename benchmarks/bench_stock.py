@@ -0,0 +1,143 @@
+"""
+Benchmark del parser de stock: recorrido fila a fila (iterrows)
+versus el motor columnar de ERPDataProcessor.
+
+Uso:
+    python benchmarks/bench_stock.py [n_productos]
+"""
+import contextlib
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.dirname(__file__))
+
+from data_processor import ERPDataProcessor
+from synthetic import make_stock_sheet
+
+
+def legacy_parse_stock(processor: ERPDataProcessor, df: pd.DataFrame) -> pd.DataFrame:
+    """Parser fila a fila original (sin prints), usado como referencia"""
+    stock_data = []
+    current_family = "Sin familia"
+
+    for idx, row in df.iterrows():
+        try:
+            row_str = ' '.join([str(cell) for cell in row if pd.notna(cell)])
+
+            if processor._is_family_header(row_str):
+                current_family = processor._extract_family_name(row_str)
+                continue
+
+            for col_idx in range(min(6, len(row))):
+                cell = row.iloc[col_idx]
+                if pd.isna(cell):
+                    continue
+
+                cell_str = str(cell).strip()
+
+                try:
+                    code = int(float(cell_str))
+                    if 1 <= code <= 999999:
+                        description = "Sin descripción"
+                        unit = "Und"
+                        stock_value = 0
+                        price = 0
+                        total = 0
+
+                        for search_col in range(col_idx + 1, len(row)):
+                            search_cell = row.iloc[search_col]
+                            if pd.isna(search_cell):
+                                continue
+
+                            search_str = str(search_cell).strip()
+
+                            if (description == "Sin descripción" and
+                                len(search_str) >= 3 and
+                                not search_str.replace('.', '').replace(',', '').replace('-', '').isdigit() and
+                                "Total" not in search_str):
+                                description = search_str
+                                continue
+
+                            if (unit == "Und" and
+                                len(search_str) <= 5 and
+                                not search_str.replace('.', '').replace(',', '').isdigit()):
+                                unit = search_str
+                                continue
+
+                            try:
+                                numeric_val = float(search_str.replace(',', '.'))
+                                if stock_value == 0:
+                                    stock_value = numeric_val
+                                elif price == 0:
+                                    price = numeric_val
+                                elif total == 0:
+                                    total = numeric_val
+                            except:
+                                continue
+
+                        if description != "Sin descripción" or len(str(search_str).strip()) >= 3:
+                            stock_data.append([str(code), description, unit, stock_value,
+                                               price, total, current_family])
+                            break
+
+                except ValueError:
+                    continue
+
+        except Exception:
+            continue
+
+    columns = ['codigo', 'descripcion', 'unidad', 'stock', 'precio', 'total', 'familia']
+    if not stock_data:
+        return pd.DataFrame(columns=columns)
+    return processor._clean_stock_dataframe(pd.DataFrame(stock_data, columns=columns))
+
+
+# Celdas con el texto de los valores por defecto: en el parser original
+# "Und" y "Sin descripción" dejan el rol abierto para la celda siguiente
+EDGE_ROWS = [
+    ['12', '1e3', 'Und', '1e3', None, '1000.0'],
+    [13, 'LECHE ENTERA', 'Und', 'KG', 5.0, 2.0, 10.0],
+    [14, 'Sin descripción', 'PAN', 'UN', 1.0, 2.0, 2.0],
+    [15, 'Sin descripción', 'KG', 3.0],
+]
+
+
+def check_edge_cases(processor: ERPDataProcessor):
+    df = pd.DataFrame(EDGE_ROWS)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pd.testing.assert_frame_equal(processor._parse_stock_frame(df), legacy_parse_stock(processor, df))
+    print(f"Casos borde: {len(EDGE_ROWS)} filas, resultado idéntico")
+
+
+def main(n_products: int = 100_000, repeat: int = 3):
+    df = make_stock_sheet(n_products)
+    processor = ERPDataProcessor()
+    check_edge_cases(processor)
+    print(f"Hoja sintética: {df.shape[0]} filas x {df.shape[1]} columnas")
+
+    start = time.perf_counter()
+    expected = legacy_parse_stock(processor, df)
+    legacy_time = time.perf_counter() - start
+
+    # Mejor de varias corridas
+    columnar_time = float('inf')
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = processor._parse_stock_frame(df)
+            columnar_time = min(columnar_time, time.perf_counter() - start)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+    print(f"iterrows:  {legacy_time:8.3f} s")
+    print(f"columnar:  {columnar_time:8.3f} s")
+    print(f"speedup:   {legacy_time / columnar_time:8.1f}x  ({len(result)} productos, resultado idéntico)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,65 @@
+"""
+Benchmark de memoria del modo streaming: procesa archivos de stock de
+tamaño creciente con la hoja completa y por bloques, cada uno en un
+proceso aparte, y reporta el pico de RSS, el pico de memoria de Python
+(tracemalloc, incluye los arrays de numpy) y el tiempo. El RSS incluye
+la base del intérprete y las librerías, por eso se reportan ambos.
+
+Uso:
+    python benchmarks/bench_streaming.py [n_productos ...]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(__file__))
+
+from synthetic import make_stock_sheet
+
+CHUNK_ROWS = 5_000
+
+WORKER = """
+import resource, sys, time, tracemalloc
+sys.path.append({src!r})
+from data_processor import ERPDataProcessor
+processor = ERPDataProcessor(chunk_rows=int(sys.argv[2]))
+tracemalloc.start()
+start = time.perf_counter()
+df = processor.process_stock(sys.argv[1])
+elapsed = time.perf_counter() - start
+peak = tracemalloc.get_traced_memory()[1]
+print(len(df), elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, peak)
+"""
+
+
+def run_worker(path: str, chunk_rows: int):
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+    output = subprocess.run(
+        [sys.executable, '-c', WORKER.format(src=src), path, str(chunk_rows)],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, 'STOCK_LOG_LEVEL': 'WARNING'},
+    ).stdout.split()
+    n_products, elapsed = int(output[0]), float(output[1])
+    return n_products, elapsed, int(output[2]) / 1024, int(output[3]) / 1024 / 1024
+
+
+def main(sizes=(20_000, 80_000, 200_000)):
+    print(f"{'productos':>10s} {'MB':>6s} {'modo':>10s} {'pico RSS':>10s} {'pico heap':>10s} {'tiempo':>8s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_products in sizes:
+            path = os.path.join(tmp, f"stock_{n_products}.xlsx")
+            make_stock_sheet(n_products).to_excel(path, header=False, index=False, engine='xlsxwriter')
+            size_mb = os.path.getsize(path) / 1024 / 1024
+
+            results = {}
+            for mode, chunk_rows in (('completo', 0), ('streaming', CHUNK_ROWS)):
+                results[mode] = run_worker(path, chunk_rows)
+                _, elapsed, rss_mb, heap_mb = results[mode]
+                print(f"{n_products:10d} {size_mb:6.1f} {mode:>10s} {rss_mb:7.0f} MB {heap_mb:7.0f} MB {elapsed:7.2f}s")
+            assert results['completo'][0] == results['streaming'][0]
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or (20_000, 80_000, 200_000))
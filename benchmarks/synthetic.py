@@ -0,0 +1,77 @@
+"""
+Generadores de exports sintéticos del ERP para los benchmarks.
+
+Imitan la estructura real de los archivos: encabezados, rango de fechas,
+filas de servicio, marcadores de curva, productos y filas de totales.
+"""
+import numpy as np
+import pandas as pd
+
+SERVICES = [
+    "Servicio : 10000 - Desayuno",
+    "Servicio : 10001 - Almuerzo",
+    "Servicio : 10003 - Cena",
+    "Servicio : 10007 - Cena Nochera",
+    "Servicio : 10008 - Colacion Reemplazo",
+]
+
+WORDS = ["LECHE", "PAN", "HUEVO", "ARROZ", "POLLO", "CARNE", "PAPA", "LIMON",
+         "YOGURT", "CAFE", "JUGO", "GALLETA", "AGUA", "FLAN", "TOMATE"]
+
+FAMILIES = ["101 LACTEOS", "102 PANADERIA", "103 CARNES", "104 FRUTAS Y VERDURAS",
+            "105 ABARROTES", "106 BEBIDAS"]
+
+
+def _description(rng, code):
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {code}"
+
+
+def make_curva_abc_sheet(n_products: int, seed: int = 0) -> pd.DataFrame:
+    """Hoja de Curva ABC sin headers, tal como la entrega pd.read_excel(header=None)"""
+    rng = np.random.default_rng(seed)
+    rows = [
+        ["Curva ABC de Consumo", None, None, None, None, None],
+        ["Rango Facha: 01/09/2025 al 08/09/2025", None, None, None, None, None],
+        ["Código", "Descripción", "Unidad", "Consumo", "Costo Unit", "Costo Total"],
+    ]
+    per_block = max(1, n_products // (len(SERVICES) * 3))
+    code = 100
+    while code - 100 < n_products:
+        for service in SERVICES:
+            rows.append([service, None, None, None, None, None])
+            for curva in ["A", "B", "C"]:
+                rows.append([f"Curva {curva}", None, None, None, None, None])
+                for _ in range(per_block):
+                    if code - 100 >= n_products:
+                        break
+                    consumption = round(float(rng.uniform(0, 500)), 2)
+                    price = round(float(rng.uniform(100, 5000)), 2)
+                    rows.append([code, _description(rng, code), "KG", consumption, price,
+                                 round(consumption * price, 2)])
+                    code += 1
+                rows.append([None, f"Total Curva {curva}", None, None, None, None])
+    return pd.DataFrame(rows)
+
+
+def make_stock_sheet(n_products: int, seed: int = 0) -> pd.DataFrame:
+    """Hoja de stock por bodega sin headers, con encabezados de familia"""
+    rng = np.random.default_rng(seed)
+    rows = [
+        ["Informe de Stock Valorizado", None, None, None, None, None, None],
+        ["Bodega: 01 - Central", None, None, None, None, None, None],
+        ["Código", "Descripción", "Unidad", "Stock", "Precio", "Total", None],
+    ]
+    per_family = max(1, n_products // len(FAMILIES))
+    code = 100
+    while code - 100 < n_products:
+        for family in FAMILIES:
+            rows.append([family, None, None, None, None, None, None])
+            for _ in range(per_family):
+                if code - 100 >= n_products:
+                    break
+                stock = round(float(rng.uniform(0, 300)), 2)
+                price = round(float(rng.uniform(100, 5000)), 2)
+                rows.append([code, _description(rng, code), "KG", stock, price,
+                             round(stock * price, 2), None])
+                code += 1
+    return pd.DataFrame(rows)
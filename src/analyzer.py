@@ -1,20 +1,122 @@
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import schema
+
+# Dimensiones del cubo de agregados y de los índices de partición
+CUBE_DIMENSIONS = ['curva', 'estado_stock', 'servicio', 'familia']
+# Columnas del cubo que se re-agregan sumando
+CUBE_SUMS = ['productos', 'criticos', 'stock', 'stock_n', 'consumo_diario', 'consumo_n', 'cobertura_suma', 'cobertura_n']
+# Partición derivada del consumo diario: 'con' (> 0), 'sin' (== 0) y 'otro' (vacío)
+CONSUMPTION_PARTITION = 'consumo'
+# Filtros de tablas paginadas (product_rows) que se conservan por analizador
+MAX_ROW_VIEWS = 16
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """Huella SHA-256 del contenido (valores, índice y columnas) de un DataFrame"""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    digest.update('|'.join(map(str, data.columns)).encode())
+    return digest.hexdigest()
+
+
+def build_cube(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cubo de agregados: una fila por combinación observada de curva, estado,
+    servicio y familia con productos, críticos, sumas y conteos de stock,
+    consumo y cobertura, y cobertura mínima y máxima. Cualquier corte por
+    esas dimensiones se obtiene re-agregando el cubo (rollup), sin recorrer
+    los productos. Los valores faltantes de una dimensión forman su propio
+    grupo. Las sumas se acumulan en float64
+    """
+    dims = [dim for dim in CUBE_DIMENSIONS if dim in data.columns]
+    data = schema.widen_floats(data[dims + ['stock', 'consumo_diario', 'dias_cobertura']])
+    cube = data.groupby(dims, observed=True, dropna=False).agg(
+        productos=('estado_stock', 'size'),
+        stock=('stock', 'sum'), stock_n=('stock', 'count'),
+        consumo_diario=('consumo_diario', 'sum'), consumo_n=('consumo_diario', 'count'),
+        cobertura_suma=('dias_cobertura', 'sum'), cobertura_n=('dias_cobertura', 'count'),
+        cobertura_min=('dias_cobertura', 'min'), cobertura_max=('dias_cobertura', 'max'),
+    ).reset_index()
+    cube.insert(len(dims) + 1, 'criticos', cube['productos'].where(cube['estado_stock'] == 'CRÍTICO', 0))
+    return cube
+
+
+def rollup(cube: pd.DataFrame, by: List[str]) -> pd.DataFrame:
+    """
+    Agregados del cubo por las dimensiones `by` (sin los grupos con la
+    dimensión vacía, como groupby), con promedios de stock, consumo y
+    cobertura sobre los valores no nulos
+    """
+    aggregates = {column: (column, 'sum') for column in CUBE_SUMS}
+    aggregates.update(cobertura_min=('cobertura_min', 'min'), cobertura_max=('cobertura_max', 'max'))
+    result = cube.groupby(by, observed=True).agg(**aggregates)
+    result['stock_promedio'] = result['stock'] / result['stock_n']
+    result['consumo_promedio'] = result['consumo_diario'] / result['consumo_n']
+    result['cobertura_promedio'] = result['cobertura_suma'] / result['cobertura_n']
+    return result
+
+
+def _freeze(value):
+    """Resultado memoizado de solo lectura: arreglos sin escritura, dicts como MappingProxyType"""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, dict):
+        value = MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    elif isinstance(value, tuple):
+        value = tuple(_freeze(item) for item in value)
+    return value
+
+
+def _handout(value):
+    """Copia propia de un resultado memoizado mutable (figuras y DataFrames) para quien lo pide"""
+    if isinstance(value, go.Figure):
+        return go.Figure(value)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    return value
+
+
+def cached_view(method):
+    """
+    Memoiza un método sin argumentos del analizador. Los datos del
+    analizador no cambian después de construirlo, así que cada gráfico o
+    métrica se calcula una sola vez por instancia. La instancia se comparte
+    entre sesiones (get_analyzer): cada llamada recibe su propia copia de
+    figuras y DataFrames, y el resto queda de solo lectura.
+    """
+    @functools.wraps(method)
+    def wrapper(self):
+        return _handout(self._view(method.__name__, lambda: method(self)))
+    return wrapper
+
 
 class StockAnalyzer:
     def __init__(self, consolidated_data: pd.DataFrame):
         self.data = consolidated_data
+        self._views = {}
+        self._views_lock = threading.Lock()
+        self._row_views = OrderedDict()
+        self._row_lock = threading.Lock()
         self.kpis = self._calculate_kpis()
     
     def _calculate_kpis(self) -> Dict:
         """Calcula KPIs principales del inventario"""
         total_products = len(self.data)
-        critical_products = len(self.data[self.data['estado_stock'] == 'CRÍTICO'])
-        low_products = len(self.data[self.data['estado_stock'] == 'BAJO'])
+        critical_products = self.count(estado_stock='CRÍTICO')
+        low_products = self.count(estado_stock='BAJO')
         
         # Stock total valorizado
         total_stock_value = (self.data['stock'] * self.data.get('precio', 0)).sum()
@@ -23,7 +125,7 @@ class StockAnalyzer:
         curva_distribution = self.data['curva'].value_counts().to_dict()
         
         # Promedio días de cobertura por curva
-        avg_coverage = self.data.groupby('curva')['dias_cobertura'].mean().to_dict()
+        avg_coverage = self.data.groupby('curva', observed=True)['dias_cobertura'].mean().to_dict()
         
         return {
             'total_products': total_products,
@@ -35,19 +137,227 @@ class StockAnalyzer:
             'avg_coverage_by_curva': avg_coverage
         }
     
+    def _view(self, key, compute: Callable[[], object]):
+        """
+        Resultado memoizado de compute() bajo key (ver _freeze). Se calcula
+        fuera del lock, porque una vista puede pedir otras; si dos sesiones
+        la calculan a la vez, queda la primera
+        """
+        with self._views_lock:
+            if key in self._views:
+                return self._views[key]
+        value = _freeze(compute())
+        with self._views_lock:
+            return self._views.setdefault(key, value)
+    
+    @cached_view
+    def get_cube(self) -> pd.DataFrame:
+        """Cubo de agregados del análisis (build_cube), calculado una vez"""
+        return build_cube(self.data)
+    
+    def rollup(self, by: List[str]) -> pd.DataFrame:
+        """Agregados por las dimensiones indicadas, desde el cubo (memoizados; se entrega una copia)"""
+        return _handout(self._view(('rollup', tuple(by)), lambda: rollup(self.get_cube(), by)))
+    
+    @cached_view
+    def get_criticality_matrix(self) -> pd.DataFrame:
+        """Productos por curva y estado con totales ('All'), como pd.crosstab(margins=True)"""
+        matrix = self.rollup(['curva', 'estado_stock'])['productos'].unstack(fill_value=0)
+        matrix.index = matrix.index.astype(object)
+        matrix.columns = matrix.columns.astype(object)
+        matrix['All'] = matrix.sum(axis=1)
+        matrix.loc['All'] = matrix.sum()
+        return matrix
+    
+    @cached_view
+    def get_partitions(self) -> Mapping[str, Mapping]:
+        """
+        Índice de partición: por cada dimensión (estado, curva, servicio,
+        familia) las posiciones (iloc, crecientes) de los productos de cada
+        valor, más la partición 'consumo' (con o sin consumo diario). Se arma
+        una vez; los filtros por esas columnas lo consultan en vez de recorrer
+        los datos
+        """
+        partitions = {
+            dim: self.data.groupby(dim, observed=True, dropna=False, sort=False).indices
+            for dim in CUBE_DIMENSIONS if dim in self.data.columns
+        }
+        if 'consumo_diario' in self.data.columns:
+            consumption = self.data['consumo_diario'].to_numpy(dtype=float)
+            labels = np.select([consumption > 0, consumption == 0], ['con', 'sin'], 'otro')
+            partitions[CONSUMPTION_PARTITION] = {
+                label: np.flatnonzero(labels == label) for label in ('con', 'sin', 'otro')
+                if (labels == label).any()
+            }
+        return partitions
+    
+    def rows(self, order_by: Optional[str] = None, **filters: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        Posiciones de los productos que cumplen todos los filtros (columna=valor
+        o columna=[valores]), desde el índice de partición: se parte de la
+        columna más selectiva y las demás se verifican solo sobre esas filas.
+        Con order_by quedan en el orden de esa columna (como nsmallest), si no
+        en el de los datos
+        """
+        partitions = self.get_partitions()
+        selections = []
+        for dim, values in filters.items():
+            if isinstance(values, str) or not isinstance(values, (list, tuple, set, np.ndarray, pd.Index)):
+                values = [values]
+            values = [value for value in values if value in partitions[dim]]
+            selections.append((sum(len(partitions[dim][value]) for value in values), dim, values))
+        
+        if not selections:
+            rows = np.arange(len(self.data))
+        else:
+            selections.sort(key=lambda selection: selection[0])
+            _, dim, values = selections[0]
+            parts = [partitions[dim][value] for value in values]
+            if len(parts) == 1:
+                rows = parts[0]
+            else:
+                rows = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.intp)
+            for _, dim, values in selections[1:]:
+                codes, numbers = self._partition_codes()[dim]
+                rows = rows[np.isin(codes[rows], [numbers[value] for value in values])]
+        
+        if order_by is not None:
+            rows = rows[np.argsort(self._ranks(order_by)[rows], kind='stable')]
+        return rows
+    
+    @cached_view
+    def _partition_codes(self) -> Mapping[str, Tuple[np.ndarray, Mapping]]:
+        """Por dimensión, el número de partición de cada producto y el número de cada valor"""
+        codes = {}
+        for dim, indices in self.get_partitions().items():
+            dim_codes = np.empty(len(self.data), dtype=np.intp)
+            for number, positions in enumerate(indices.values()):
+                dim_codes[positions] = number
+            codes[dim] = (dim_codes, {value: number for number, value in enumerate(indices)})
+        return codes
+    
+    def _ranks(self, column: str) -> np.ndarray:
+        """Posición de cada producto en el orden creciente de la columna (memoizada)"""
+        def compute():
+            order = self.sorted_positions([column])
+            ranks = np.empty(len(order), dtype=np.intp)
+            ranks[order] = np.arange(len(order))
+            return ranks
+        return self._view(('rango', column), compute)
+    
+    def count(self, **filters: Union[str, Sequence[str]]) -> int:
+        """Productos que cumplen los filtros (ver rows)"""
+        return len(self.rows(**filters))
+    
+    def take(self, rows: np.ndarray) -> pd.DataFrame:
+        """Copia de los productos en esas posiciones"""
+        return self.data.take(rows)
+    
+    def _coverage_index(self, **filters: Union[str, Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Posiciones de los productos que cumplen los filtros y sus días de
+        cobertura, ambos ordenados por cobertura; memoizados por filtro
+        """
+        key = ('cobertura', tuple(sorted(
+            (dim, values if isinstance(values, str) or not isinstance(values, (list, tuple, set)) else tuple(values))
+            for dim, values in filters.items()
+        )))
+        def compute():
+            rows = self.rows(order_by='dias_cobertura', **filters)
+            return rows, self.data['dias_cobertura'].to_numpy(dtype=float)[rows]
+        return self._view(key, compute)
+    
+    def breaking_rows(self, days: float, **filters: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        Posiciones de los productos (con los filtros de rows) que se quiebran
+        dentro de days días (cobertura <= days), de menor a mayor cobertura.
+        Una búsqueda binaria sobre la cobertura ordenada
+        """
+        rows, coverage = self._coverage_index(**filters)
+        return rows[:np.searchsorted(coverage, days, side='right')]
+    
+    def breakage_counts(self, horizons: Sequence[float], by: Optional[str] = None) -> Union[pd.Series, pd.DataFrame]:
+        """
+        Productos que se quiebran dentro de cada horizonte (días): una Serie
+        por horizonte o, con by (curva, servicio...), una fila por valor.
+        Cada conteo es una búsqueda binaria en la cobertura ordenada
+        """
+        horizons = list(horizons)
+        if by is None:
+            coverage = self._coverage_index()[1]
+            return pd.Series(np.searchsorted(coverage, horizons, side='right'), index=horizons)
+        
+        values = list(self.get_partitions()[by])
+        counts = [np.searchsorted(self._coverage_index(**{by: value})[1], horizons, side='right') for value in values]
+        return pd.DataFrame(counts, index=pd.Index(values, name=by), columns=horizons)
+    
+    def sorted_positions(self, by: Sequence[str], ascending: bool = True) -> np.ndarray:
+        """
+        Posiciones (iloc) de todos los productos ordenados por las columnas
+        by, como sort_values estable; memoizadas por columnas y sentido
+        """
+        def compute():
+            keys = self.data[list(by)].reset_index(drop=True)
+            return keys.sort_values(list(by), ascending=ascending, kind='stable').index.to_numpy()
+        return self._view(('orden', tuple(by), ascending), compute)
+    
+    def product_rows(self, by: Sequence[str], ascending: bool = True, curva: Optional[str] = None,
+                     states: Optional[Sequence[str]] = None,
+                     coverage: Optional[Tuple[float, float]] = None) -> np.ndarray:
+        """
+        Posiciones de los productos de la curva, con estado en states y días
+        de cobertura dentro del rango coverage, en el orden de by. Se filtra
+        el orden completo memoizado y el resultado de los últimos filtros
+        queda guardado, así que cambiar de página solo lee las filas visibles
+        """
+        key = (tuple(by), ascending, curva, None if states is None else tuple(sorted(map(str, states))), coverage)
+        with self._row_lock:
+            rows = self._row_views.get(key)
+            if rows is not None:
+                self._row_views.move_to_end(key)
+                return rows
+        
+        filters = {}
+        if curva is not None:
+            filters['curva'] = curva
+        if states is not None:
+            filters['estado_stock'] = list(states)
+        mask = np.zeros(len(self.data), dtype=bool)
+        mask[self.rows(**filters)] = True
+        if coverage is not None:
+            low, high = coverage
+            mask &= self.data['dias_cobertura'].between(low, high).to_numpy(dtype=bool)
+        order = self.sorted_positions(by, ascending)
+        rows = _freeze(order[mask[order]])
+        
+        with self._row_lock:
+            self._row_views[key] = rows
+            while len(self._row_views) > MAX_ROW_VIEWS:
+                self._row_views.popitem(last=False)
+        return rows
+    
+    def most_critical(self, n: int, **filters: Union[str, Sequence[str]]) -> np.ndarray:
+        """
+        Posiciones de los n productos críticos (con los filtros de rows) de
+        menor cobertura, como nsmallest(n, 'dias_cobertura') (las coberturas
+        vacías quedan al final); el orden por cobertura queda memoizado
+        """
+        return self._coverage_index(estado_stock='CRÍTICO', **filters)[0][:n]
+    
     def get_critical_products(self) -> pd.DataFrame:
         """Obtiene productos en estado crítico ordenados por días de cobertura"""
-        critical = self.data[self.data['estado_stock'] == 'CRÍTICO'].copy()
-        return critical.sort_values('dias_cobertura').reset_index(drop=True)
+        critical = self.take(self.rows(order_by='dias_cobertura', estado_stock='CRÍTICO'))
+        return critical.reset_index(drop=True)
     
     def get_products_by_status(self, status: str) -> pd.DataFrame:
         """Obtiene productos por estado específico"""
-        return self.data[self.data['estado_stock'] == status].copy()
+        return self.take(self.rows(estado_stock=status))
     
     def get_products_by_curva(self, curva: str) -> pd.DataFrame:
         """Obtiene productos por curva ABC"""
-        return self.data[self.data['curva'] == curva].copy()
+        return self.take(self.rows(curva=curva))
     
+    @cached_view
     def create_status_distribution_chart(self) -> go.Figure:
         """Crea gráfico de distribución de estados de stock"""
         status_counts = self.data['estado_stock'].value_counts()
@@ -76,15 +386,16 @@ class StockAnalyzer:
         
         return fig
     
+    @cached_view
     def create_coverage_by_curva_chart(self) -> go.Figure:
         """Crea gráfico de cobertura promedio por curva ABC (solo productos con consumo)"""
         # Filtrar solo productos con consumo para gráficos precisos
-        data_with_consumption = self.data[self.data['consumo_diario'] > 0]
+        data_with_consumption = self.take(self.rows(consumo='con'))
         
         if len(data_with_consumption) == 0:
             return self._create_empty_chart("No hay productos con consumo para analizar")
         
-        coverage_data = data_with_consumption.groupby('curva')['dias_cobertura'].agg(['mean', 'median']).reset_index()
+        coverage_data = data_with_consumption.groupby('curva', observed=True)['dias_cobertura'].agg(['mean', 'median']).reset_index()
         
         fig = go.Figure()
         
@@ -116,13 +427,11 @@ class StockAnalyzer:
         
         return fig
     
+    @cached_view
     def create_critical_products_chart(self) -> go.Figure:
         """Crea gráfico de productos más críticos (solo con consumo real)"""
         # Solo productos críticos que tienen consumo real
-        critical_with_consumption = self.data[
-            (self.data['estado_stock'] == 'CRÍTICO') & 
-            (self.data['consumo_diario'] > 0)
-        ].nsmallest(15, 'dias_cobertura')
+        critical_with_consumption = self.take(self.most_critical(15, consumo='con'))
         
         if len(critical_with_consumption) == 0:
             # Crear gráfico vacío si no hay productos críticos
@@ -160,12 +469,13 @@ class StockAnalyzer:
         
         return fig
     
+    @cached_view
     def create_family_analysis_chart(self) -> go.Figure:
         """Crea análisis por familia de productos"""
         if 'familia' not in self.data.columns:
             return self._create_empty_chart("Análisis por familia no disponible")
         
-        family_analysis = self.data.groupby(['familia', 'estado_stock']).size().unstack(fill_value=0)
+        family_analysis = self.rollup(['familia', 'estado_stock'])['productos'].unstack(fill_value=0)
         
         fig = go.Figure()
         
@@ -202,10 +512,11 @@ class StockAnalyzer:
         )
         return fig
     
+    @cached_view
     def create_consumption_trend_chart(self) -> go.Figure:
         """Crea gráfico de tendencia de consumo"""
         # Simular tendencia basada en consumo diario
-        consumption_by_curva = self.data.groupby('curva')['consumo_diario'].sum().reset_index()
+        consumption_by_curva = self.data.groupby('curva', observed=True)['consumo_diario'].sum().reset_index()
         
         fig = px.bar(
             consumption_by_curva,
@@ -243,7 +554,7 @@ class StockAnalyzer:
         )
         
         # Asignar prioridad
-        needs_replenishment['prioridad'] = needs_replenishment['estado_stock'].map({
+        needs_replenishment['prioridad'] = needs_replenishment['estado_stock'].astype(object).map({
             'CRÍTICO': 1,
             'BAJO': 2,
             'NORMAL': 3,
@@ -284,28 +595,28 @@ class StockAnalyzer:
         suggested = max(0, target_stock - current_stock)
         return suggested
     
-    def get_summary_metrics(self) -> Dict:
+    @cached_view
+    def get_summary_metrics(self) -> Mapping:
         """Obtiene métricas resumidas para dashboard (solo productos con consumo)"""
         
         # Separar productos con consumo vs sin consumo para métricas precisas
-        data_with_consumption = self.data[self.data['consumo_diario'] > 0]
-        data_no_consumption = self.data[self.data['consumo_diario'] == 0]
+        with_consumption = self.rows(consumo='con')
         
         # Recalcular KPIs solo para productos con consumo
-        total_with_consumption = len(data_with_consumption)
-        critical_with_consumption = len(data_with_consumption[data_with_consumption['estado_stock'] == 'CRÍTICO'])
-        low_with_consumption = len(data_with_consumption[data_with_consumption['estado_stock'] == 'BAJO'])
+        total_with_consumption = len(with_consumption)
+        critical_with_consumption = self.count(consumo='con', estado_stock='CRÍTICO')
+        low_with_consumption = self.count(consumo='con', estado_stock='BAJO')
         
         return {
             'total_productos': len(self.data),  # Total real
             'productos_con_consumo': total_with_consumption,  # Solo con consumo
-            'productos_sin_consumo': len(data_no_consumption),  # Sin consumo
+            'productos_sin_consumo': self.count(consumo='sin'),  # Sin consumo
             'productos_criticos': critical_with_consumption,  # Solo críticos con consumo
             'productos_bajo': low_with_consumption,
             'porcentaje_critico': f"{(critical_with_consumption / total_with_consumption * 100) if total_with_consumption > 0 else 0:.1f}%",
             'valor_inventario': f"${self.kpis['total_stock_value']:,.0f}",
-            'productos_curva_a': len(data_with_consumption[data_with_consumption['curva'] == 'A']),
-            'productos_curva_b': len(data_with_consumption[data_with_consumption['curva'] == 'B']),
-            'productos_curva_c': len(data_with_consumption[data_with_consumption['curva'] == 'C']),
-            'cobertura_promedio': f"{data_with_consumption['dias_cobertura'].mean():.1f} días" if len(data_with_consumption) > 0 else "N/A"
+            'productos_curva_a': self.count(consumo='con', curva='A'),
+            'productos_curva_b': self.count(consumo='con', curva='B'),
+            'productos_curva_c': self.count(consumo='con', curva='C'),
+            'cobertura_promedio': f"{self.data['dias_cobertura'].iloc[with_consumption].mean():.1f} días" if total_with_consumption > 0 else "N/A"
         }
\ No newline at end of file
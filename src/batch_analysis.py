@@ -0,0 +1,190 @@
+"""
+Análisis por lotes de muchos sitios (casinos) sin la interfaz Streamlit.
+
+Cada sitio es un par Curva ABC + stock. Los pares se toman de:
+    - un directorio con una subcarpeta por sitio que contiene un archivo
+      con "abc" o "curva" en el nombre y otro con "stock"
+    - un manifiesto CSV con columnas sitio,curva_abc,stock (rutas
+      relativas al manifiesto)
+
+Cada sitio se analiza completo (ERPDataProcessor + StockAnalyzer) en un
+proceso del pool, así que el rendimiento escala con los núcleos. Por sitio
+se escriben analisis.csv, criticos.csv y reposicion.csv (y reporte.xlsx
+si se pide) en <salida>/<sitio>/ (el nombre del sitio como slug, igual que en
+SnapshotStore), y un resumen.csv con una fila por sitio.
+Con snapshot_dir, cada sitio guarda además su snapshot Parquet.
+"""
+import csv
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from analyzer import StockAnalyzer
+from data_processor import ERPDataProcessor
+from parallel_parse import available_cpus
+from pipeline_log import get_logger, log_event
+from snapshot_store import SnapshotStore, slugify
+
+logger = get_logger('batch_analysis')
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# Columnas del resumen consolidado, en orden
+SUMMARY_COLUMNS = [
+    'sitio', 'estado', 'total_productos', 'productos_con_consumo', 'productos_sin_consumo',
+    'productos_criticos', 'productos_bajo', 'porcentaje_critico', 'valor_inventario',
+    'cobertura_promedio', 'dias_periodo', 'segundos', 'error',
+]
+
+
+@dataclass
+class SitePair:
+    """Archivos de un sitio"""
+    site: str
+    curva_abc: str
+    stock: str
+
+
+def _classify_file(name: str) -> Optional[str]:
+    lower = name.lower()
+    if not lower.endswith(EXCEL_EXTENSIONS) or lower.startswith('~$'):
+        return None
+    if 'stock' in lower:
+        return 'stock'
+    if 'abc' in lower or 'curva' in lower:
+        return 'curva_abc'
+    return None
+
+
+def discover_pairs(directory: str) -> List[SitePair]:
+    """Un par por subcarpeta de directory que tenga ambos archivos"""
+    pairs = []
+    for site in sorted(os.listdir(directory)):
+        site_dir = os.path.join(directory, site)
+        if not os.path.isdir(site_dir):
+            continue
+
+        files = {}
+        for name in sorted(os.listdir(site_dir)):
+            kind = _classify_file(name)
+            if kind is not None:
+                files.setdefault(kind, os.path.join(site_dir, name))
+
+        if len(files) == 2:
+            pairs.append(SitePair(site, files['curva_abc'], files['stock']))
+        else:
+            log_event(logger, logging.WARNING, "sitio_incompleto", sitio=site, archivos=','.join(sorted(files)))
+    return _check_unique_sites(pairs, directory)
+
+
+def read_manifest(path: str) -> List[SitePair]:
+    """Pares desde un CSV sitio,curva_abc,stock"""
+    base_dir = os.path.dirname(os.path.abspath(path))
+    pairs = []
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        for row in csv.DictReader(handle):
+            pairs.append(SitePair(
+                row['sitio'].strip(),
+                os.path.join(base_dir, row['curva_abc'].strip()),
+                os.path.join(base_dir, row['stock'].strip()),
+            ))
+    return _check_unique_sites(pairs, path)
+
+
+def _check_unique_sites(pairs: List[SitePair], source: str) -> List[SitePair]:
+    """
+    Cada sitio escribe en <salida>/<slug del sitio>/ desde un proceso distinto:
+    dos sitios con el mismo slug se pisarían, así que se rechazan
+    """
+    seen = {}
+    for pair in pairs:
+        slug = slugify(pair.site)
+        if slug in seen:
+            raise ValueError(f"Sitios repetidos en {source}: '{seen[slug]}' y '{pair.site}' (carpeta '{slug}')")
+        seen[slug] = pair.site
+    return pairs
+
+
+def analyze_site(pair: SitePair, output_dir: str, excel: bool = False,
+                 snapshot_dir: Optional[str] = None) -> Dict:
+    """
+    Procesa un sitio y escribe sus resultados. Se ejecuta en el pool:
+    retorna la fila del resumen (con estado 'error' si algo falla)
+    """
+    start = time.perf_counter()
+    summary = {'sitio': pair.site}
+    try:
+        processor = ERPDataProcessor()
+        processor.process_curva_abc(pair.curva_abc)
+        processor.process_stock(pair.stock)
+        analysis = processor.calculate_coverage_analysis(processor.analysis_days)
+        analyzer = StockAnalyzer(analysis)
+
+        site_dir = os.path.join(output_dir, slugify(pair.site))
+        os.makedirs(site_dir, exist_ok=True)
+        analysis.to_csv(os.path.join(site_dir, 'analisis.csv'), index=False)
+        analyzer.get_critical_products().to_csv(os.path.join(site_dir, 'criticos.csv'), index=False)
+        analyzer.generate_replenishment_report().to_csv(os.path.join(site_dir, 'reposicion.csv'), index=False)
+
+        metrics = analyzer.get_summary_metrics()
+        if excel:
+            # utils importa streamlit: solo se carga si se pide el Excel
+            from utils import ExcelExporter
+            report = ExcelExporter().create_professional_report(analysis, metrics, processor,
+                                                                analyzer=analyzer)
+            with open(os.path.join(site_dir, 'reporte.xlsx'), 'wb') as handle:
+                handle.write(report.getvalue())
+        if snapshot_dir:
+            SnapshotStore(snapshot_dir).save(pair.site, processor)
+
+        summary.update({key: metrics[key] for key in SUMMARY_COLUMNS if key in metrics})
+        summary.update({'estado': 'ok', 'dias_periodo': processor.analysis_days})
+    except Exception as e:
+        summary.update({'estado': 'error', 'error': str(e)})
+
+    summary['segundos'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_batch(pairs: List[SitePair], output_dir: str, workers: Optional[int] = None,
+              excel: bool = False, snapshot_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Analiza todos los sitios en un pool de workers procesos (uno por núcleo
+    por defecto) y escribe <output_dir>/resumen.csv. Retorna el resumen
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or available_cpus()
+    start = time.perf_counter()
+
+    rows = []
+    if workers == 1:
+        for pair in pairs:
+            rows.append(analyze_site(pair, output_dir, excel, snapshot_dir))
+            log_event(logger, logging.INFO, "sitio_procesado", sitio=pair.site, estado=rows[-1]['estado'],
+                      segundos=rows[-1]['segundos'])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(analyze_site, pair, output_dir, excel, snapshot_dir): pair for pair in pairs}
+            for future in as_completed(futures):
+                pair = futures[future]
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    # El proceso murió (ej: sin memoria) antes de retornar
+                    rows.append({'sitio': pair.site, 'estado': 'error', 'error': str(e)})
+                log_event(logger, logging.INFO, "sitio_procesado", sitio=pair.site, estado=rows[-1]['estado'],
+                          segundos=rows[-1].get('segundos'))
+
+    summary = pd.DataFrame(rows, columns=SUMMARY_COLUMNS).sort_values('sitio').reset_index(drop=True)
+    summary.to_csv(os.path.join(output_dir, 'resumen.csv'), index=False)
+
+    elapsed = time.perf_counter() - start
+    log_event(logger, logging.INFO, "lote_completado", sitios=len(pairs),
+              errores=int((summary['estado'] == 'error').sum()), workers=workers,
+              segundos=round(elapsed, 2))
+    return summary
@@ -2,164 +2,275 @@ import pandas as pd
 import numpy as np
 from typing import Dict, Tuple, List
 import re
+import logging
+import os
+import time
+from datetime import date
+
+import parse_engine
+import excel_reader
+import layout_profile
+import pipeline_log
+import schema
+from pipeline_log import get_logger, log_event, ProductTracer
+
+logger = get_logger('data_processor')
+
+# Centinela de días de cobertura para productos sin consumo en el período
+NO_CONSUMPTION_DAYS = 999
+
+# Días de cobertura que marcan CRÍTICO por curva (x2 BAJO, x4 NORMAL)
+STATUS_THRESHOLDS = {'A': 3, 'B': 5, 'C': 7}
+
+# Columnas de los DataFrames resultantes
+CURVA_ABC_COLUMNS = ['codigo', 'descripcion', 'unidad', 'consumo', 'costo_unit',
+                     'costo_total', 'curva', 'servicio', 'fecha_inicio', 'fecha_fin']
+STOCK_COLUMNS = ['codigo', 'descripcion', 'unidad', 'stock', 'precio', 'total', 'familia']
+
+# Modo streaming: filas por bloque (0 = leer la hoja completa). STOCK_CHUNK_ROWS
+CHUNK_ROWS = int(os.environ.get('STOCK_CHUNK_ROWS', '0') or 0)
+MIN_CHUNK_ROWS = 100
 
 class ERPDataProcessor:
-    def __init__(self):
+    def __init__(self, excel_backends: List[str] = None, chunk_rows: int = None):
         self.curva_abc_data = None
         self.stock_data = None
         self.consolidated_data = None
         self.analysis_period_start = None
         self.analysis_period_end = None
         self.analysis_days = 8  # Default
+        # Seguimiento de códigos configurables (STOCK_TRACE_CODES)
+        self.tracer = ProductTracer(logger)
+        # Backends de lectura Excel (None = STOCK_EXCEL_BACKENDS / orden por defecto)
+        self.excel_backends = excel_backends
+        self.reader_backends = {}
+        # Segundos de parseo por archivo ('curva_abc', 'stock')
+        self.parse_seconds = {}
+        # sha256 de los archivos procesados con parallel_parse.process_files
+        self.source_digests = {}
+        # Reutilización entre análisis: consumo consolidado (pasos 1-2) y
+        # entradas del último análisis, para recalcular solo el stock que cambió
+        self._consumption_cache = None
+        self._coverage_inputs = None
+        # Modo streaming: lee y parsea la hoja en bloques de chunk_rows filas
+        chunk_rows = CHUNK_ROWS if chunk_rows is None else chunk_rows
+        self.chunk_rows = max(chunk_rows, MIN_CHUNK_ROWS) if chunk_rows else 0
     
     def process_curva_abc(self, file_path: str) -> pd.DataFrame:
         """
         Procesa el archivo de Curva ABC manejando celdas combinadas
         """
         try:
-            print("Iniciando procesamiento de Curva ABC...")
-            
-            # Leer archivo sin headers
-            df = pd.read_excel(file_path, header=None)
-            print(f"Archivo leído: {df.shape[0]} filas, {df.shape[1]} columnas")
-            
-            # Debug básico: mostrar estructura
-            print("\n=== MUESTRA DEL ARCHIVO ===")
-            for i in range(min(50, len(df))):
-                row_values = []
-                for j in range(min(8, len(df.columns))):
-                    cell = df.iloc[i, j]
-                    if pd.notna(cell):
-                        row_values.append(f"Col{j}:'{str(cell)[:25]}'")
-                
-                if row_values:
-                    print(f"F{i:2d}: {' | '.join(row_values)}")
-            print("=== FIN MUESTRA ===\n")
-            
-            # Extraer fechas del archivo automáticamente
-            self._extract_analysis_period(df)
-            
-            # Búsqueda inteligente de productos con detección de servicios y curvas
-            consolidated_data = []
-            current_service = "Servicio General"
-            current_curva = "C"  # Default
-            
-            for idx, row in df.iterrows():
-                try:
-                    # DEBUG ESPECÍFICO para productos problema
-                    row_str = ' '.join([str(cell) for cell in row if pd.notna(cell)])
-                    if any(code in row_str for code in ['453', '641']):
-                        print(f"\n🔍 DEBUG FILA {idx} - PRODUCTO PROBLEMA:")
-                        print(f"   Fila completa: {row_str}")
-                        for col_idx, cell in enumerate(row):
-                            if pd.notna(cell):
-                                print(f"   Col{col_idx}: '{cell}'")
-                    
-                    # Detectar servicios y curvas
-                    
-                    # Detectar servicio (múltiples patrones)
-                    if ("Servicio" in row_str and ":" in row_str) or ("10000" in row_str and "Desayuno" in row_str) or ("10001" in row_str and "Almuerzo" in row_str) or ("10003" in row_str and "Cena" in row_str):
-                        current_service = self._extract_service_name(row_str)
-                        print(f"🍽️ Servicio detectado: {current_service}")
-                        continue
-                    
-                    # Detectar curva ABC
-                    if "Curva A" in row_str:
-                        current_curva = "A"
-                        print(f"Curva A detectada")
-                        continue
-                    elif "Curva B" in row_str:
-                        current_curva = "B"
-                        print(f"Curva B detectada")
-                        continue
-                    elif "Curva C" in row_str:
-                        current_curva = "C"
-                        print(f"Curva C detectada")
-                        continue
-                    
-                    # Buscar códigos de producto en cualquier columna - MEJORADO
-                    for col_idx in range(min(6, len(row))):  # Ampliado de 4 a 6
-                        cell = row.iloc[col_idx]
-                        if pd.isna(cell):
-                            continue
-                        
-                        cell_str = str(cell).strip()
-                        
-                        # Intentar detectar código de producto
-                        try:
-                            code = int(float(cell_str))
-                            if 1 <= code <= 999999:  # Rango válido de códigos
-                                
-                                # Buscar descripción en columnas siguientes
-                                description = "Sin descripción"
-                                consumption = 0
-                                
-                                # MEJORADA: Búsqueda más flexible de descripción
-                                for desc_col in range(col_idx + 1, len(row)):
-                                    desc_cell = row.iloc[desc_col]
-                                    if pd.isna(desc_cell):
-                                        continue
-                                    
-                                    desc_str = str(desc_cell).strip()
-                                    
-                                    # Si es texto largo, probablemente es descripción
-                                    if (len(desc_str) > 2 and  # Cambiado de 5 a 2 para casos como "LIMON"
-                                        not desc_str.replace('.', '').replace(',', '').isdigit() and
-                                        "Total" not in desc_str):
-                                        description = desc_str
-                                        break
-                                
-                                # MEJORADA: Búsqueda más flexible de consumo
-                                for cons_col in range(col_idx + 1, len(row)):
-                                    cons_cell = row.iloc[cons_col]
-                                    if pd.isna(cons_cell):
-                                        continue
-                                    
-                                    try:
-                                        cons_val = float(str(cons_cell).replace(',', '.'))
-                                        if cons_val > 0:
-                                            consumption = cons_val
-                                            break
-                                    except:
-                                        continue
-                                
-                                # VALIDACIÓN MÁS FLEXIBLE para casos especiales
-                                if (description != "Sin descripción" and consumption > 0) or \
-                                   (len(str(description).strip()) > 1 and consumption > 0):
-                                    product_data = [
-                                        str(code), description, "Und", consumption, 
-                                        0, 0, current_curva, current_service, 
-                                        "01/09/2025", "08/09/2025"
-                                    ]
-                                    consolidated_data.append(product_data)
-                                    print(f"✓ PRODUCTO: {code} - {description[:30]} - Consumo: {consumption}")
-                                    break  # No buscar más en esta fila
-                        
-                        except ValueError:
-                            continue
-                
-                except Exception as e:
-                    continue
+            start = time.perf_counter()
+            if self.chunk_rows:
+                result_df = self._process_curva_abc_chunks(file_path)
+            else:
+                result_df = self._process_curva_abc_full(file_path)
+            result_df = schema.apply_schema(result_df, schema.CURVA_ABC_SCHEMA)
+            self.parse_seconds['curva_abc'] = time.perf_counter() - start
             
-            print(f"\nProductos encontrados: {len(consolidated_data)}")
+            log_event(logger, logging.INFO, "curva_abc_procesada", productos=len(result_df),
+                      segundos=round(self.parse_seconds['curva_abc'], 3))
             
-            if consolidated_data:
-                columns = ['codigo', 'descripcion', 'unidad', 'consumo', 'costo_unit', 
-                          'costo_total', 'curva', 'servicio', 'fecha_inicio', 'fecha_fin']
-                
-                result_df = pd.DataFrame(consolidated_data, columns=columns)
-                result_df = self._clean_curva_dataframe(result_df)
-                
-                print(f"DataFrame final: {len(result_df)} productos")
+            if len(result_df) > 0:
+                self.tracer.trace_frame("curva_abc", result_df, ['descripcion', 'consumo', 'curva', 'servicio'])
                 self.curva_abc_data = result_df
                 return result_df
             else:
                 raise Exception("No se encontraron productos válidos en el archivo")
                 
         except Exception as e:
-            print(f"Error en process_curva_abc: {str(e)}")
+            logger.error("Error en process_curva_abc: %s", e)
             raise Exception(f"Error procesando Curva ABC: {str(e)}")
     
+    def _process_curva_abc_full(self, file_path: str) -> pd.DataFrame:
+        """Lee la hoja completa y la parsea de una vez"""
+        # Leer archivo sin headers
+        df, backend = excel_reader.read_sheet(file_path, self.excel_backends)
+        self.reader_backends['curva_abc'] = backend
+        log_event(logger, logging.INFO, "curva_abc_leida", filas=df.shape[0], columnas=df.shape[1],
+                  backend=backend)
+        
+        # Debug básico: mostrar estructura
+        self._log_sample(df, max_cols=8)
+        
+        # Extraer fechas del archivo automáticamente
+        self._extract_analysis_period(df)
+        
+        # Motor columnar: clasifica todas las filas de una vez
+        return self._parse_curva_abc_frame(df)
+    
+    def _process_curva_abc_chunks(self, file_path: str) -> pd.DataFrame:
+        """
+        Lee y parsea la hoja por bloques. El servicio y la curva vigentes
+        pasan de un bloque al siguiente, así que el resultado es el mismo
+        que con la hoja completa
+        """
+        state = {'servicio': "Servicio General", 'curva': "C"}
+        results = []
+        n_rows = 0
+        for chunk, backend in excel_reader.iter_sheet_chunks(file_path, self.chunk_rows, self.excel_backends):
+            if not results:
+                self.reader_backends['curva_abc'] = backend
+                self._log_sample(chunk, max_cols=8)
+                # El período está en las primeras 20 filas (bloques de 100+)
+                self._extract_analysis_period(chunk)
+            results.append(self._parse_curva_abc_frame(chunk, state))
+            n_rows += len(chunk)
+        
+        log_event(logger, logging.INFO, "curva_abc_leida", filas=n_rows, bloques=len(results),
+                  backend=self.reader_backends.get('curva_abc'))
+        return self._concat_chunk_results(results, CURVA_ABC_COLUMNS)
+    
+    def _concat_chunk_results(self, results: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+        """Une los resultados de cada bloque en un solo DataFrame"""
+        results = [result for result in results if len(result) > 0]
+        if not results:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(results, ignore_index=True)
+    
+    def _log_sample(self, df: pd.DataFrame, max_cols: int, mark_codes: bool = False, max_rows: int = 50):
+        """Muestra las primeras filas del archivo (solo con nivel DEBUG)"""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        
+        for i in range(min(max_rows, len(df))):
+            row_values = []
+            for j in range(min(max_cols, len(df.columns))):
+                cell = df.iloc[i, j]
+                if pd.notna(cell):
+                    marker = ""
+                    if mark_codes:
+                        code = parse_engine.to_float(str(cell).strip())
+                        if code is not None and np.isfinite(code) and 1 <= int(code) <= 999999:
+                            marker = " [CÓDIGO?]"
+                    row_values.append(f"Col{j}:'{str(cell)[:30]}'{marker}")
+            
+            logger.debug("F%2d: %s", i, ' | '.join(row_values) if row_values else "[VACÍA]")
+    
+    def _parse_curva_abc_frame(self, df: pd.DataFrame, state: Dict = None) -> pd.DataFrame:
+        """
+        Parser columnar de la Curva ABC: clasifica filas (servicio, curva,
+        producto) con máscaras sobre toda la hoja y extrae código,
+        descripción y consumo en bloque. En modo streaming, state guarda el
+        servicio y la curva vigentes al final del bloque anterior
+        """
+        columns = CURVA_ABC_COLUMNS
+        state = state if state is not None else {'servicio': "Servicio General", 'curva': "C"}
+        
+        if df.empty:
+            return self._clean_curva_dataframe(pd.DataFrame(columns=columns))
+        
+        matrix = parse_engine.CellMatrix(df)
+        n_rows = matrix.n_rows
+        
+        # Solo las filas con alguna palabra clave en un texto pueden ser servicio o curva
+        candidates = np.flatnonzero(matrix.rows_with_keywords(['Servicio', 'Desayuno', 'Almuerzo', 'Cena', 'Curva']))
+        candidate_str = pd.Series([matrix.row_text(idx) for idx in candidates], dtype=object)
+        
+        def has(text):
+            return candidate_str.str.contains(text, regex=False).to_numpy(dtype=bool)
+        
+        # Detectar servicio (múltiples patrones)
+        service_hit = ((has("Servicio") & has(":")) |
+                       (has("10000") & has("Desayuno")) |
+                       (has("10001") & has("Almuerzo")) |
+                       (has("10003") & has("Cena")))
+        
+        # Detectar curva ABC (solo si la fila no es de servicio)
+        has_a, has_b, has_c = has("Curva A"), has("Curva B"), has("Curva C")
+        curva_hit = ~service_hit & (has_a | has_b | has_c)
+        
+        is_service = np.zeros(n_rows, dtype=bool)
+        is_service[candidates[service_hit]] = True
+        is_curva = np.zeros(n_rows, dtype=bool)
+        is_curva[candidates[curva_hit]] = True
+        
+        service_labels = np.full(n_rows, None, dtype=object)
+        for idx, text in zip(candidates[service_hit], candidate_str[service_hit]):
+            service_labels[idx] = self._extract_service_name(text)
+            log_event(logger, logging.DEBUG, "servicio_detectado", fila=df.index[idx],
+                      servicio=service_labels[idx])
+        
+        curva_labels = np.full(n_rows, None, dtype=object)
+        curva_labels[candidates[curva_hit]] = np.select(
+            [has_a, has_b, has_c], ['A', 'B', 'C'], ''
+        )[curva_hit]
+        
+        current_service = parse_engine.forward_fill_labels(service_labels, state['servicio'])
+        current_curva = parse_engine.forward_fill_labels(curva_labels, state['curva'])
+        state['servicio'], state['curva'] = current_service[-1], current_curva[-1]
+        
+        # Perfil de layout: columnas fijas de la plantilla, si ya se conoce
+        profile = self._layout_profile('curva_abc', df, state)
+        
+        # Código: primera columna (de las 6 primeras) con código válido
+        code_col, code_value, has_code = parse_engine.find_product_codes(
+            matrix, ~is_service & ~is_curva, expected_col=profile.code_col if profile else None
+        )
+        
+        # Consumo: primer valor numérico positivo a la derecha del código
+        def evaluate_consumption(matrix, rows, col):
+            values = parse_engine.cell_floats(matrix, rows, col, comma_as_decimal=True)
+            return values > 0, values
+        
+        consumption_col, has_consumption, consumption = parse_engine.first_match_after(
+            matrix, code_col, has_code, evaluate_consumption,
+            expected_col=profile.columns['consumo'] if profile else None
+        )
+        
+        # Descripción: primer texto (> 2 caracteres, no numérico, sin "Total") a la derecha
+        def description_or_none(text):
+            text = text.strip()
+            if len(text) > 2 and not text.replace('.', '').replace(',', '').isdigit() and "Total" not in text:
+                return text
+            return None
+        
+        def descriptions_or_none(texts, unicode):
+            stripped, exact = parse_engine.strip_texts(texts, unicode)
+            valid = ((np.char.str_len(stripped) > 2) & ~parse_engine.digits_without(stripped, '.,') &
+                     (np.char.find(stripped, "Total") < 0))
+            descriptions = np.where(valid, stripped.astype(object), None)
+            descriptions[~exact] = [description_or_none(text) for text in texts[~exact]]
+            return descriptions
+        
+        def evaluate_description(matrix, rows, col):
+            descriptions = matrix.map_texts(rows, col, descriptions_or_none, vectorized=True)
+            return np.not_equal(descriptions, None), descriptions
+        
+        is_product = has_code & has_consumption
+        description_col, has_description, description = parse_engine.first_match_after(
+            matrix, code_col, is_product, evaluate_description,
+            expected_col=profile.columns['descripcion'] if profile else None
+        )
+        
+        product_rows = np.flatnonzero(is_product)
+        if len(product_rows) == 0:
+            return self._clean_curva_dataframe(pd.DataFrame(columns=columns))
+        
+        if profile is None:
+            self._learn_layout_profile('curva_abc', state, code_col[product_rows], {
+                'descripcion': description_col[product_rows],
+                'consumo': consumption_col[product_rows],
+            })
+        
+        result_df = pd.DataFrame({
+            'codigo': code_value[product_rows].astype(str).astype(object),
+            'descripcion': np.where(has_description[product_rows], description[product_rows], "Sin descripción"),
+            'unidad': "Und",
+            'consumo': consumption[product_rows].astype(float),
+            'costo_unit': 0,
+            'costo_total': 0,
+            'curva': current_curva[product_rows],
+            'servicio': current_service[product_rows],
+            'fecha_inicio': "01/09/2025",
+            'fecha_fin': "08/09/2025"
+        }, columns=columns)
+        
+        # Sin pasar por _clean_curva_dataframe: los códigos ya son enteros en
+        # texto, el consumo es positivo y la curva nunca falta
+        return result_df
+    
     def _extract_service_name(self, text: str) -> str:
         """Extrae nombre del servicio de forma inteligente"""
         try:
@@ -215,8 +326,6 @@ class ERPDataProcessor:
     def _extract_analysis_period(self, df: pd.DataFrame):
         """Extrae automáticamente el período de análisis del archivo"""
         try:
-            print("\n📅 Extrayendo período de análisis del archivo...")
-            
             # Buscar fechas en las primeras 20 filas
             for idx, row in df.head(20).iterrows():
                 row_str = ' '.join([str(cell) for cell in row if pd.notna(cell)])
@@ -228,18 +337,20 @@ class ERPDataProcessor:
                         self.analysis_period_end = dates[1]
                         self.analysis_days = self._calculate_period_days(dates[0], dates[1])
                         
-                        print(f"✅ Período detectado: {self.analysis_period_start} - {self.analysis_period_end}")
-                        print(f"✅ Días de análisis: {self.analysis_days}")
+                        log_event(logger, logging.INFO, "periodo_detectado",
+                                  inicio=self.analysis_period_start, fin=self.analysis_period_end,
+                                  dias=self.analysis_days)
                         return
             
             # Si no encuentra fechas, usar defaults
             self.analysis_period_start = "01/09/2025"
             self.analysis_period_end = "08/09/2025"
             self.analysis_days = 8
-            print(f"⚠️ Fechas no detectadas, usando default: {self.analysis_period_start} - {self.analysis_period_end}")
+            log_event(logger, logging.WARNING, "periodo_no_detectado",
+                      inicio=self.analysis_period_start, fin=self.analysis_period_end)
             
         except Exception as e:
-            print(f"Error extrayendo fechas: {e}")
+            logger.warning("Error extrayendo fechas: %s", e)
             self.analysis_period_start = "01/09/2025"
             self.analysis_period_end = "08/09/2025" 
             self.analysis_days = 8
@@ -255,116 +366,6 @@ class ERPDataProcessor:
         except:
             return 8  # Default
     
-    def _is_product_row(self, row: pd.Series) -> bool:
-        """Detecta si es fila de producto (primera celda es número)"""
-        try:
-            first_cell = row.iloc[0]
-            if pd.isna(first_cell):
-                return False
-            
-            # Verificar si es un número (código de producto)
-            first_str = str(first_cell).strip()
-            
-            # Debe ser un número y no ser un total o texto
-            if (first_str.isdigit() and 
-                len(first_str) <= 6 and  # Códigos típicos son <= 6 dígitos
-                "Total" not in str(row.iloc[1] if len(row) > 1 else "")):
-                return True
-            
-            return False
-        except:
-            return False
-    
-    def _extract_product_data_simple(self, row: pd.Series, service: str, 
-                                   dates: Tuple[str, str], curva: str) -> List:
-        """Extrae datos del producto de forma simple y robusta"""
-        try:
-            # Necesitamos al menos código, descripción y consumo
-            if len(row) < 3:
-                return None
-            
-            codigo = str(row.iloc[0]).strip()
-            descripcion = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else "Sin descripción"
-            
-            # Buscar columna de consumo (puede estar en posición 2, 3 o 4)
-            consumo = None
-            unidad = "Und"
-            
-            # Intentar encontrar unidad y consumo
-            for i in range(2, min(len(row), 6)):
-                cell_value = row.iloc[i]
-                if pd.notna(cell_value):
-                    cell_str = str(cell_value).strip()
-                    
-                    # Si parece unidad (texto corto)
-                    if len(cell_str) <= 5 and not cell_str.replace('.', '').replace(',', '').isdigit():
-                        unidad = cell_str
-                    
-                    # Si parece consumo (número)
-                    numeric_value = self._safe_numeric_convert(cell_value)
-                    if numeric_value is not None and numeric_value > 0 and consumo is None:
-                        consumo = numeric_value
-                        break
-            
-            # Si no encontró consumo, intentar posición fija
-            if consumo is None:
-                for i in [3, 2, 4]:  # Posiciones típicas para consumo
-                    if i < len(row):
-                        consumo = self._safe_numeric_convert(row.iloc[i])
-                        if consumo is not None and consumo > 0:
-                            break
-            
-            # Validar que tenemos datos mínimos
-            if consumo is None or consumo <= 0:
-                return None
-            
-            # Extraer costos opcionales
-            costo_unit = 0
-            costo_total = 0
-            
-            # Buscar costos en las últimas columnas
-            for i in range(len(row)-1, max(3, len(row)-4), -1):
-                if i < len(row):
-                    value = self._safe_numeric_convert(row.iloc[i])
-                    if value is not None and value > 0:
-                        if costo_total == 0:
-                            costo_total = value
-                        elif costo_unit == 0:
-                            costo_unit = value
-            
-            fecha_inicio, fecha_fin = dates if dates else ("01/09/2025", "08/09/2025")
-            
-            print(f"  -> Extraído: {codigo} | {descripcion[:20]} | {unidad} | {consumo}")
-            
-            return [codigo, descripcion, unidad, consumo, costo_unit, 
-                   costo_total, curva, service, fecha_inicio, fecha_fin]
-            
-        except Exception as e:
-            print(f"  -> Error extrayendo: {str(e)}")
-            return None
-    
-    def _safe_numeric_convert(self, value):
-        """Convierte valor a numérico de manera segura"""
-        if pd.isna(value):
-            return 0
-        
-        try:
-            # Limpiar formato de números
-            if isinstance(value, str):
-                # Remover espacios, comas como separadores de miles
-                cleaned = value.replace(' ', '').replace(',', '')
-                # Si hay punto seguido de exactamente 2 dígitos, es decimal
-                if '.' in cleaned and len(cleaned.split('.')[-1]) <= 2:
-                    return float(cleaned)
-                # Si hay punto pero más de 2 dígitos después, es separador de miles
-                elif '.' in cleaned:
-                    cleaned = cleaned.replace('.', '')
-                return float(cleaned)
-            
-            return float(value)
-        except:
-            return 0
-    
     def _clean_curva_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Limpia el DataFrame de curva ABC"""
         # Eliminar filas sin código o consumo válido
@@ -381,187 +382,269 @@ class ERPDataProcessor:
     
     def process_stock(self, file_path: str) -> pd.DataFrame:
         """
-        Procesa el archivo de stock con debugging específico para productos problema
+        Procesa el archivo de stock por bodega, con familias de productos
         """
         try:
-            print("Iniciando procesamiento de Stock...")
-            
-            # Leer archivo
-            df = pd.read_excel(file_path, header=None)
-            print(f"Archivo stock leído: {df.shape[0]} filas, {df.shape[1]} columnas")
-            
-            # Debug: mostrar estructura real con más detalle
-            print("\n=== MUESTRA ARCHIVO STOCK (DETALLADO) ===")
-            for i in range(min(50, len(df))):
-                row_values = []
-                for j in range(min(10, len(df.columns))):
-                    cell = df.iloc[i, j]
-                    if pd.notna(cell):
-                        cell_str = str(cell)[:30]
-                        # Detectar si parece código de producto
-                        is_code = False
-                        try:
-                            code = int(float(str(cell).strip()))
-                            if 1 <= code <= 999999:
-                                is_code = True
-                        except:
-                            pass
-                        
-                        marker = " [CÓDIGO?]" if is_code else ""
-                        row_values.append(f"Col{j}:'{cell_str}'{marker}")
-                
-                if row_values:
-                    print(f"F{i:2d}: {' | '.join(row_values)}")
-                else:
-                    print(f"F{i:2d}: [VACÍA]")
-            print("=== FIN MUESTRA STOCK ===\n")
-            
-            stock_data = []
-            current_family = "Sin familia"
-            
-            for idx, row in df.iterrows():
-                try:
-                    # DEBUG ESPECÍFICO para productos problema 453 y 641
-                    row_str = ' '.join([str(cell) for cell in row if pd.notna(cell)])
-                    if any(code in row_str for code in ['453', '641']):
-                        print(f"\n🔍 DEBUG STOCK FILA {idx} - PRODUCTO PROBLEMA:")
-                        print(f"   Fila completa: {row_str}")
-                        for col_idx, cell in enumerate(row):
-                            if pd.notna(cell):
-                                print(f"   Col{col_idx}: '{cell}'")
-                    
-                    # Detectar familia (igual que antes)
-                    if self._is_family_header(row_str):
-                        current_family = self._extract_family_name(row_str)
-                        print(f"Familia detectada: {current_family}")
-                        continue
-                    
-                    # Buscar productos usando enfoque similar a ABC pero MÁS FLEXIBLE
-                    for col_idx in range(min(6, len(row))):  # Aumentado a 6 columnas
-                        cell = row.iloc[col_idx]
-                        if pd.isna(cell):
-                            continue
-                        
-                        cell_str = str(cell).strip()
-                        
-                        # Intentar detectar código de producto
-                        try:
-                            code = int(float(cell_str))
-                            if 1 <= code <= 999999:  # Rango válido de códigos
-                                
-                                # Buscar descripción, unidad y stock con criterios MÁS FLEXIBLES
-                                description = "Sin descripción"
-                                unit = "Und"
-                                stock_value = 0
-                                price = 0
-                                total = 0
-                                
-                                for search_col in range(col_idx + 1, len(row)):
-                                    search_cell = row.iloc[search_col]
-                                    if pd.isna(search_cell):
-                                        continue
-                                    
-                                    search_str = str(search_cell).strip()
-                                    
-                                    # CRITERIO MÁS FLEXIBLE para descripción - PERMITE "LIMON" (5 caracteres)
-                                    if (description == "Sin descripción" and 
-                                        len(search_str) >= 3 and  # REDUCIDO de >5 a >=3 para "LIMON"
-                                        not search_str.replace('.', '').replace(',', '').replace('-', '').isdigit() and
-                                        "Total" not in search_str):
-                                        description = search_str
-                                        # DEBUG específico para productos problema
-                                        if code in [453, 641]:
-                                            print(f"   ✅ DESCRIPCIÓN ENCONTRADA: '{description}'")
-                                        continue
-                                    
-                                    # Si es texto corto, puede ser unidad
-                                    if (unit == "Und" and 
-                                        len(search_str) <= 5 and 
-                                        not search_str.replace('.', '').replace(',', '').isdigit()):
-                                        unit = search_str
-                                        continue
-                                    
-                                    # Si es número, puede ser stock, precio o total
-                                    try:
-                                        numeric_val = float(search_str.replace(',', '.'))
-                                        if stock_value == 0:
-                                            stock_value = numeric_val
-                                            # DEBUG específico para productos problema
-                                            if code in [453, 641]:
-                                                print(f"   ✅ STOCK ENCONTRADO: {stock_value}")
-                                        elif price == 0:
-                                            price = numeric_val
-                                        elif total == 0:
-                                            total = numeric_val
-                                    except:
-                                        continue
-                                
-                                # VALIDACIÓN MÁS FLEXIBLE - Si encontramos código + descripción válida
-                                if description != "Sin descripción" or len(str(search_str).strip()) >= 3:
-                                    # DEBUG específico antes de agregar
-                                    if code in [453, 641]:
-                                        print(f"   🎯 VALIDANDO PRODUCTO {code}:")
-                                        print(f"      Código: {code}")
-                                        print(f"      Descripción: '{description}'")
-                                        print(f"      Stock: {stock_value}")
-                                        print(f"      ¿Se agregará?: SÍ")
-                                    
-                                    product_data = [
-                                        str(code), description, unit, stock_value, 
-                                        price, total, current_family
-                                    ]
-                                    stock_data.append(product_data)
-                                    print(f"✓ STOCK: {code} - {description[:30]} - Stock: {stock_value}")
-                                    break  # No buscar más en esta fila
-                                else:
-                                    # DEBUG específico para productos problema que no pasan validación
-                                    if code in [453, 641]:
-                                        print(f"   ❌ PRODUCTO {code} NO PASÓ VALIDACIÓN:")
-                                        print(f"      Descripción encontrada: '{description}'")
-                                        print(f"      Longitud descripción: {len(description)}")
-                        
-                        except ValueError:
-                            continue
-                
-                except Exception as e:
-                    # DEBUG específico para errores en productos problema
-                    if any(code in str(row.values) for code in ['453', '641']):
-                        print(f"   💥 ERROR procesando fila con productos problema: {str(e)}")
-                    continue
-            
-            print(f"\nProductos de stock encontrados: {len(stock_data)}")
+            start = time.perf_counter()
+            if self.chunk_rows:
+                result_df = self._process_stock_chunks(file_path)
+            else:
+                result_df = self._process_stock_full(file_path)
+            result_df = schema.apply_schema(result_df, schema.STOCK_SCHEMA)
+            self.parse_seconds['stock'] = time.perf_counter() - start
             
-            # DEBUG FINAL: Verificar si se encontraron los productos problema
-            print(f"\n🔍 VERIFICACIÓN FINAL - ¿Se encontraron los productos problema?")
-            for code in ['453', '641']:
-                found = any(product[0] == str(code) for product in stock_data)
-                print(f"   Producto {code}: {'✅ ENCONTRADO' if found else '❌ NO ENCONTRADO'}")
+            log_event(logger, logging.INFO, "stock_procesado", productos=len(result_df),
+                      segundos=round(self.parse_seconds['stock'], 3))
             
-            if stock_data:
-                columns = ['codigo', 'descripcion', 'unidad', 'stock', 'precio', 'total', 'familia']
-                result_df = pd.DataFrame(stock_data, columns=columns)
-                result_df = self._clean_stock_dataframe(result_df)
-                
-                print(f"DataFrame stock final: {len(result_df)} productos")
-                
-                # DEBUG FINAL en DataFrame: Verificar productos problema
-                print(f"\n🔍 VERIFICACIÓN EN DATAFRAME FINAL:")
-                for code in ['453', '641']:
-                    if str(code) in result_df['codigo'].values:
-                        row = result_df[result_df['codigo'] == str(code)].iloc[0]
-                        print(f"   ✅ {code} en DataFrame: {row['descripcion']} - Stock: {row['stock']}")
-                    else:
-                        print(f"   ❌ {code} NO está en DataFrame final")
-                
+            if len(result_df) > 0:
+                self.tracer.trace_frame("stock", result_df, ['descripcion', 'stock', 'familia'])
                 self.stock_data = result_df
                 return result_df
             else:
                 raise Exception("No se encontraron productos válidos en el archivo de stock")
                 
         except Exception as e:
-            print(f"Error en process_stock: {str(e)}")
+            logger.error("Error en process_stock: %s", e)
             raise Exception(f"Error procesando archivo de stock: {str(e)}")
     
+    def _process_stock_full(self, file_path: str) -> pd.DataFrame:
+        """Lee la hoja completa y la parsea de una vez"""
+        # Leer archivo
+        df, backend = excel_reader.read_sheet(file_path, self.excel_backends)
+        self.reader_backends['stock'] = backend
+        log_event(logger, logging.INFO, "stock_leido", filas=df.shape[0], columnas=df.shape[1],
+                  backend=backend)
+        
+        # Debug: estructura real, marcando celdas que parecen código
+        self._log_sample(df, max_cols=10, mark_codes=True)
+        
+        return self._parse_stock_frame(df)
+    
+    def _process_stock_chunks(self, file_path: str) -> pd.DataFrame:
+        """Lee y parsea la hoja por bloques, arrastrando la familia vigente"""
+        state = {'familia': "Sin familia"}
+        results = []
+        n_rows = 0
+        for chunk, backend in excel_reader.iter_sheet_chunks(file_path, self.chunk_rows, self.excel_backends):
+            if not results:
+                self.reader_backends['stock'] = backend
+                self._log_sample(chunk, max_cols=10, mark_codes=True)
+            results.append(self._parse_stock_frame(chunk, state))
+            n_rows += len(chunk)
+        
+        log_event(logger, logging.INFO, "stock_leido", filas=n_rows, bloques=len(results),
+                  backend=self.reader_backends.get('stock'))
+        return self._concat_chunk_results(results, STOCK_COLUMNS)
+    
+    def _parse_stock_frame(self, df: pd.DataFrame, state: Dict = None) -> pd.DataFrame:
+        """
+        Parser columnar del stock: detecta familias con una máscara, propaga
+        la familia hacia abajo y extrae descripción, unidad, stock, precio y
+        total recorriendo por columnas a la derecha del código. En modo
+        streaming, state guarda la familia vigente al final del bloque anterior
+        """
+        columns = STOCK_COLUMNS
+        state = state if state is not None else {'familia': "Sin familia"}
+        
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+        
+        matrix = parse_engine.CellMatrix(df)
+        n_rows = matrix.n_rows
+        
+        # Headers de familia: "101 LACTEOS". Solo filas compuestas de dígitos,
+        # mayúsculas y espacios (o enteros no negativos) pueden calzar
+        with np.errstate(invalid='ignore'):
+            whole_numbers = (matrix.numbers >= 0) & (np.trunc(matrix.numbers) == matrix.numbers)
+        candidates = np.flatnonzero(matrix.rows_all_cells(r'[\dA-ZÁÉÍÓÚÑ\s]*', whole_numbers))
+        
+        is_family = np.zeros(n_rows, dtype=bool)
+        family_labels = np.full(n_rows, None, dtype=object)
+        for idx in candidates:
+            row_str = matrix.row_text(idx)
+            if self._is_family_header(row_str):
+                is_family[idx] = True
+                family_labels[idx] = self._extract_family_name(row_str)
+                log_event(logger, logging.DEBUG, "familia_detectada", fila=df.index[idx],
+                          familia=family_labels[idx])
+        
+        current_family = parse_engine.forward_fill_labels(family_labels, state['familia'])
+        state['familia'] = current_family[-1]
+        
+        # Perfil de layout: columnas fijas de la plantilla, si ya se conoce
+        profile = self._layout_profile('stock', df, state)
+        
+        # Código: primera columna (de las 6 primeras) con código válido
+        code_col, code_value, has_code = parse_engine.find_product_codes(
+            matrix, ~is_family, expected_col=profile.code_col if profile else None
+        )
+        
+        def description_or_none(text):
+            text = text.strip()
+            if (len(text) >= 3 and
+                not text.replace('.', '').replace(',', '').replace('-', '').isdigit() and
+                "Total" not in text):
+                return text
+            return None
+        
+        def unit_or_none(text):
+            text = text.strip()
+            if len(text) <= 5 and not text.replace('.', '').replace(',', '').isdigit():
+                return text
+            return None
+        
+        # Recorrido por columnas a la derecha del código. Cada celda se usa, en
+        # orden de prioridad, como descripción, unidad o valor numérico; stock,
+        # precio y total son los tres primeros valores distintos de cero.
+        # Como en el parser original, "Sin descripción" y "Und" marcan el rol
+        # sin asignar: una celda con ese texto lo deja abierto para la siguiente
+        description = np.full(n_rows, "Sin descripción", dtype=object)
+        unit = np.full(n_rows, "Und", dtype=object)
+        amounts = np.zeros((n_rows, 3))
+        amount_seen = np.zeros((n_rows, 3), dtype=bool)
+        n_amounts = np.zeros(n_rows, dtype=np.int64)
+        # Columnas de origen de cada rol, para inferir el perfil de layout
+        description_col = np.full(n_rows, -1, dtype=np.int64)
+        unit_col = np.full(n_rows, -1, dtype=np.int64)
+        amount_cols = np.full((n_rows, 3), -1, dtype=np.int64)
+        
+        # Con perfil, las filas que calzan con la plantilla se leen de sus columnas
+        searching = has_code.copy()
+        if profile is not None:
+            fixed = self._read_stock_profile_columns(matrix, profile, has_code & (code_col == profile.code_col),
+                                                     description_or_none, unit_or_none)
+            if fixed is not None:
+                rows, row_description, row_unit, row_amounts = fixed
+                description[rows] = row_description
+                unit[rows] = row_unit
+                amounts[rows] = row_amounts
+                amount_seen[rows] = True
+                searching[rows] = False
+        
+        for j in range(1, matrix.n_cols):
+            active = np.flatnonzero(searching & matrix.notna[:, j] & (code_col < j))
+            if len(active) == 0:
+                continue
+            
+            # Los números planos no pueden ser descripción ni unidad
+            textual = ~parse_engine.plain_numbers(matrix, active, j)
+            cell_description = np.full(len(active), None, dtype=object)
+            cell_unit = np.full(len(active), None, dtype=object)
+            cell_description[textual] = matrix.map_texts(active[textual], j, description_or_none)
+            cell_unit[textual] = matrix.map_texts(active[textual], j, unit_or_none)
+            
+            take_description = (description[active] == "Sin descripción") & np.not_equal(cell_description, None)
+            take_unit = (~take_description & (unit[active] == "Und") &
+                         np.not_equal(cell_unit, None))
+            description[active[take_description]] = cell_description[take_description]
+            unit[active[take_unit]] = cell_unit[take_unit]
+            description_col[active[take_description]] = j
+            unit_col[active[take_unit]] = j
+            
+            rest = active[~take_description & ~take_unit & (n_amounts[active] < 3)]
+            values, numeric = parse_engine.cell_numbers(matrix, rest, j, comma_as_decimal=True)
+            filled, values = rest[numeric], values[numeric]
+            slot = n_amounts[filled]
+            amounts[filled, slot] = values
+            amount_seen[filled, slot] = True
+            amount_cols[filled, slot] = j
+            n_amounts[filled[values != 0]] += 1
+        
+        # Validación: descripción encontrada o última celda a la derecha con 3+ caracteres
+        has_description = description != "Sin descripción"
+        last_col, has_last = parse_engine.last_non_empty_after(matrix, code_col)
+        check_rows = np.flatnonzero(has_code & ~has_description & has_last)
+        long_last = np.zeros(n_rows, dtype=bool)
+        long_last[check_rows] = parse_engine.map_cells_at(
+            matrix, check_rows, last_col[check_rows], lambda text: len(text.strip()) >= 3
+        ).astype(bool)
+        
+        product_rows = np.flatnonzero(has_code & (has_description | long_last))
+        if len(product_rows) == 0:
+            return pd.DataFrame(columns=columns)
+        
+        if profile is None:
+            self._learn_layout_profile('stock', state, code_col[product_rows], {
+                'descripcion': description_col[product_rows],
+                'unidad': unit_col[product_rows],
+                'stock': amount_cols[product_rows, 0],
+                'precio': amount_cols[product_rows, 1],
+                'total': amount_cols[product_rows, 2],
+            }, order=['descripcion', 'unidad', 'stock', 'precio', 'total'])
+        
+        result = {
+            'codigo': code_value[product_rows].astype(str).astype(object),
+            'descripcion': description[product_rows],
+            'unidad': unit[product_rows],
+        }
+        # Sin ningún valor numérico la columna queda entera (0), igual que el default
+        for slot, name in enumerate(['stock', 'precio', 'total']):
+            if amount_seen[product_rows, slot].any():
+                result[name] = amounts[product_rows, slot]
+            else:
+                result[name] = np.zeros(len(product_rows), dtype=np.int64)
+        result['familia'] = current_family[product_rows]
+        
+        return self._clean_stock_dataframe(pd.DataFrame(result, columns=columns))
+    
+    def _read_stock_profile_columns(self, matrix: parse_engine.CellMatrix, profile: layout_profile.LayoutProfile,
+                                    candidates: np.ndarray, description_or_none, unit_or_none):
+        """
+        Lectura directa de las columnas del perfil de stock. Una fila calza si
+        a la derecha del código solo tiene celdas en las columnas del perfil,
+        descripción y unidad válidas y stock y precio numéricos distintos de
+        cero: para ella el recorrido por columnas daría el mismo resultado.
+        Retorna (filas, descripción, unidad, montos) o None
+        """
+        roles = ['descripcion', 'unidad', 'stock', 'precio', 'total']
+        role_cols = [profile.columns[role] for role in roles]
+        if max(role_cols) >= matrix.n_cols:
+            return None
+        
+        others = np.ones(matrix.n_cols, dtype=bool)
+        others[:profile.code_col + 1] = False
+        others[role_cols] = False
+        rows = np.flatnonzero(candidates & matrix.notna[:, role_cols].all(axis=1) &
+                              ~matrix.notna[:, others].any(axis=1))
+        
+        description_col, unit_col = role_cols[:2]
+        textual = (~parse_engine.plain_numbers(matrix, rows, description_col) &
+                   ~parse_engine.plain_numbers(matrix, rows, unit_col))
+        rows = rows[textual]
+        description = matrix.map_texts(rows, description_col, description_or_none)
+        unit = matrix.map_texts(rows, unit_col, unit_or_none)
+        # "Sin descripción" y "Und" dejan el rol abierto: esas filas van al recorrido
+        fits = (np.not_equal(description, None) & np.not_equal(unit, None) &
+                (description != "Sin descripción") & (unit != "Und"))
+        
+        amounts = np.zeros((len(rows), 3))
+        for slot, col in enumerate(role_cols[2:]):
+            values, numeric = parse_engine.cell_numbers(matrix, rows, col, comma_as_decimal=True)
+            fits &= numeric
+            if slot < 2:
+                # Un cero no avanza al siguiente monto en el recorrido
+                fits &= values != 0
+            amounts[:, slot] = values
+        
+        return rows[fits], description[fits], unit[fits], amounts[fits]
+    
+    def _layout_profile(self, kind: str, df: pd.DataFrame, state: Dict):
+        """Perfil conocido de la plantilla del archivo (se busca en su primer bloque)"""
+        if 'huella' not in state:
+            state['huella'] = layout_profile.template_fingerprint(kind, df)
+            state['perfil'] = layout_profile.lookup(state['huella'])
+            if state['perfil'] is not None:
+                log_event(logger, logging.DEBUG, "perfil_reutilizado", tipo=kind, huella=state['huella'])
+        return state['perfil']
+    
+    def _learn_layout_profile(self, kind: str, state: Dict, code_cols: np.ndarray,
+                              role_cols: Dict[str, np.ndarray], order: List[str] = None):
+        """Infiere el perfil desde las filas recién parseadas y lo guarda para los archivos siguientes"""
+        profile = layout_profile.infer_profile(kind, state['huella'], code_cols, role_cols, order)
+        if profile is not None:
+            layout_profile.remember(profile)
+            state['perfil'] = profile
+    
     def _is_family_header(self, text: str) -> bool:
         """Detecta headers de familia"""
         text = text.strip()
@@ -577,100 +660,6 @@ class ERPDataProcessor:
         except:
             return "Sin familia"
     
-    def _is_stock_product_row(self, row: pd.Series) -> bool:
-        """Detecta filas de productos en stock"""
-        try:
-            if len(row) < 4:  # Mínimo: código, descripción, unidad, stock
-                return False
-            
-            first_cell = str(row.iloc[0]).strip()
-            
-            # Debe ser código numérico y tener descripción
-            if (first_cell.isdigit() and 
-                len(first_cell) <= 6 and
-                pd.notna(row.iloc[1]) and
-                str(row.iloc[1]).strip() != ""):
-                return True
-            
-            return False
-        except:
-            return False
-    
-    def _extract_stock_product_simple(self, row: pd.Series, family: str) -> List:
-        """Extrae producto de stock usando búsqueda flexible"""
-        try:
-            # Buscar código en las primeras columnas
-            codigo = None
-            descripcion = "Sin descripción"
-            unidad = "Und" 
-            stock = 0
-            precio = 0
-            total = 0
-            
-            # Buscar código de producto
-            for col_idx in range(min(4, len(row))):
-                cell = row.iloc[col_idx]
-                if pd.isna(cell):
-                    continue
-                
-                cell_str = str(cell).strip()
-                
-                try:
-                    code = int(float(cell_str))
-                    if 1 <= code <= 999999:
-                        codigo = str(code)
-                        
-                        # Buscar descripción, unidad y valores en columnas siguientes
-                        for search_col in range(col_idx + 1, len(row)):
-                            search_cell = row.iloc[search_col]
-                            if pd.isna(search_cell):
-                                continue
-                            
-                            search_str = str(search_cell).strip()
-                            
-                            # Buscar descripción (texto largo, no número)
-                            if (descripcion == "Sin descripción" and 
-                                len(search_str) > 5 and 
-                                not search_str.replace('.', '').replace(',', '').isdigit() and
-                                "Total" not in search_str):
-                                descripcion = search_str
-                                continue
-                            
-                            # Buscar unidad (texto corto)
-                            if (unidad == "Und" and 
-                                len(search_str) <= 5 and 
-                                not search_str.replace('.', '').replace(',', '').isdigit()):
-                                unidad = search_str
-                                continue
-                            
-                            # Buscar valores numéricos (stock, precio, total)
-                            try:
-                                numeric_val = float(search_str.replace(',', '.'))
-                                if numeric_val >= 0:
-                                    if stock == 0:
-                                        stock = numeric_val
-                                    elif precio == 0:
-                                        precio = numeric_val
-                                    elif total == 0:
-                                        total = numeric_val
-                            except:
-                                continue
-                        
-                        # Validar que tenemos datos mínimos
-                        if descripcion != "Sin descripción":
-                            print(f"✓ STOCK: {codigo} - {descripcion[:30]} - Stock: {stock}")
-                            return [codigo, descripcion, unidad, stock, precio, total, family]
-                        
-                        break  # No buscar más códigos en esta fila
-                
-                except ValueError:
-                    continue
-            
-            return None
-            
-        except Exception as e:
-            return None
-    
     def _clean_stock_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Limpia DataFrame de stock"""
         # Eliminar filas sin código
@@ -685,22 +674,83 @@ class ERPDataProcessor:
         return df.reset_index(drop=True)
     
     def calculate_coverage_analysis(self, days_period: int = 8) -> pd.DataFrame:
-        print(f"\n🚨 INICIANDO ANÁLISIS DE COBERTURA")
-        print(f"📊 ABC disponible: {len(self.curva_abc_data) if self.curva_abc_data is not None else 'None'}")
-        print(f"📦 Stock disponible: {len(self.stock_data) if self.stock_data is not None else 'None'}")
-        
         if self.curva_abc_data is None or self.stock_data is None:
             raise Exception("Debe procesar ambos archivos primero")
         
-        print(f"\n=== ANÁLISIS EXPERTO DE COBERTURA ===")
-        print(f"📊 Productos Curva ABC: {len(self.curva_abc_data)}")
-        print(f"📦 Productos Stock: {len(self.stock_data)}")
-        print(f"📅 Período de análisis: {days_period} días")
+        log_event(logger, logging.INFO, "cobertura_inicio",
+                  productos_abc=len(self.curva_abc_data), productos_stock=len(self.stock_data),
+                  dias_periodo=days_period)
+        
+        # PASOS 1-2: consumo consolidado (se reutiliza mientras no cambie la Curva ABC)
+        consumo_consolidado = self._consolidated_consumption(days_period)
+        
+        # PASO 3: Preparar datos para merge
+        try:
+            # Asegurar que códigos sean strings para merge correcto
+            self.stock_data['codigo'] = self.stock_data['codigo'].astype(str).str.strip()
+            
+            self.tracer.trace_frame("paso3_stock", self.stock_data, ['stock'])
+                
+        except Exception as e:
+            logger.error("Error en paso 3 (preparación merge): %s", e)
+            raise e
+        
+        stock_columns = self.stock_data[['codigo', 'descripcion', 'stock', 'familia']]
+        previous = self._reusable_analysis(consumo_consolidado, stock_columns)
+        if previous is None:
+            analysis = self._coverage_for_stock(consumo_consolidado, stock_columns)
+        else:
+            analysis = self._update_coverage(consumo_consolidado, stock_columns, previous)
+        
+        analysis = schema.apply_schema(analysis, schema.ANALYSIS_SCHEMA)
+        
+        # Verificar productos faltantes
+        if len(analysis) < len(self.stock_data):
+            log_event(logger, logging.WARNING, "productos_faltantes",
+                      cantidad=len(self.stock_data) - len(analysis))
+        
+        # Estadísticas finales (solo con nivel DEBUG)
+        if logger.isEnabledFor(logging.DEBUG):
+            analysis_with_consumption = analysis[analysis['consumo_diario'] > 0]
+            log_event(logger, logging.DEBUG, "estadisticas",
+                      con_consumo=len(analysis_with_consumption),
+                      sin_consumo=int((analysis['consumo_diario'] == 0).sum()),
+                      cobertura_promedio=round(analysis_with_consumption['dias_cobertura'].mean(), 1)
+                      if len(analysis_with_consumption) > 0 else None,
+                      menos_3_dias=int((analysis_with_consumption['dias_cobertura'] < 3).sum()),
+                      menos_7_dias=int((analysis_with_consumption['dias_cobertura'] < 7).sum()))
+            for estado, count in analysis['estado_stock'].value_counts().items():
+                log_event(logger, logging.DEBUG, "distribucion_estado", estado=estado, productos=count)
+        
+        # Seguimiento final: dónde se perdió cada código seguido
+        if self.tracer.enabled:
+            self._trace_missing_codes(analysis)
+        
+        log_event(logger, logging.INFO, "cobertura_completada", productos=len(analysis))
+        
+        # Entradas de este análisis, para actualizarlo cuando solo cambie el stock
+        self._coverage_inputs = {
+            'consumo': consumo_consolidado,
+            'stock': stock_columns.copy(),
+            'fecha': date.today(),
+        }
+        self.consolidated_data = analysis
+        return analysis
+    
+    def _consolidated_consumption(self, days_period: int) -> pd.DataFrame:
+        """
+        Pasos 1-2: consumo total y diario por código. El resultado queda
+        guardado y se reutiliza mientras curva_abc_data y days_period no cambien
+        """
+        cached = self._consumption_cache
+        if cached is not None and cached[0] is self.curva_abc_data and cached[1] == days_period:
+            log_event(logger, logging.DEBUG, "consumo_reutilizado", productos=len(cached[2]))
+            return cached[2]
         
-        # PASO 1: Consolidar consumo por código con debugging detallado
-        print(f"\n🔄 PASO 1: Consolidando consumo por producto...")
+        # PASO 1: Consolidar consumo por código
         try:
-            consumo_consolidado = self.curva_abc_data.groupby('codigo').agg({
+            # Sumas en float64 aunque el consumo se guarde en float32
+            consumo_consolidado = self.curva_abc_data.astype({'consumo': float}).groupby('codigo').agg({
                 'descripcion': 'first',
                 'unidad': 'first', 
                 'consumo': 'sum',  # SUMA de todos los servicios
@@ -708,91 +758,55 @@ class ERPDataProcessor:
                 'servicio': 'first'  # Tomar el primer servicio donde aparece
             }).reset_index()
             
-            print(f"✅ Productos consolidados: {len(consumo_consolidado)}")
-            
-            # Debug productos específicos en consolidación
-            for code in ['453', '641']:
-                if code in consumo_consolidado['codigo'].values:
-                    row = consumo_consolidado[consumo_consolidado['codigo'] == code].iloc[0]
-                    print(f"   ✅ {code}: {row['descripcion']} - Consumo: {row['consumo']}")
-                else:
-                    print(f"   ❌ {code}: NO encontrado en consolidación")
+            log_event(logger, logging.DEBUG, "paso1_consolidado", productos=len(consumo_consolidado))
+            self.tracer.trace_frame("paso1_consolidado", consumo_consolidado, ['descripcion', 'consumo'])
                     
         except Exception as e:
-            print(f"💥 ERROR EN PASO 1: {str(e)}")
+            logger.error("Error en paso 1 (consolidación): %s", e)
             raise e
         
         # PASO 2: Calcular consumo promedio diario
-        print(f"\n🧮 PASO 2: Calculando consumo promedio diario...")
         try:
             consumo_consolidado['consumo_diario'] = consumo_consolidado['consumo'] / days_period
             
             # Mostrar ejemplos del cálculo
-            top_consumers = consumo_consolidado.nlargest(3, 'consumo')
-            for _, product in top_consumers.iterrows():
-                print(f"   📈 {product['codigo']}: {product['consumo']:.1f} total ÷ {days_period} días = {product['consumo_diario']:.2f}/día")
-                
-            # Debug productos específicos después del cálculo diario
-            for code in ['453', '641']:
-                if code in consumo_consolidado['codigo'].values:
-                    row = consumo_consolidado[consumo_consolidado['codigo'] == code].iloc[0]
-                    print(f"   ✅ {code}: Consumo diario = {row['consumo_diario']:.2f}")
-                else:
-                    print(f"   ❌ {code}: NO encontrado para cálculo diario")
+            if logger.isEnabledFor(logging.DEBUG):
+                for _, product in consumo_consolidado.nlargest(3, 'consumo').iterrows():
+                    log_event(logger, logging.DEBUG, "paso2_mayor_consumo", codigo=product['codigo'],
+                              consumo=round(product['consumo'], 1),
+                              consumo_diario=round(product['consumo_diario'], 2))
+            self.tracer.trace_frame("paso2_consumo_diario", consumo_consolidado, ['consumo_diario'])
                     
         except Exception as e:
-            print(f"💥 ERROR EN PASO 2: {str(e)}")
+            logger.error("Error en paso 2 (consumo diario): %s", e)
             raise e
         
-        # PASO 3: Preparar datos para merge
-        print(f"\n🔗 PASO 3: Preparando datos para merge...")
-        try:
-            # Asegurar que códigos sean strings para merge correcto
-            print(f"   🔧 Limpiando códigos para merge...")
-            consumo_consolidado['codigo'] = consumo_consolidado['codigo'].astype(str).str.strip()
-            self.stock_data['codigo'] = self.stock_data['codigo'].astype(str).str.strip()
-            
-            print(f"   📊 Consumo consolidado: {len(consumo_consolidado)} productos")
-            print(f"   📦 Stock data: {len(self.stock_data)} productos")
-            
-            # Verificar que los códigos problema están en ambos DataFrames antes del merge
-            for code in ['453', '641']:
-                in_consumo = code in consumo_consolidado['codigo'].values
-                in_stock = code in self.stock_data['codigo'].values
-                print(f"   🔍 {code}: Consumo={in_consumo}, Stock={in_stock}")
-                
-        except Exception as e:
-            print(f"💥 ERROR EN PASO 3: {str(e)}")
-            raise e
+        # Asegurar que códigos sean strings para merge correcto
+        consumo_consolidado['codigo'] = consumo_consolidado['codigo'].astype(str).str.strip()
         
-        # PASO 4: Realizar merge con debugging detallado
-        print(f"\n🔀 PASO 4: Realizando merge RIGHT JOIN...")
+        self._consumption_cache = (self.curva_abc_data, days_period, consumo_consolidado)
+        return consumo_consolidado
+    
+    def _coverage_for_stock(self, consumo_consolidado: pd.DataFrame, stock: pd.DataFrame) -> pd.DataFrame:
+        """Pasos 4-7 para las filas de stock dadas (una fila de resultado por fila de stock)"""
+        # PASO 4: Realizar merge
         try:
             analysis = pd.merge(
                 consumo_consolidado,
-                self.stock_data[['codigo', 'descripcion', 'stock', 'familia']],  # Incluir descripción del stock
+                stock,  # Incluir descripción del stock
                 on='codigo',
                 how='right',  # RIGHT JOIN: incluye TODOS los productos de stock
                 suffixes=('_abc', '_stock')  # Distinguir columnas duplicadas
             )
             
-            print(f"✅ Merge completado: {len(analysis)} productos")
-            
-            # Debug inmediato después del merge
-            for code in ['453', '641']:
-                if code in analysis['codigo'].values:
-                    print(f"   ✅ {code}: PRESENTE en merge")
-                else:
-                    print(f"   ❌ {code}: AUSENTE después del merge")
+            log_event(logger, logging.DEBUG, "paso4_merge", productos=len(analysis))
                     
         except Exception as e:
-            print(f"💥 ERROR EN PASO 4 (MERGE): {str(e)}")
-            print(f"   Columnas consumo_consolidado: {list(consumo_consolidado.columns)}")
-            print(f"   Columnas self.stock_data: {list(self.stock_data.columns)}")
+            logger.error("Error en paso 4 (merge): %s | columnas consumo=%s stock=%s",
+                         e, list(consumo_consolidado.columns), list(stock.columns))
             raise e
         
         # PASO 5: Completar datos faltantes
-        print(f"\n🛠️ PASO 5: Completando datos faltantes...")
         try:
             # Usar descripción del stock cuando no hay en ABC
             analysis['descripcion'] = analysis['descripcion_abc'].fillna(analysis['descripcion_stock'])
@@ -801,175 +815,152 @@ class ERPDataProcessor:
             # Limpiar columnas duplicadas
             analysis = analysis.drop(['descripcion_abc', 'descripcion_stock'], axis=1, errors='ignore')
             
-            analysis['unidad'] = analysis['unidad'].fillna('Und')
+            analysis['unidad'] = schema.fill_labels(analysis['unidad'], 'Und')
             analysis['consumo'] = analysis['consumo'].fillna(0)
-            analysis['curva'] = analysis['curva'].fillna('NO CONSUMIDO')  # Más claro
-            analysis['servicio'] = analysis['servicio'].fillna('No consumido en período')
+            analysis['curva'] = schema.fill_labels(analysis['curva'], 'NO CONSUMIDO')  # Más claro
+            analysis['servicio'] = schema.fill_labels(analysis['servicio'], 'No consumido en período')
             analysis['consumo_diario'] = analysis['consumo_diario'].fillna(0)
             
-            print(f"✅ Datos completados: {len(analysis)} productos")
-            
-            # Debug después de completar datos
-            for code in ['453', '641']:
-                if code in analysis['codigo'].values:
-                    row = analysis[analysis['codigo'] == code].iloc[0]
-                    print(f"   ✅ {code}: {row['descripcion']} - Consumo diario: {row['consumo_diario']:.2f}")
-                else:
-                    print(f"   ❌ {code}: NO encontrado después de completar datos")
+            self.tracer.trace_frame("paso5_completado", analysis, ['descripcion', 'consumo_diario'])
                     
         except Exception as e:
-            print(f"💥 ERROR EN PASO 5: {str(e)}")
+            logger.error("Error en paso 5 (datos faltantes): %s", e)
             raise e
         
         # PASO 6: Calcular días de cobertura
-        print(f"\n⏱️ PASO 6: Calculando días de cobertura...")
         try:
-            analysis['dias_cobertura'] = analysis.apply(
-                lambda row: row['stock'] / row['consumo_diario'] 
-                if row['consumo_diario'] > 0 else 999, axis=1  # 999 = Sin consumo en período
-            )
+            analysis['dias_cobertura'] = self._calculate_coverage_days(analysis)
             
-            print(f"✅ Días de cobertura calculados")
-            
-            # Debug después de calcular cobertura
-            for code in ['453', '641']:
-                if code in analysis['codigo'].values:
-                    row = analysis[analysis['codigo'] == code].iloc[0]
-                    print(f"   ✅ {code}: Stock={row['stock']}, Consumo diario={row['consumo_diario']:.2f}, Cobertura={row['dias_cobertura']:.1f} días")
-                else:
-                    print(f"   ❌ {code}: NO encontrado para cálculo cobertura")
+            self.tracer.trace_frame("paso6_cobertura", analysis, ['stock', 'consumo_diario', 'dias_cobertura'])
                     
         except Exception as e:
-            print(f"💥 ERROR EN PASO 6: {str(e)}")
+            logger.error("Error en paso 6 (cobertura): %s", e)
             raise e
         
         # PASO 7: Clasificar estado y fecha de quiebre
-        print(f"\n🏷️ PASO 7: Clasificando estados...")
         try:
-            analysis['estado_stock'] = analysis.apply(self._classify_stock_status, axis=1)
-            analysis['fecha_quiebre'] = analysis.apply(self._calculate_breakage_date, axis=1)
-            
-            print(f"✅ Estados clasificados")
+            analysis['estado_stock'] = self._classify_stock_status(analysis)
+            analysis['fecha_quiebre'] = self._calculate_breakage_date(analysis)
             
-            # Debug final de los productos problema
-            for code in ['453', '641']:
-                if code in analysis['codigo'].values:
-                    row = analysis[analysis['codigo'] == code].iloc[0]
-                    print(f"   ✅ {code}: Estado={row['estado_stock']}, Fecha quiebre={row['fecha_quiebre']}")
-                else:
-                    print(f"   ❌ {code}: NO encontrado para clasificación")
+            self.tracer.trace_frame("paso7_estado", analysis, ['estado_stock', 'fecha_quiebre'])
                     
         except Exception as e:
-            print(f"💥 ERROR EN PASO 7: {str(e)}")
+            logger.error("Error en paso 7 (clasificación): %s", e)
             raise e
         
-        # ESTADÍSTICAS FINALES
-        print(f"\n📊 ESTADÍSTICAS COMPLETAS DEL ANÁLISIS:")
-        productos_con_consumo = len(analysis[analysis['consumo_diario'] > 0])
-        productos_sin_consumo = len(analysis[analysis['consumo_diario'] == 0])
+        return analysis
+    
+    def _reusable_analysis(self, consumo_consolidado: pd.DataFrame, stock: pd.DataFrame):
+        """
+        Análisis anterior reutilizable fila a fila: mismo consumo consolidado,
+        mismo día (fecha de quiebre) y códigos de stock únicos en ambas
+        versiones. None si hay que calcular todo
+        """
+        inputs = self._coverage_inputs
+        if (inputs is None or self.consolidated_data is None or
+                inputs['consumo'] is not consumo_consolidado or inputs['fecha'] != date.today()):
+            return None
+        if not (inputs['stock']['codigo'].is_unique and stock['codigo'].is_unique):
+            return None
+        return inputs['stock'], self.consolidated_data
+    
+    def _update_coverage(self, consumo_consolidado: pd.DataFrame, stock: pd.DataFrame, previous) -> pd.DataFrame:
+        """
+        Análisis incremental: las filas cuyo stock, descripción y familia no
+        cambiaron se copian del análisis anterior y solo las demás pasan por
+        los pasos 4-7. El orden es el del nuevo stock, igual que el cálculo completo
+        """
+        previous_stock, previous_analysis = previous
+        positions = pd.Index(previous_stock['codigo']).get_indexer(stock['codigo'])
+        known = positions >= 0
         
-        print(f"   • Total productos en stock original: {len(self.stock_data)}")
-        print(f"   • Total productos en análisis final: {len(analysis)}")
-        print(f"   • Con consumo en período: {productos_con_consumo}")
-        print(f"   • Sin consumo en período: {productos_sin_consumo}")
+        unchanged = known.copy()
+        old = previous_stock.iloc[positions[known]]
+        for column in ['descripcion', 'stock', 'familia']:
+            new_values = stock[column].to_numpy(dtype=object)[known]
+            old_values = old[column].to_numpy(dtype=object)
+            unchanged[known] &= (new_values == old_values) | (pd.isna(new_values) & pd.isna(old_values))
         
-        # Verificar productos faltantes
-        if len(analysis) < len(self.stock_data):
-            missing_count = len(self.stock_data) - len(analysis)
-            print(f"   ⚠️ ATENCIÓN: {missing_count} productos del stock no aparecen en análisis")
-        
-        # Estadísticas solo para productos con consumo
-        analysis_with_consumption = analysis[analysis['consumo_diario'] > 0]
-        if len(analysis_with_consumption) > 0:
-            print(f"   • Cobertura promedio (con consumo): {analysis_with_consumption['dias_cobertura'].mean():.1f} días")
-            print(f"   • Productos con <3 días: {len(analysis_with_consumption[analysis_with_consumption['dias_cobertura'] < 3])}")
-            print(f"   • Productos con <7 días: {len(analysis_with_consumption[analysis_with_consumption['dias_cobertura'] < 7])}")
-        
-        # Mostrar distribución por estado
-        print("   • Distribución por estado:")
-        for estado, count in analysis['estado_stock'].value_counts().items():
-            print(f"     - {estado}: {count}")
-        
-        # DEBUG FINAL - PRODUCTOS ESPECÍFICOS
-        print(f"\n🔍 DEBUG FINAL - PRODUCTOS PROBLEMA:")
-        test_codes = ['453', '641']
-        
-        for code in test_codes:
-            print(f"\n📦 Producto {code}:")
-            
-            # ¿Está en ABC?
-            in_abc = self.curva_abc_data['codigo'].astype(str).str.strip().eq(code).any()
-            print(f"   ABC: {'✅' if in_abc else '❌'}")
-            
-            # ¿Está en Stock?
-            in_stock = self.stock_data['codigo'].astype(str).str.strip().eq(code).any()
-            print(f"   Stock: {'✅' if in_stock else '❌'}")
-            
-            # ¿Está en análisis final?
-            in_final = analysis['codigo'].astype(str).str.strip().eq(code).any()
-            print(f"   Final: {'✅' if in_final else '❌'}")
-            
-            if in_final:
-                row = analysis[analysis['codigo'].astype(str).str.strip() == code].iloc[0]
-                print(f"   Estado: {row['estado_stock']}")
-                print(f"   Descripción: {row['descripcion']}")
-                print(f"   Consumo: {row['consumo']}")
-                print(f"   Stock: {row['stock']}")
-                print(f"   Días cobertura: {row['dias_cobertura']:.1f}")
+        changed_rows = np.flatnonzero(~unchanged)
+        log_event(logger, logging.INFO, "cobertura_incremental",
+                  reutilizados=int(unchanged.sum()), recalculados=len(changed_rows))
+        
+        reused = schema.widen_floats(previous_analysis.iloc[positions[unchanged]])
+        reused.index = np.flatnonzero(unchanged)
+        updated = self._coverage_for_stock(consumo_consolidado, stock.iloc[changed_rows])
+        updated.index = changed_rows
+        
+        analysis = pd.concat([part for part in (reused, updated) if len(part)]).sort_index()
+        return analysis[previous_analysis.columns].reset_index(drop=True)
+    
+    def _trace_missing_codes(self, analysis: pd.DataFrame):
+        """Indica en qué archivo falta cada código seguido que no llegó al análisis"""
+        abc_codes = set(self.curva_abc_data['codigo'].astype(str).str.strip())
+        stock_codes = set(self.stock_data['codigo'].astype(str).str.strip())
+        final_codes = set(analysis['codigo'].astype(str).str.strip())
+        
+        for code in sorted(self.tracer.codes - final_codes):
+            in_abc, in_stock = code in abc_codes, code in stock_codes
+            if in_abc and not in_stock:
+                cause = "en ABC pero no en stock"
+            elif not in_abc and in_stock:
+                cause = "en stock pero no en ABC"
+            elif not in_abc and not in_stock:
+                cause = "no está en ningún archivo"
             else:
-                print(f"   🚨 SE PERDIÓ EN EL PROCESO")
-                
-                # Investigar dónde se perdió
-                if in_abc and not in_stock:
-                    print(f"   🔍 Causa: Producto está en ABC pero NO en Stock")
-                elif not in_abc and in_stock:
-                    print(f"   🔍 Causa: Producto está en Stock pero NO en ABC")
-                elif not in_abc and not in_stock:
-                    print(f"   🔍 Causa: Producto NO está en ninguno de los archivos")
-                else:
-                    print(f"   🔍 Causa: Error en el merge - está en ambos pero se perdió")
-        
-        print(f"\n🎉 ANÁLISIS COMPLETADO EXITOSAMENTE - {len(analysis)} productos procesados")
+                cause = "se perdió en el merge"
+            log_event(logger, pipeline_log.TRACE, "codigo_perdido", codigo=code, causa=cause)
+            
+    def _calculate_coverage_days(self, analysis: pd.DataFrame) -> pd.Series:
+        """Días de cobertura = stock / consumo diario (999 = sin consumo en período)"""
+        consumo_diario = analysis['consumo_diario'].to_numpy(dtype=float)
+        has_consumption = consumo_diario > 0
+        if not has_consumption.any():
+            return pd.Series(NO_CONSUMPTION_DAYS, index=analysis.index, dtype=np.int64)
         
-        self.consolidated_data = analysis
-        return analysis
-            
-    def _classify_stock_status(self, row) -> str:
+        stock = analysis['stock'].to_numpy(dtype=float)
+        dias = np.full(len(analysis), float(NO_CONSUMPTION_DAYS))
+        dias[has_consumption] = stock[has_consumption] / consumo_diario[has_consumption]
+        return pd.Series(dias, index=analysis.index)
+    
+    def _classify_stock_status(self, analysis: pd.DataFrame) -> pd.Series:
         """Clasifica estado del stock según curva (incluye productos sin consumo)"""
-        try:
-            dias = row['dias_cobertura']
-            curva = row['curva']
-            consumo_diario = row.get('consumo_diario', 0)
-            
-            # Productos sin consumo en el período
-            if consumo_diario == 0 or dias >= 999:
-                return 'NO CONSUMIDO (01/09-08/09)'
-            
-            # Umbrales por curva para productos con consumo
-            umbrales = {'A': 3, 'B': 5, 'C': 7}
-            umbral = umbrales.get(curva, 5)
-            
-            if dias <= umbral:
-                return 'CRÍTICO'
-            elif dias <= umbral * 2:
-                return 'BAJO'
-            elif dias <= umbral * 4:
-                return 'NORMAL'
-            else:
-                return 'ALTO'
-        except:
-            return 'NORMAL'
+        dias = analysis['dias_cobertura'].to_numpy(dtype=float)
+        consumo_diario = (analysis['consumo_diario'].to_numpy(dtype=float)
+                          if 'consumo_diario' in analysis.columns else np.zeros(len(analysis)))
+        
+        # Umbrales por curva para productos con consumo (5 para curvas desconocidas)
+        umbral = analysis['curva'].astype(object).map(STATUS_THRESHOLDS).fillna(5).to_numpy(dtype=float)
+        
+        estados = np.select(
+            [(consumo_diario == 0) | (dias >= NO_CONSUMPTION_DAYS),  # Sin consumo en el período
+             dias <= umbral,
+             dias <= umbral * 2,
+             dias <= umbral * 4],
+            ['NO CONSUMIDO (01/09-08/09)', 'CRÍTICO', 'BAJO', 'NORMAL'],
+            'ALTO'
+        )
+        return pd.Series(estados, index=analysis.index, dtype=object)
     
-    def _calculate_breakage_date(self, row) -> str:
-        """Calcula fecha de quiebre"""
-        try:
-            from datetime import datetime, timedelta
-            
-            if row['consumo_diario'] > 0:
-                dias_restantes = int(row['dias_cobertura'])
-                fecha_quiebre = datetime.now() + timedelta(days=dias_restantes)
-                return fecha_quiebre.strftime('%d/%m/%Y')
-            else:
-                return 'Sin consumo'
-        except:
-            return 'Error cálculo'
+    def _calculate_breakage_date(self, analysis: pd.DataFrame) -> pd.Series:
+        """Calcula fecha de quiebre: hoy + días de cobertura (truncados)"""
+        fechas = np.full(len(analysis), 'Sin consumo', dtype=object)
+        has_consumption = analysis['consumo_diario'].to_numpy(dtype=float) > 0
+        if not has_consumption.any():
+            return pd.Series(fechas, index=analysis.index)
+        
+        today = date.today()
+        dias = np.trunc(analysis['dias_cobertura'].to_numpy(dtype=float)[has_consumption])
+        # Fechas fuera del rango de datetime (años 1-9999) o coberturas no finitas
+        valid = (np.isfinite(dias) &
+                 (dias >= (date.min - today).days) & (dias <= (date.max - today).days))
+        
+        # Un solo arreglo datetime64 de offsets; se formatea una vez por día distinto
+        offsets, inverse = np.unique(dias[valid].astype(np.int64), return_inverse=True)
+        dates = np.datetime64(today, 'D') + offsets.astype('timedelta64[D]')
+        labels = np.array([d.strftime('%d/%m/%Y') for d in dates.astype(object)], dtype=object)
+        
+        breakage = np.full(len(dias), 'Error cálculo', dtype=object)
+        breakage[valid] = labels[inverse.ravel()]
+        fechas[has_consumption] = breakage
+        return pd.Series(fechas, index=analysis.index)
@@ -0,0 +1,203 @@
+"""
+Lectura de hojas Excel del ERP con backends intercambiables.
+
+Todos los backends entregan el mismo DataFrame que
+pd.read_excel(archivo, header=None). Se prueban en orden y, si uno no
+está instalado o falla con el archivo, se pasa al siguiente:
+
+    calamine         pd.read_excel con engine='calamine' (requiere python-calamine)
+    openpyxl_stream  openpyxl read_only + iter_rows(values_only=True)
+    pandas           pd.read_excel por defecto (siempre disponible)
+
+El orden se configura con STOCK_EXCEL_BACKENDS (ej: "openpyxl_stream,pandas").
+
+iter_sheet_chunks lee la hoja por bloques de filas para el modo streaming.
+"""
+import importlib.util
+import logging
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('excel_reader')
+
+DEFAULT_BACKENDS = ['calamine', 'openpyxl_stream', 'pandas']
+
+# Valores de celdas con error de Excel; pandas los lee como NaN
+EXCEL_ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A'}
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def _read_calamine(source) -> pd.DataFrame:
+    return pd.read_excel(source, header=None, engine='calamine')
+
+
+def _convert_value(value):
+    """Conversión de celdas igual a la de pandas con openpyxl"""
+    if value is None:
+        return ""
+    if type(value) is bool:
+        return value
+    if isinstance(value, (int, float)):
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    if isinstance(value, str) and value in EXCEL_ERRORS:
+        return float('nan')
+    return value
+
+
+def _read_openpyxl_stream(source) -> pd.DataFrame:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+
+        data = []
+        last_row_with_data = -1
+        for row_number, values in enumerate(sheet.iter_rows(values_only=True)):
+            row = [_convert_value(value) for value in values]
+            # Quitar celdas vacías al final de la fila
+            while row and row[-1] == "":
+                row.pop()
+            if row:
+                last_row_with_data = row_number
+            data.append(row)
+    finally:
+        workbook.close()
+
+    # Quitar filas vacías al final y completar al ancho máximo
+    data = data[:last_row_with_data + 1]
+    if not data:
+        return pd.DataFrame()
+    max_width = max(len(row) for row in data)
+    data = [row + [""] * (max_width - len(row)) for row in data]
+
+    return TextParser(data, header=None, skip_blank_lines=False).read()
+
+
+def _read_pandas(source) -> pd.DataFrame:
+    return pd.read_excel(source, header=None)
+
+
+# nombre -> (módulo requerido, lector)
+BACKENDS: Dict[str, Tuple[Optional[str], Callable]] = {
+    'calamine': ('python_calamine', _read_calamine),
+    'openpyxl_stream': ('openpyxl', _read_openpyxl_stream),
+    'pandas': (None, _read_pandas),
+}
+
+
+def available_backends() -> List[str]:
+    """Backends cuyo módulo está instalado"""
+    return [name for name, (module, _) in BACKENDS.items()
+            if module is None or importlib.util.find_spec(module) is not None]
+
+
+def configured_backends() -> List[str]:
+    """Orden de backends desde STOCK_EXCEL_BACKENDS (o el orden por defecto)"""
+    names = [name.strip() for name in os.environ.get('STOCK_EXCEL_BACKENDS', '').split(',') if name.strip()]
+    return names or list(DEFAULT_BACKENDS)
+
+
+def read_sheet(source, backends: Optional[List[str]] = None) -> Tuple[pd.DataFrame, str]:
+    """
+    Lee la primera hoja sin headers con el primer backend disponible que
+    funcione. Retorna (DataFrame, nombre del backend usado)
+    """
+    backends = backends or configured_backends()
+    installed = set(available_backends())
+    errors = []
+
+    for name in backends:
+        if name not in BACKENDS:
+            errors.append(f"{name}: backend desconocido")
+            continue
+        if name not in installed:
+            continue
+
+        _rewind(source)
+        try:
+            df = BACKENDS[name][1](source)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "backend_fallido", backend=name, error=str(e))
+            errors.append(f"{name}: {str(e)}")
+            continue
+
+        log_event(logger, logging.DEBUG, "backend_usado", backend=name, filas=df.shape[0])
+        return df, name
+
+    raise Exception(f"No se pudo leer el archivo Excel ({'; '.join(errors) or 'sin backends disponibles'})")
+
+
+def _stream_chunks(source, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+
+        start = 0
+        block = []
+        for values in sheet.iter_rows(values_only=True):
+            row = [_convert_value(value) for value in values]
+            while row and row[-1] == "":
+                row.pop()
+            block.append(row)
+            if len(block) == chunk_rows:
+                yield _block_frame(block, start)
+                start += len(block)
+                block = []
+        if block:
+            yield _block_frame(block, start)
+    finally:
+        workbook.close()
+
+
+def _block_frame(block: List[list], start: int) -> pd.DataFrame:
+    """Bloque de filas como DataFrame sin headers, con índice de fila absoluto"""
+    max_width = max(len(row) for row in block)
+    if max_width == 0:
+        df = pd.DataFrame(index=range(len(block)))
+    else:
+        data = [row + [""] * (max_width - len(row)) for row in block]
+        df = TextParser(data, header=None, skip_blank_lines=False).read()
+    df.index = pd.RangeIndex(start, start + len(block))
+    return df
+
+
+def iter_sheet_chunks(source, chunk_rows: int,
+                      backends: Optional[List[str]] = None) -> Iterator[Tuple[pd.DataFrame, str]]:
+    """
+    Lee la primera hoja en bloques de chunk_rows filas con openpyxl
+    read_only, sin materializar la hoja completa. Si el archivo no se
+    puede leer en streaming (ej: .xls), se lee completo con read_sheet y
+    se entrega en bloques. Genera (bloque, nombre del backend)
+    """
+    if importlib.util.find_spec('openpyxl') is not None:
+        chunks = _stream_chunks(source, chunk_rows)
+        _rewind(source)
+        try:
+            first = next(chunks, None)
+        except Exception as e:
+            log_event(logger, logging.WARNING, "backend_fallido", backend='openpyxl_chunks', error=str(e))
+        else:
+            if first is not None:
+                yield first, 'openpyxl_chunks'
+                for chunk in chunks:
+                    yield chunk, 'openpyxl_chunks'
+            return
+
+    df, backend = read_sheet(source, backends)
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows], backend
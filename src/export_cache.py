@@ -0,0 +1,111 @@
+"""
+Caché de exportaciones (CSV y Excel) compartida entre sesiones.
+
+Cada exportación se genera recién cuando alguien la descarga y sus bytes
+se guardan por huella de los datos y tipo de exportación; las descargas
+repetidas del mismo análisis (en cualquier sesión) salen de la caché. Los
+reruns de Streamlit no serializan nada.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('export_cache')
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def csv_bytes(df: pd.DataFrame) -> bytes:
+    """CSV en UTF-8, igual al que descargaba to_csv(index=False)"""
+    return df.to_csv(index=False).encode('utf-8')
+
+
+class ExportCache:
+    """
+    Caché LRU de bytes por (huella, tipo), limitada por cantidad de entradas
+    y por memoria. Las descargas diferidas de Streamlit corren en otros
+    hilos: una misma exportación pedida dos veces a la vez se genera una vez.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._building = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(len(data) for data in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Tuple):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def _put(self, key: Tuple, data: bytes):
+        if len(data) > self.max_bytes:
+            log_event(logger, logging.INFO, "exportacion_muy_grande", tipo=key[1], bytes=len(data))
+            return
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                log_event(logger, logging.DEBUG, "exportacion_desalojo", tipo=evicted[1])
+
+    def peek(self, fingerprint: str, kind: str) -> Optional[bytes]:
+        """Bytes ya generados de la exportación, sin generarla (None si no está)"""
+        return self._lookup((fingerprint, kind))
+
+    def get(self, fingerprint: str, kind: str, build: Callable[[], bytes]) -> bytes:
+        """
+        Bytes de la exportación kind de los datos con esa huella; en un fallo
+        se generan con build() y quedan en la caché
+        """
+        key = (fingerprint, kind)
+        data = self._lookup(key)
+        if data is None:
+            with self._lock:
+                build_lock = self._building.setdefault(key, threading.Lock())
+            with build_lock:
+                # Otro hilo pudo generarla mientras se esperaba
+                data = self._lookup(key)
+                if data is None:
+                    start = time.perf_counter()
+                    try:
+                        data = build()
+                        if hasattr(data, 'getvalue'):
+                            data = data.getvalue()
+                        self._put(key, data)
+                    finally:
+                        with self._lock:
+                            self._building.pop(key, None)
+                    with self._lock:
+                        self.misses += 1
+                    log_event(logger, logging.INFO, "exportacion_generada", tipo=kind, bytes=len(data),
+                              segundos=round(time.perf_counter() - start, 3))
+                    return data
+
+        with self._lock:
+            self.hits += 1
+        log_event(logger, logging.DEBUG, "exportacion_cache_acierto", tipo=kind)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
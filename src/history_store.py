@@ -0,0 +1,200 @@
+"""
+Historial diario de análisis en SQLite (embebido, sin servidor).
+
+Cada análisis consolidado se agrega como una fila por sitio, día y código
+con stock, consumo diario, cobertura, estado, curva y familia; las
+descripciones se guardan una vez por código en `productos`. Un segundo
+análisis del mismo sitio y día reemplaza al anterior.
+
+La evolución por SKU usa la clave primaria (site, codigo, fecha) y las
+consultas por día el índice (site, fecha). Los totales por familia y por
+estado se calculan al agregar el día, así que 90+ días de tendencias se
+leen de tablas chicas, sin recorrer el detalle ni volver a parsear Excel.
+"""
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import List, Optional
+
+import pandas as pd
+
+from data_processor import NO_CONSUMPTION_DAYS
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('history_store')
+
+HISTORY_DB = os.environ.get(
+    'STOCK_HISTORY_DB', os.path.join(os.path.dirname(__file__), '..', 'data', 'historial.sqlite')
+)
+DEFAULT_DAYS = 90
+
+# Columnas diarias por código, en orden
+HISTORY_COLUMNS = ['codigo', 'familia', 'curva', 'stock', 'consumo_diario', 'dias_cobertura', 'estado_stock']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analisis (
+    site TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    familia TEXT,
+    curva TEXT,
+    stock REAL,
+    consumo_diario REAL,
+    dias_cobertura REAL,
+    estado_stock TEXT,
+    PRIMARY KEY (site, codigo, fecha)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_analisis_site_fecha ON analisis (site, fecha);
+
+CREATE TABLE IF NOT EXISTS productos (
+    site TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    descripcion TEXT,
+    PRIMARY KEY (site, codigo)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS resumen_familias (
+    site TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    familia TEXT NOT NULL,
+    productos INTEGER,
+    stock REAL,
+    cobertura_promedio REAL,
+    criticos INTEGER,
+    PRIMARY KEY (site, fecha, familia)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS resumen_estados (
+    site TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    estado_stock TEXT NOT NULL,
+    productos INTEGER,
+    PRIMARY KEY (site, fecha, estado_stock)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryStore:
+    """Historial de análisis por sitio y día en un archivo SQLite"""
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """
+        Una conexión por operación (las sesiones de Streamlit corren en hilos
+        distintos), con commit al salir sin error
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _query(self, sql: str, params: tuple) -> pd.DataFrame:
+        with self._connect() as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def append(self, site: str, analysis: pd.DataFrame, day: Optional[date] = None) -> int:
+        """Guarda el análisis del día (hoy por defecto). Retorna los productos escritos"""
+        start = time.perf_counter()
+        day = (day or date.today()).isoformat()
+        # Códigos repetidos en el stock: queda la última fila, igual que con la clave primaria
+        analysis = analysis.drop_duplicates('codigo', keep='last')
+        rows = pd.DataFrame({
+            'codigo': analysis['codigo'].astype(str),
+            'familia': analysis['familia'].astype(object).fillna('Sin familia'),
+            'curva': analysis['curva'].astype(object),
+            'stock': analysis['stock'].astype(float),
+            'consumo_diario': analysis['consumo_diario'].astype(float),
+            'dias_cobertura': analysis['dias_cobertura'].astype(float),
+            'estado_stock': analysis['estado_stock'].astype(object),
+        }, columns=HISTORY_COLUMNS)
+        
+        families = rows.assign(
+            cobertura=rows['dias_cobertura'].where(rows['dias_cobertura'] < NO_CONSUMPTION_DAYS),
+            critico=rows['estado_stock'] == 'CRÍTICO',
+        ).groupby('familia', sort=True).agg(
+            productos=('codigo', 'size'), stock=('stock', 'sum'),
+            cobertura_promedio=('cobertura', 'mean'), critico=('critico', 'sum'),
+        )
+        states = rows.groupby('estado_stock', sort=True).size()
+
+        with self._connect() as connection:
+            for table in ('analisis', 'resumen_familias', 'resumen_estados'):
+                connection.execute(f"DELETE FROM {table} WHERE site = ? AND fecha = ?", (site, day))
+            connection.executemany(
+                "INSERT INTO analisis VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((site, codigo, day, *values) for codigo, *values in rows.itertuples(index=False, name=None))
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO productos VALUES (?, ?, ?)",
+                ((site, codigo, descripcion) for codigo, descripcion in
+                 zip(rows['codigo'], analysis['descripcion'].astype(object)))
+            )
+            connection.executemany(
+                "INSERT INTO resumen_familias VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((site, day, familia, int(productos), stock, None if pd.isna(cobertura) else cobertura, int(criticos))
+                 for familia, productos, stock, cobertura, criticos in families.itertuples(name=None))
+            )
+            connection.executemany(
+                "INSERT INTO resumen_estados VALUES (?, ?, ?, ?)",
+                ((site, day, estado, int(productos)) for estado, productos in states.items())
+            )
+
+        log_event(logger, logging.INFO, "historial_agregado", sitio=site, fecha=day, productos=len(rows),
+                  segundos=round(time.perf_counter() - start, 3))
+        return len(rows)
+
+    def dates(self, site: str) -> List[str]:
+        """Fechas con análisis del sitio, de la más antigua a la más reciente"""
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "SELECT DISTINCT fecha FROM resumen_estados WHERE site = ? ORDER BY fecha", (site,)
+            )
+            return [row[0] for row in cursor]
+
+    def _since(self, days: int) -> str:
+        return (date.today() - timedelta(days=days)).isoformat()
+
+    def sku_history(self, site: str, codigos: List[str], days: int = DEFAULT_DAYS) -> pd.DataFrame:
+        """Evolución diaria de los códigos indicados en los últimos `days` días"""
+        columns = ['fecha', 'descripcion'] + HISTORY_COLUMNS
+        if not codigos:
+            return pd.DataFrame(columns=columns)
+        placeholders = ', '.join('?' * len(codigos))
+        return self._query(
+            f"SELECT a.fecha, p.descripcion, {', '.join('a.' + column for column in HISTORY_COLUMNS)} "
+            f"FROM analisis a LEFT JOIN productos p ON p.site = a.site AND p.codigo = a.codigo "
+            f"WHERE a.site = ? AND a.codigo IN ({placeholders}) AND a.fecha >= ? ORDER BY a.codigo, a.fecha",
+            (site, *[str(codigo) for codigo in codigos], self._since(days))
+        )
+
+    def family_history(self, site: str, days: int = DEFAULT_DAYS) -> pd.DataFrame:
+        """
+        Por día y familia: productos, stock total, cobertura promedio (solo
+        productos con consumo) y productos críticos
+        """
+        return self._query(
+            "SELECT fecha, familia, productos, stock, cobertura_promedio, criticos FROM resumen_familias "
+            "WHERE site = ? AND fecha >= ? ORDER BY fecha, familia",
+            (site, self._since(days))
+        )
+
+    def status_history(self, site: str, days: int = DEFAULT_DAYS) -> pd.DataFrame:
+        """Productos por día y estado de stock"""
+        return self._query(
+            "SELECT fecha, estado_stock, productos FROM resumen_estados "
+            "WHERE site = ? AND fecha >= ? ORDER BY fecha, estado_stock",
+            (site, self._since(days))
+        )
@@ -0,0 +1,121 @@
+"""
+Perfiles de layout de los exports del ERP.
+
+El ERP emite siempre la misma plantilla: el código, la descripción y los
+valores de cada producto están en columnas fijas. El perfil registra esas
+columnas, inferidas de las primeras filas de producto del primer archivo
+parseado con la búsqueda por celdas, y se guarda por huella de la plantilla
+(tipo de archivo, ancho de la hoja y encabezados sin dígitos). Los archivos
+siguientes con la misma huella leen primero las columnas del perfil; las
+filas que no calzan vuelven a la búsqueda, así que el resultado no cambia.
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('layout_profile')
+
+# Filas de encabezado (antes del primer número) que definen la huella
+HEADER_ROWS = 5
+# Filas de producto usadas para inferir el perfil
+SAMPLE_ROWS = 200
+MIN_SAMPLE_ROWS = 20
+# Fracción mínima de la muestra que debe usar la columna de cada rol
+MIN_SHARE = 0.9
+MAX_PROFILES = 32
+
+_DIGITS = re.compile(r'\d')
+
+
+@dataclass
+class LayoutProfile:
+    """Columnas fijas de una plantilla: código y una columna por rol"""
+    kind: str
+    fingerprint: str
+    code_col: int
+    columns: Dict[str, int] = field(default_factory=dict)
+
+
+_profiles = OrderedDict()
+_lock = threading.Lock()
+
+
+def template_fingerprint(kind: str, df: pd.DataFrame) -> str:
+    """
+    Huella de la plantilla: ancho de la hoja y textos de las filas iniciales
+    hasta la primera con números, con los dígitos enmascarados (fechas,
+    bodegas y servicios cambian entre archivos de la misma plantilla)
+    """
+    header = []
+    for row in df.head(HEADER_ROWS).itertuples(index=False):
+        cells = [value for value in row if pd.notna(value)]
+        if any(isinstance(value, (int, float, np.number)) for value in cells):
+            break
+        header.append(' '.join(str(value).strip() for value in cells))
+    text = _DIGITS.sub('9', '|'.join(header))
+    return hashlib.sha1(f"{kind}|{df.shape[1]}|{text}".encode('utf-8')).hexdigest()[:16]
+
+
+def lookup(fingerprint: str) -> Optional[LayoutProfile]:
+    with _lock:
+        profile = _profiles.get(fingerprint)
+        if profile is not None:
+            _profiles.move_to_end(fingerprint)
+        return profile
+
+
+def remember(profile: LayoutProfile):
+    with _lock:
+        _profiles[profile.fingerprint] = profile
+        _profiles.move_to_end(profile.fingerprint)
+        while len(_profiles) > MAX_PROFILES:
+            _profiles.popitem(last=False)
+
+
+def clear():
+    with _lock:
+        _profiles.clear()
+
+
+def _dominant(columns: np.ndarray) -> Optional[int]:
+    """Columna más usada si cubre al menos MIN_SHARE de la muestra"""
+    values, counts = np.unique(columns, return_counts=True)
+    best = counts.argmax()
+    if values[best] < 0 or counts[best] < MIN_SHARE * len(columns):
+        return None
+    return int(values[best])
+
+
+def infer_profile(kind: str, fingerprint: str, code_cols: np.ndarray,
+                  role_cols: Dict[str, np.ndarray], order: List[str] = None) -> Optional[LayoutProfile]:
+    """
+    Perfil desde las columnas donde la búsqueda encontró cada rol en las
+    primeras filas de producto. None si la muestra es chica o algún rol no
+    tiene una columna dominante. Con order, las columnas de esos roles
+    deben quedar en ese orden de izquierda a derecha
+    """
+    if len(code_cols) < MIN_SAMPLE_ROWS:
+        return None
+
+    code_col = _dominant(code_cols[:SAMPLE_ROWS])
+    columns = {role: _dominant(cols[:SAMPLE_ROWS]) for role, cols in role_cols.items()}
+    if code_col is None or any(col is None or col <= code_col for col in columns.values()):
+        return None
+    if order is not None:
+        ordered = [columns[role] for role in order]
+        if ordered != sorted(set(ordered)):
+            return None
+
+    profile = LayoutProfile(kind, fingerprint, code_col, columns)
+    log_event(logger, logging.INFO, "perfil_detectado", tipo=kind, huella=fingerprint,
+              codigo=code_col, **columns)
+    return profile
@@ -0,0 +1,163 @@
+"""
+Parseo concurrente de los archivos de Curva ABC y stock.
+
+Los dos archivos son independientes hasta calculate_coverage_analysis y
+su parseo es trabajo de CPU (openpyxl + pandas), así que, cuando ninguno
+está en la caché, cada uno se parsea en un proceso del pool y los
+resultados se aplican al procesador del proceso principal como si se
+hubieran parseado ahí.
+
+STOCK_PARALLEL_PARSE=0 desactiva el pool y parsea en secuencia (también
+se parsea en secuencia si hay una sola CPU disponible).
+
+Si un proceso del pool muere (ej: sin memoria), los archivos pendientes se
+parsean en el proceso principal y el pool se reemplaza por uno nuevo: un
+ProcessPoolExecutor roto rechaza todos los envíos siguientes.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from data_processor import ERPDataProcessor
+from pipeline_log import get_logger, log_event
+from result_cache import PROCESSOR_FIELDS, ParseCache, file_digest, read_file_bytes
+
+logger = get_logger('parallel_parse')
+
+KINDS = ['curva_abc', 'stock']
+
+
+def available_cpus() -> int:
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def parallel_enabled() -> bool:
+    """Pool activo salvo STOCK_PARALLEL_PARSE=0 o con una sola CPU (solo agregaría costo)"""
+    if os.environ.get('STOCK_PARALLEL_PARSE', '1').strip().lower() in ('0', 'false', 'no'):
+        return False
+    return available_cpus() > 1
+
+
+class ParsePool:
+    """
+    Pool de procesos 'spawn' (no hereda los hilos del servidor de Streamlit)
+    compartido por las sesiones, que se recrea cuando un proceso muere
+    """
+
+    def __init__(self, max_workers: int = len(KINDS)):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._executor = self._create()
+
+    def _create(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            return self._executor
+
+    def submit(self, fn, *args):
+        return self.executor.submit(fn, *args)
+
+    def replace(self, broken: ProcessPoolExecutor):
+        """Reemplaza el executor roto, salvo que otra sesión ya lo haya hecho"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            self._executor = self._create()
+        broken.shutdown(wait=False, cancel_futures=True)
+        log_event(logger, logging.WARNING, "pool_recreado")
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+def create_pool(max_workers: int = len(KINDS)) -> ParsePool:
+    """Pool de procesos para process_files"""
+    return ParsePool(max_workers)
+
+
+def parse_file(kind: str, data: bytes, excel_backends=None, chunk_rows: Optional[int] = None) -> Dict:
+    """
+    Parsea un archivo con un procesador nuevo (se ejecuta en el pool).
+    Retorna los atributos resultantes del procesador, el backend y los segundos
+    """
+    processor = ERPDataProcessor(excel_backends, chunk_rows)
+    getattr(processor, f"process_{kind}")(io.BytesIO(data))
+    return {
+        'fields': {field: getattr(processor, field) for field in PROCESSOR_FIELDS[kind]},
+        'backend': processor.reader_backends.get(kind),
+        'seconds': processor.parse_seconds[kind],
+    }
+
+
+def _apply(processor: ERPDataProcessor, kind: str, result: Dict):
+    for field, value in result['fields'].items():
+        setattr(processor, field, value)
+    processor.reader_backends[kind] = result['backend']
+    processor.parse_seconds[kind] = result['seconds']
+
+
+def process_files(processor: ERPDataProcessor, sources: Dict[str, object],
+                  cache: Optional[ParseCache] = None,
+                  pool: Optional[ParsePool] = None) -> Dict[str, float]:
+    """
+    Procesa los archivos de sources ({'curva_abc': archivo, 'stock': archivo})
+    dejando los resultados en processor. Los aciertos de caché se restauran
+    sin parsear; si quedan dos o más archivos por parsear y hay pool, se
+    parsean en paralelo. Retorna los segundos por archivo y el total
+    """
+    start = time.perf_counter()
+    data = {kind: read_file_bytes(source) for kind, source in sources.items()}
+    for kind in data:
+        processor.source_digests[kind] = file_digest(data[kind])
+
+    pending = [kind for kind in data if cache is None or not cache.restore(processor, kind, data[kind])]
+
+    if pool is not None and len(pending) > 1:
+        executor = pool.executor
+        futures = {}
+        try:
+            for kind in pending:
+                futures[kind] = executor.submit(parse_file, kind, data[kind], processor.excel_backends,
+                                                processor.chunk_rows)
+        except BrokenProcessPool as e:
+            # Un proceso murió en un análisis anterior: el pool ya no acepta trabajos
+            log_event(logger, logging.WARNING, "pool_fallido", tipo=kind, error=str(e))
+            pool.replace(executor)
+        for kind in pending:
+            result = None
+            if kind in futures:
+                try:
+                    result = futures[kind].result()
+                except BrokenProcessPool as e:
+                    # El proceso murió (ej: sin memoria)
+                    log_event(logger, logging.WARNING, "pool_fallido", tipo=kind, error=str(e))
+                    pool.replace(executor)
+            if result is None:
+                # Se reintenta en este proceso
+                getattr(processor, f"process_{kind}")(io.BytesIO(data[kind]))
+            else:
+                _apply(processor, kind, result)
+    else:
+        for kind in pending:
+            getattr(processor, f"process_{kind}")(io.BytesIO(data[kind]))
+
+    if cache is not None:
+        for kind in pending:
+            cache.store(processor, kind, data[kind])
+
+    timings = {kind: processor.parse_seconds[kind] for kind in data}
+    timings['total'] = time.perf_counter() - start
+    log_event(logger, logging.INFO, "parseo_completado", paralelo=pool is not None and len(pending) > 1,
+              **{kind: round(seconds, 3) for kind, seconds in timings.items()})
+    return timings
@@ -0,0 +1,460 @@
+import pandas as pd
+import numpy as np
+import re
+from typing import Callable, List, Optional, Tuple
+
+# Rango válido de códigos de producto en los exports del ERP
+MIN_PRODUCT_CODE = 1
+MAX_PRODUCT_CODE = 999999
+
+# Cantidad de columnas iniciales donde se busca el código de producto
+CODE_SEARCH_COLUMNS = 6
+
+# Condición necesaria para que float() acepte un texto (evita excepciones en textos)
+FLOAT_PREFIX = re.compile(r'\s*[+-]?(?:\d|\.\d|inf|nan)', re.IGNORECASE)
+
+# Formas numéricas de los exports del ERP, sobre el texto sin espacios en los
+# extremos. Solo dígitos ASCII: el resto de lo que float() acepta (inf, nan,
+# '1_000', otros dígitos Unicode) se decodifica texto a texto
+PLAIN_NUMBER = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?'
+# Coma decimal sin miles: "1,5", ",5", "1,"
+COMMA_DECIMAL = r'[+-]?(?:[0-9]+,[0-9]*|,[0-9]+)(?:[eE][+-]?[0-9]+)?'
+# Miles con punto y coma decimal opcional (es-CL): "1.234.567", "1.234,56"
+DOT_THOUSANDS = r'[+-]?[0-9]{1,3}(?:\.[0-9]{3})+(?:,[0-9]*)?'
+# Miles con coma y punto decimal opcional: "1,234,567", "1,234.56"
+COMMA_THOUSANDS = r'[+-]?[0-9]{1,3}(?:,[0-9]{3})+(?:\.[0-9]*)?'
+# Miles con espacio, espacio duro o espacio fino (formato europeo de Excel) y
+# coma o punto decimal opcional: "1 234", "1\u00a0234,5", "12\u202f345.6"
+SPACE_THOUSANDS = r'[+-]?[0-9]{1,3}(?:[ \u00a0\u202f][0-9]{3})+(?:[,.][0-9]*)?'
+
+# Primer carácter posible (tras espacios) de un texto numérico, además de los
+# dígitos Unicode que float() acepta; ',' cubre comma_as_decimal
+NUMBER_START = np.array(list('+-.,0123456789iInN'))
+
+_cell_type = np.frompyfunc(type, 1, 1)
+
+
+def _used_codes(codes: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """np.unique(codes, return_inverse=True) para códigos en [0, size), sin hashing"""
+    used = np.zeros(size, dtype=bool)
+    used[codes] = True
+    used = np.flatnonzero(used)
+    positions = np.empty(size, dtype=np.int64)
+    positions[used] = np.arange(len(used))
+    return used, positions[codes]
+
+
+class CellMatrix:
+    """
+    Vista columnar de una hoja del ERP leída sin headers.
+
+    Separa las celdas numéricas nativas (guardadas como float64) de las de
+    texto, de modo que los números no tengan que pasar por str() para ser
+    evaluados. Para una celda numérica v, float(str(v)) == float(v), por lo
+    que el resultado es el mismo que el del recorrido fila a fila.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_rows, self.n_cols = df.shape
+        self.notna = df.notna().to_numpy()
+        # Almacenamiento por columnas: todas las operaciones recorren columnas
+        self.values = np.empty(df.shape, dtype=object, order='F')
+        self.is_number = np.zeros(df.shape, dtype=bool, order='F')
+        self.numbers = np.full(df.shape, np.nan, order='F')
+        # Textos factorizados por columna: cada texto distinto se evalúa una sola vez
+        self.text_codes = np.full(df.shape, -1, dtype=np.int64, order='F')
+        self.text_uniques = []
+        self._float_cache = {}
+        self._unicode_cache = {}
+
+        for j in range(self.n_cols):
+            column = df.iloc[:, j]
+            raw = column.to_numpy(dtype=object)
+            self.values[:, j] = raw
+
+            if pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype):
+                is_number = self.notna[:, j].copy()
+            elif pd.api.types.infer_dtype(raw, skipna=True) in ('string', 'empty'):
+                # Columna solo de textos: no hace falta revisar el tipo de cada celda
+                is_number = np.zeros(self.n_rows, dtype=bool)
+            else:
+                cell_types = _cell_type(raw)
+                is_number = ((cell_types == int) | (cell_types == float)) & self.notna[:, j]
+
+            self.is_number[:, j] = is_number
+            self.numbers[is_number, j] = np.asarray(raw[is_number], dtype=float)
+
+            # Otros objetos (fechas, booleanos, escalares numpy) pasan por str()
+            # y se evalúan como texto
+            text_rows = np.flatnonzero(self.notna[:, j] & ~is_number)
+            codes, uniques = pd.factorize(raw[text_rows])
+            self.text_codes[text_rows, j] = codes
+            self.text_uniques.append(np.array([u if type(u) is str else str(u) for u in uniques], dtype=object))
+
+        self.is_text = self.notna & ~self.is_number
+
+    def unicode_uniques(self, col: int) -> np.ndarray:
+        """Textos distintos de la columna como arreglo unicode de numpy (calculado una vez)"""
+        if col not in self._unicode_cache:
+            self._unicode_cache[col] = self.text_uniques[col].astype(str)
+        return self._unicode_cache[col]
+
+    def texts(self, rows: np.ndarray, col: int) -> np.ndarray:
+        """str() de las celdas indicadas de una columna"""
+        codes = self.text_codes[rows, col]
+        result = np.full(len(rows), None, dtype=object)
+        is_text = codes >= 0
+        result[is_text] = self.text_uniques[col][codes[is_text]]
+        numbers = self.is_number[rows, col]
+        if numbers.any():
+            result[numbers] = [str(v) for v in self.values[rows[numbers], col]]
+        return result
+
+    def map_texts(self, rows: np.ndarray, col: int, func: Callable[[str], object],
+                  vectorized: bool = False) -> np.ndarray:
+        """
+        func(str(celda)) para las celdas indicadas; cada texto distinto se
+        evalúa una vez. Con vectorized, func recibe los textos distintos
+        (arreglo de objetos y el mismo como arreglo unicode) y retorna el
+        arreglo de resultados
+        """
+        def apply(texts, unicode):
+            if vectorized:
+                return func(texts, unicode)
+            mapped = np.empty(len(texts), dtype=object)
+            mapped[:] = [func(text) for text in texts]
+            return mapped
+
+        codes = self.text_codes[rows, col]
+        result = np.full(len(rows), None, dtype=object)
+        is_text = codes >= 0
+        if is_text.any():
+            used, inverse = _used_codes(codes[is_text], len(self.text_uniques[col]))
+            unicode = self.unicode_uniques(col)[used] if vectorized else None
+            result[is_text] = apply(self.text_uniques[col][used], unicode)[inverse]
+        numbers = self.is_number[rows, col]
+        if numbers.any():
+            texts = np.empty(numbers.sum(), dtype=object)
+            texts[:] = [str(v) for v in self.values[rows[numbers], col]]
+            result[numbers] = apply(texts, texts.astype(str) if vectorized else None)
+        return result
+
+    def unique_floats(self, col: int, codes: np.ndarray,
+                      comma_as_decimal: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decodificación numérica (decode_numbers) de los textos distintos
+        indicados por `codes`: (valores, máscara de textos numéricos). Los
+        resultados se guardan por columna y se calculan solo para los textos
+        que se consultan.
+        """
+        key = (col, comma_as_decimal)
+        if key not in self._float_cache:
+            size = len(self.text_uniques[col])
+            self._float_cache[key] = (np.full(size, np.nan), np.zeros(size, dtype=bool), np.zeros(size, dtype=bool))
+        converted, parsed, done = self._float_cache[key]
+
+        requested = np.zeros(len(done), dtype=bool)
+        requested[codes] = True
+        missing = np.flatnonzero(requested & ~done)
+        if len(missing):
+            converted[missing], parsed[missing] = decode_numbers(self.text_uniques[col][missing], comma_as_decimal,
+                                                                self.unicode_uniques(col)[missing])
+        done[missing] = True
+        return converted[codes], parsed[codes]
+
+    def row_text(self, row: int) -> str:
+        """Texto de la fila completa, uniendo celdas no vacías con espacios"""
+        return ' '.join(str(v) for v, present in zip(self.values[row], self.notna[row]) if present)
+
+    def rows_with_keywords(self, keywords: List[str]) -> np.ndarray:
+        """Filas donde alguna celda de texto contiene alguna de las palabras clave"""
+        found = np.zeros(self.n_rows, dtype=bool)
+        for j in range(self.n_cols):
+            uniques = self.text_uniques[j]
+            if len(uniques) == 0:
+                continue
+            texts = self.unicode_uniques(j)
+            matches = np.zeros(len(uniques), dtype=bool)
+            for keyword in keywords:
+                matches |= np.char.find(texts, keyword) >= 0
+            codes = self.text_codes[:, j]
+            found |= (codes >= 0) & matches[codes]
+        return found
+
+    def rows_all_cells(self, pattern: str, number_ok: np.ndarray) -> np.ndarray:
+        """
+        Filas no vacías donde todas las celdas de texto calzan completas con
+        el patrón (regex) y todas las numéricas cumplen number_ok
+        """
+        fullmatch = re.compile(pattern).fullmatch
+        valid = self.notna.any(axis=1)
+        for j in range(self.n_cols):
+            uniques = self.text_uniques[j]
+            matches = np.fromiter((fullmatch(text) is not None for text in uniques),
+                                  dtype=bool, count=len(uniques))
+            codes = self.text_codes[:, j]
+            text_ok = np.ones(self.n_rows, dtype=bool)
+            text_ok[codes >= 0] = matches[codes[codes >= 0]]
+            valid &= text_ok & (~self.is_number[:, j] | number_ok[:, j])
+        return valid
+
+
+# Evaluador de celdas: (matriz, filas, columna) -> (máscara de coincidencia, valores)
+CellEvaluator = Callable[[CellMatrix, np.ndarray, int], Tuple[np.ndarray, Optional[np.ndarray]]]
+
+
+def to_float(text: str) -> Optional[float]:
+    """float() de Python sobre un texto; None si no es numérico"""
+    if not FLOAT_PREFIX.match(text):
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def decode_numbers(texts: np.ndarray, comma_as_decimal: bool = False,
+                   unicode: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decodificación vectorizada de textos numéricos del ERP.
+
+    Sin comma_as_decimal equivale a float(texto). Con comma_as_decimal
+    acepta además coma decimal ("1,5") y separadores de miles con punto,
+    con coma o con espacio ("1.234.567", "1.234,56", "1,234.56",
+    "1 234,5", "1\u00a0234"); un único punto es
+    decimal ("1.234" = 1.234), igual que en float(). Las formas comunes se
+    convierten por bloque con expresiones regulares y numpy; solo las
+    exóticas pasan texto a texto por float().
+    unicode, si se entrega, son los mismos textos como arreglo unicode.
+    Retorna (valores, máscara de textos numéricos); NaN donde no se pudo
+    """
+    texts = pd.Series(texts, dtype=object)
+    values = np.full(len(texts), np.nan)
+    parsed = np.zeros(len(texts), dtype=bool)
+    if len(texts) == 0:
+        return values, parsed
+    # Solo los textos que empiezan (tras espacios) como un número pueden serlo:
+    # el resto (descripciones, unidades) no pasa por las expresiones regulares
+    if unicode is None:
+        unicode = texts.to_numpy().astype(str)
+    first_chars = np.char.lstrip(unicode).astype('U1')
+    numeric_start = np.isin(first_chars, NUMBER_START) | np.char.isdecimal(first_chars)
+    stripped = pd.Series(None, index=texts.index, dtype=object)
+    stripped[numeric_start] = texts[numeric_start].str.strip()
+
+    def convert(pattern: str, normalize: Callable[[pd.Series], pd.Series] = None):
+        candidates = numeric_start & ~parsed
+        matches = np.zeros(len(texts), dtype=bool)
+        matches[candidates] = stripped[candidates].str.fullmatch(pattern).to_numpy(dtype=bool)
+        if matches.any():
+            selected = stripped[matches]
+            if normalize is not None:
+                selected = normalize(selected)
+            # str -> float de numpy redondea igual que float() (desborde = inf)
+            with np.errstate(over='ignore'):
+                values[matches] = selected.to_numpy(dtype=str).astype(float)
+            parsed[matches] = True
+
+    convert(PLAIN_NUMBER)
+    if comma_as_decimal:
+        convert(COMMA_DECIMAL, lambda s: s.str.replace(',', '.', regex=False))
+        convert(DOT_THOUSANDS, lambda s: s.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+        convert(COMMA_THOUSANDS, lambda s: s.str.replace(',', '', regex=False))
+        convert(SPACE_THOUSANDS, lambda s: s.str.replace(r'[ \u00a0\u202f]', '', regex=True)
+                                            .str.replace(',', '.', regex=False))
+
+    # Resto que float() podría aceptar (inf, nan, '1_000', dígitos Unicode)
+    rest = np.flatnonzero(numeric_start & ~parsed)
+    if len(rest):
+        for position in rest:
+            text = texts.iat[position]
+            value = to_float(text.replace(',', '.') if comma_as_decimal else text)
+            if value is not None:
+                values[position] = value
+                parsed[position] = True
+    return values, parsed
+
+
+def strip_texts(texts: np.ndarray, unicode: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    str.strip() de los textos (unicode: los mismos como arreglo unicode de
+    numpy), y máscara de los textos que ese arreglo representa tal cual (el
+    tipo 'U' descarta los '\x00' finales; esos se evalúan con Python)
+    """
+    exact = np.char.str_len(unicode) == np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+    return np.char.strip(unicode), exact
+
+
+def digits_without(texts: np.ndarray, removed: str) -> np.ndarray:
+    """text.replace(c, '') para cada c de removed, seguido de .isdigit(), por bloque"""
+    # Solo pueden calzar los textos que empiezan con un dígito o un carácter removido
+    first_chars = texts.astype('U1')
+    result = np.zeros(len(texts), dtype=bool)
+    candidates = np.flatnonzero(np.char.isdigit(first_chars) | np.isin(first_chars, list(removed)))
+    if len(candidates):
+        selected = texts[candidates]
+        for char in removed:
+            selected = np.char.replace(selected, char, '')
+        result[candidates] = np.char.isdigit(selected)
+    return result
+
+
+def cell_numbers(matrix: CellMatrix, rows: np.ndarray, col: int,
+                 comma_as_decimal: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valores numéricos de las celdas indicadas y máscara de celdas numéricas
+    (NaN y False donde no lo son; el texto 'nan' cuenta como numérico). Las
+    celdas numéricas nativas se usan tal cual; los textos pasan por
+    decode_numbers (con comma_as_decimal, formato local de separadores).
+    """
+    values = matrix.numbers[rows, col].copy()
+    parsed = matrix.is_number[rows, col].copy()
+    codes = matrix.text_codes[rows, col]
+    is_text = codes >= 0
+    if is_text.any():
+        values[is_text], parsed[is_text] = matrix.unique_floats(col, codes[is_text], comma_as_decimal)
+    return values, parsed
+
+
+def cell_floats(matrix: CellMatrix, rows: np.ndarray, col: int,
+                comma_as_decimal: bool = False) -> np.ndarray:
+    """Solo los valores de cell_numbers"""
+    return cell_numbers(matrix, rows, col, comma_as_decimal)[0]
+
+
+def plain_numbers(matrix: CellMatrix, rows: np.ndarray, col: int) -> np.ndarray:
+    """
+    Celdas numéricas cuyo str() tiene solo dígitos y punto: no negativas,
+    finitas y sin notación científica (repr de float usa exponente fuera
+    de [1e-4, 1e16)). Para ellas los criterios de texto no aplican.
+    """
+    values = matrix.numbers[rows, col]
+    with np.errstate(invalid='ignore'):
+        in_range = (values == 0) | ((values >= 1e-4) & (values < 1e16))
+    return matrix.is_number[rows, col] & in_range & ~np.signbit(values)
+
+
+def map_cells_at(matrix: CellMatrix, rows: np.ndarray, cols: np.ndarray,
+                 func: Callable[[str], object]) -> np.ndarray:
+    """func(str(celda)) para la celda (rows[i], cols[i]) de cada fila"""
+    result = np.full(len(rows), None, dtype=object)
+    for col in np.unique(cols):
+        positions = np.flatnonzero(cols == col)
+        result[positions] = matrix.map_texts(rows[positions], col, func)
+    return result
+
+
+def _product_codes(matrix: CellMatrix, rows: np.ndarray, col: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(máscara de código válido, máscara de infinito, valor truncado) de las celdas indicadas"""
+    values = cell_floats(matrix, rows, col)
+    is_inf = np.isinf(values)
+    truncated = np.trunc(np.where(np.isfinite(values), values, 0))
+    is_code = (np.isfinite(values) &
+               (truncated >= MIN_PRODUCT_CODE) & (truncated <= MAX_PRODUCT_CODE))
+    return is_code, is_inf, truncated
+
+
+def find_product_codes(matrix: CellMatrix, rows: np.ndarray,
+                       max_columns: int = CODE_SEARCH_COLUMNS,
+                       expected_col: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Busca, por fila, la primera columna (entre las primeras `max_columns`)
+    cuyo valor int(float(celda)) es un código de producto válido.
+
+    Un valor infinito antes del código aborta la fila, igual que el
+    OverflowError del recorrido fila a fila. Con expected_col (columna del
+    perfil de layout), las filas vacías antes de esa columna y con código
+    en ella se resuelven sin buscar.
+    Retorna (columna del código, código entero, máscara de filas con código)
+    """
+    code_col = np.full(matrix.n_rows, -1, dtype=np.int64)
+    code_value = np.zeros(matrix.n_rows, dtype=np.int64)
+    undecided = rows.copy()
+
+    if expected_col is not None and expected_col < min(max_columns, matrix.n_cols):
+        active = np.flatnonzero(rows & matrix.notna[:, expected_col] &
+                                ~matrix.notna[:, :expected_col].any(axis=1))
+        is_code, _, truncated = _product_codes(matrix, active, expected_col)
+        hits = active[is_code]
+        code_col[hits] = expected_col
+        code_value[hits] = truncated[is_code].astype(np.int64)
+        undecided[hits] = False
+
+    for j in range(min(max_columns, matrix.n_cols)):
+        active = np.flatnonzero(undecided & matrix.notna[:, j])
+        if len(active) == 0:
+            continue
+
+        is_code, is_inf, truncated = _product_codes(matrix, active, j)
+        hits = active[is_code]
+        code_col[hits] = j
+        code_value[hits] = truncated[is_code].astype(np.int64)
+        undecided[active[is_code | is_inf]] = False
+
+    return code_col, code_value, code_col >= 0
+
+
+def first_match_after(matrix: CellMatrix, start_col: np.ndarray, rows: np.ndarray,
+                      evaluate: CellEvaluator,
+                      expected_col: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Para cada fila marcada, primera celda no vacía a la derecha de start_col
+    que cumple `evaluate`. Recorre columna por columna evaluando solo las
+    filas que aún no encuentran coincidencia. Con expected_col (columna del
+    perfil de layout), las filas que coinciden ahí y no antes se resuelven
+    primero sin recorrer el resto de la fila.
+    Retorna (columna, máscara de encontrados, valores del evaluador)
+    """
+    match_col = np.full(matrix.n_rows, -1, dtype=np.int64)
+    found = np.zeros(matrix.n_rows, dtype=bool)
+    values = np.full(matrix.n_rows, None, dtype=object)
+    pending = rows.copy()
+
+    def record(hits, col, matched_values):
+        match_col[hits] = col
+        found[hits] = True
+        if matched_values is not None:
+            values[hits] = matched_values
+        pending[hits] = False
+
+    if expected_col is not None and expected_col < matrix.n_cols:
+        fixed = rows & (start_col < expected_col) & matrix.notna[:, expected_col]
+        # Ninguna celda entre el inicio y la columna esperada debe coincidir
+        for j in range(expected_col):
+            active = np.flatnonzero(fixed & matrix.notna[:, j] & (start_col < j))
+            if len(active):
+                matched, _ = evaluate(matrix, active, j)
+                fixed[active[matched]] = False
+        active = np.flatnonzero(fixed)
+        if len(active):
+            matched, matched_values = evaluate(matrix, active, expected_col)
+            record(active[matched], expected_col,
+                   None if matched_values is None else matched_values[matched])
+
+    for j in range(matrix.n_cols):
+        active = np.flatnonzero(pending & matrix.notna[:, j] & (start_col < j))
+        if len(active) == 0:
+            continue
+
+        matched, matched_values = evaluate(matrix, active, j)
+        record(active[matched], j, None if matched_values is None else matched_values[matched])
+
+    return match_col, found, values
+
+
+def last_non_empty_after(matrix: CellMatrix, start_col: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Para cada fila, última celda no vacía a la derecha de start_col"""
+    columns = np.arange(matrix.n_cols)
+    candidates = matrix.notna & (columns[None, :] > start_col[:, None])
+    found = candidates.any(axis=1)
+    last = matrix.n_cols - 1 - candidates[:, ::-1].argmax(axis=1)
+    return last, found
+
+
+def forward_fill_labels(labels: np.ndarray, default: str) -> np.ndarray:
+    """Propaga hacia abajo la última etiqueta detectada (servicio, curva, familia)"""
+    positions = np.where(pd.notna(labels), np.arange(len(labels)), -1)
+    np.maximum.accumulate(positions, out=positions)
+    filled = np.full(len(labels), default, dtype=object)
+    filled[positions >= 0] = labels[positions[positions >= 0]]
+    return filled
@@ -0,0 +1,110 @@
+"""
+Logging estructurado del pipeline de procesamiento.
+
+Configuración por variables de entorno:
+    STOCK_LOG_LEVEL    TRACE, DEBUG, INFO (default), WARNING o ERROR
+    STOCK_TRACE_CODES  códigos de producto a seguir, separados por coma (ej: "453,641")
+
+El seguimiento de códigos solo se activa con STOCK_LOG_LEVEL=TRACE y una
+lista no vacía; en cualquier otro caso no recorre ningún DataFrame.
+"""
+import logging
+import os
+import sys
+from typing import Iterable, Optional
+
+import pandas as pd
+
+# Nivel más detallado que DEBUG: seguimiento de productos puntuales
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+LOGGER_NAME = "stock_analyzer"
+DEFAULT_LEVEL = "INFO"
+
+_trace_codes = frozenset()
+_configured = False
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Formato 'hora nivel logger evento clave=valor ...'"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        return message
+
+
+def _format_value(value) -> str:
+    text = str(value)
+    return repr(text) if ' ' in text or text == '' else text
+
+
+def _parse_codes(codes: Iterable) -> frozenset:
+    return frozenset(str(code).strip() for code in codes if str(code).strip())
+
+
+def configure(level: Optional[str] = None, trace_codes: Optional[Iterable] = None):
+    """
+    Configura el logger del pipeline. Sin argumentos toma los valores de
+    las variables de entorno; puede llamarse de nuevo para cambiarlos.
+    """
+    global _trace_codes, _configured
+
+    level = (level or os.environ.get('STOCK_LOG_LEVEL', DEFAULT_LEVEL)).upper()
+    if trace_codes is None:
+        trace_codes = os.environ.get('STOCK_TRACE_CODES', '').split(',')
+    _trace_codes = _parse_codes(trace_codes)
+
+    root = logging.getLogger(LOGGER_NAME)
+    numeric_level = logging.getLevelName(level)
+    root.setLevel(numeric_level if isinstance(numeric_level, int) else logging.INFO)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(KeyValueFormatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+        root.addHandler(handler)
+        root.propagate = False
+    _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger hijo del pipeline (configurado desde el entorno en el primer uso)"""
+    if not _configured:
+        configure()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """Registra un evento con campos clave=valor si el nivel está habilitado"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+class ProductTracer:
+    """Seguimiento de una lista de códigos de producto a través del pipeline"""
+
+    def __init__(self, logger: logging.Logger, codes: Optional[Iterable] = None):
+        self.logger = logger
+        self.codes = _parse_codes(codes) if codes is not None else _trace_codes
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.codes) and self.logger.isEnabledFor(TRACE)
+
+    def trace_frame(self, stage: str, df: pd.DataFrame, columns: Iterable[str] = ()):
+        """Registra, para cada código seguido, su presencia y valores en df"""
+        if not self.enabled:
+            return
+
+        codes = df['codigo'].astype(str).str.strip()
+        matches = df[codes.isin(self.codes)]
+        found = set()
+        for code, (_, row) in zip(codes[matches.index], matches.iterrows()):
+            found.add(code)
+            values = {column: row[column] for column in columns if column in row.index}
+            log_event(self.logger, TRACE, stage, codigo=code, presente=True, **values)
+
+        for code in sorted(self.codes - found):
+            log_event(self.logger, TRACE, stage, codigo=code, presente=False)
@@ -0,0 +1,164 @@
+"""
+Trabajos en segundo plano para generar reportes.
+
+Cada trabajo corre en un pool de hilos compartido por todas las sesiones y
+tiene un id, el paso actual (hoja del reporte) y una marca de cancelación
+que se revisa en cada aviso de progreso. La interfaz consulta el estado
+por id, así que el usuario puede seguir navegando mientras se genera el
+reporte y un rerun de Streamlit no lo reinicia. Un mismo reporte pedido
+desde dos sesiones se genera una sola vez; el trabajo guarda los ids de las
+sesiones que lo siguen y solo se cancela cuando la última de ellas lo
+cancela. Una sesión deja de seguirlo al cancelar, al liberarlo (release) o
+al cerrarse (session_alive).
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Set
+
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('report_jobs')
+
+DEFAULT_WORKERS = 2
+# Trabajos terminados que se conservan para consultar su estado
+MAX_FINISHED_JOBS = 32
+
+PENDING = 'pendiente'
+RUNNING = 'generando'
+DONE = 'listo'
+FAILED = 'error'
+CANCELLED = 'cancelado'
+
+
+class JobCancelled(Exception):
+    """El trabajo fue cancelado mientras se generaba"""
+
+
+@dataclass
+class ReportJob:
+    """Estado de un trabajo; lo actualiza el hilo que lo ejecuta"""
+    id: str
+    key: str
+    status: str = PENDING
+    step: int = 0
+    total_steps: int = 0
+    label: str = ''
+    result: Optional[bytes] = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    seconds: Optional[float] = None
+    # Ids de las sesiones que siguen el trabajo (lo crearon o se unieron)
+    sessions: Set[str] = field(default_factory=set)
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def fraction(self) -> float:
+        if self.status == DONE:
+            return 1.0
+        return min(self.step / self.total_steps, 1.0) if self.total_steps else 0.0
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, step: int, total: int, label: str):
+        """Callback de progreso: registra el paso o interrumpe si se pidió cancelar"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.step, self.total_steps, self.label = step, total, label
+
+
+class ReportJobManager:
+    """Pool de hilos con los trabajos por id"""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS,
+                 session_alive: Optional[Callable[[str], bool]] = None):
+        """
+        session_alive(id) indica si una sesión sigue abierta; las cerradas se
+        descartan al cancelar. None las considera abiertas hasta que liberan
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reporte')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._session_alive = session_alive
+
+    def submit(self, key: str, build: Callable[[ReportJob], bytes], session: str) -> ReportJob:
+        """
+        Encola build(job), que debe informar su avance con job.report, seguido
+        por la sesión. Si ya hay un trabajo sin terminar con la misma clave, la
+        sesión se une a ese
+        """
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and not job.finished and not job.cancel_requested:
+                    job.sessions.add(session)
+                    return job
+            job = ReportJob(uuid.uuid4().hex[:12], key, sessions={session})
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, build)
+        log_event(logger, logging.INFO, "reporte_encolado", trabajo=job.id)
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: ReportJob, build: Callable[[ReportJob], bytes]):
+        start = time.perf_counter()
+        try:
+            if job.cancel_requested:
+                raise JobCancelled()
+            job.status = RUNNING
+            job.result = build(job)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            log_event(logger, logging.ERROR, "reporte_error", trabajo=job.id, error=str(e))
+        job.seconds = time.perf_counter() - start
+        log_event(logger, logging.INFO, "reporte_terminado", trabajo=job.id, estado=job.status,
+                  segundos=round(job.seconds, 3))
+
+    def get(self, job_id: Optional[str]) -> Optional[ReportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def release(self, job_id: Optional[str], session: str):
+        """La sesión deja de seguir el trabajo (reemplazó o descartó su id); este sigue corriendo"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.sessions.discard(session)
+
+    def cancel(self, job_id: str, session: str) -> bool:
+        """
+        Retira la sesión del trabajo. Si no queda otra sesión abierta que lo
+        siga, pide cancelarlo (se detiene en su próximo aviso de progreso) y
+        retorna True; si no, el trabajo continúa y retorna False
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished or job.cancel_requested:
+                return False
+            job.sessions.discard(session)
+            if self._session_alive is not None:
+                job.sessions = {other for other in job.sessions if self._session_alive(other)}
+            if job.sessions:
+                log_event(logger, logging.INFO, "reporte_desvinculado", trabajo=job_id, sesiones=len(job.sessions))
+                return False
+            job._cancel.set()
+        log_event(logger, logging.INFO, "reporte_cancelado", trabajo=job_id)
+        return True
@@ -0,0 +1,168 @@
+"""
+Caché de resultados de parseo compartida entre sesiones.
+
+Cada archivo subido se identifica por el SHA-256 de sus bytes más la
+versión del parser (hash del código fuente de los módulos de parseo), de
+modo que cualquier cambio en el parser invalida las entradas anteriores.
+"""
+import hashlib
+import io
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+import data_processor
+import excel_reader
+import layout_profile
+import parse_engine
+import schema
+from data_processor import ERPDataProcessor
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('result_cache')
+
+# Módulos cuyo código fuente define el resultado del parseo
+PARSER_MODULES = [data_processor, parse_engine, layout_profile, excel_reader, schema]
+
+# Atributos del procesador que produce cada tipo de archivo (el primero es el DataFrame)
+PROCESSOR_FIELDS = {
+    'curva_abc': ['curva_abc_data', 'analysis_period_start', 'analysis_period_end', 'analysis_days'],
+    'stock': ['stock_data'],
+}
+
+DEFAULT_MAX_ENTRIES = 32
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_parser_version = None
+
+
+def parser_version() -> str:
+    """Hash corto del código fuente de los módulos de parseo"""
+    global _parser_version
+    if _parser_version is None:
+        digest = hashlib.sha256()
+        for module in PARSER_MODULES:
+            with open(module.__file__, 'rb') as source:
+                digest.update(source.read())
+        _parser_version = digest.hexdigest()[:12]
+    return _parser_version
+
+
+def read_file_bytes(source) -> bytes:
+    """Bytes de un archivo subido (UploadedFile), ruta o archivo abierto"""
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        with open(source, 'rb') as handle:
+            return handle.read()
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ParseCache:
+    """
+    Caché LRU de DataFrames parseados, limitada por cantidad de entradas y
+    por memoria. Segura para uso concurrente entre sesiones de Streamlit.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        """Entrada cacheada (con copias de los DataFrames) o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Copias: el análisis modifica los DataFrames del procesador
+        return {name: value.copy() if isinstance(value, pd.DataFrame) else value
+                for name, value in entry.items()}
+
+    def put(self, key: Tuple, entry: Dict):
+        size = sum(int(value.memory_usage(deep=True).sum())
+                   for value in entry.values() if isinstance(value, pd.DataFrame))
+        if size > self.max_bytes:
+            log_event(logger, logging.INFO, "cache_entrada_muy_grande", bytes=size)
+            return
+
+        entry = {name: value.copy() if isinstance(value, pd.DataFrame) else value
+                 for name, value in entry.items()}
+        with self._lock:
+            self._entries[key] = entry
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                evicted, _ = self._entries.popitem(last=False)
+                del self._sizes[evicted]
+                log_event(logger, logging.DEBUG, "cache_desalojo", tipo=evicted[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+    def _key(self, kind: str, data: bytes) -> Tuple:
+        return (kind, file_digest(data), parser_version())
+
+    def restore(self, processor: ERPDataProcessor, kind: str, data: bytes) -> bool:
+        """Si el archivo está en caché, restaura sus resultados en el procesador sin parsear"""
+        start = time.perf_counter()
+        entry = self.get(self._key(kind, data))
+        if entry is None:
+            return False
+        for field, value in entry.items():
+            setattr(processor, field, value)
+        processor.reader_backends[kind] = 'cache'
+        processor.parse_seconds[kind] = time.perf_counter() - start
+        log_event(logger, logging.INFO, "cache_acierto", tipo=kind, productos=len(entry[PROCESSOR_FIELDS[kind][0]]))
+        return True
+
+    def store(self, processor: ERPDataProcessor, kind: str, data: bytes):
+        """Guarda los resultados de kind que el procesador acaba de parsear"""
+        self.put(self._key(kind, data), {field: getattr(processor, field) for field in PROCESSOR_FIELDS[kind]})
+
+    def _process(self, processor: ERPDataProcessor, kind: str, source) -> Tuple[pd.DataFrame, bool]:
+        data = read_file_bytes(source)
+        if self.restore(processor, kind, data):
+            return getattr(processor, PROCESSOR_FIELDS[kind][0]), True
+
+        result = getattr(processor, f"process_{kind}")(io.BytesIO(data))
+        self.store(processor, kind, data)
+        return result, False
+
+    def process_curva_abc(self, processor: ERPDataProcessor, source) -> Tuple[pd.DataFrame, bool]:
+        """
+        process_curva_abc con caché: en un acierto restaura el DataFrame y el
+        período de análisis en el procesador sin parsear.
+        Retorna (curva_abc_data, acierto)
+        """
+        return self._process(processor, 'curva_abc', source)
+
+    def process_stock(self, processor: ERPDataProcessor, source) -> Tuple[pd.DataFrame, bool]:
+        """process_stock con caché. Retorna (stock_data, acierto)"""
+        return self._process(processor, 'stock', source)
@@ -0,0 +1,111 @@
+"""
+Esquema compacto de dtypes para los DataFrames del análisis.
+
+    category  etiquetas repetidas (unidad, curva, servicio, familia,
+              estado, fechas). Las categorías son los valores presentes
+    float32   cantidades, solo si todos los valores de la columna se
+              representan sin pérdida en float32; si no, queda en float64
+    text      strings deduplicados: códigos y descripciones repetidos
+              (ej: un producto en varios servicios) comparten un objeto
+
+Cuidados con las columnas category:
+    - fillna con un valor nuevo falla: usar fill_labels
+    - en subconjuntos filtrados quedan categorías sin usar: agrupar con
+      observed=True y descartar los ceros de value_counts
+    - map() puede devolver otra category: convertir antes con astype(object)
+"""
+import sys
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+CATEGORY = 'category'
+FLOAT32 = 'float32'
+TEXT = 'text'
+
+CURVA_ABC_SCHEMA = {
+    'codigo': TEXT,
+    'descripcion': TEXT,
+    'unidad': CATEGORY,
+    'consumo': FLOAT32,
+    'curva': CATEGORY,
+    'servicio': CATEGORY,
+    'fecha_inicio': CATEGORY,
+    'fecha_fin': CATEGORY,
+}
+
+STOCK_SCHEMA = {
+    'codigo': TEXT,
+    'descripcion': TEXT,
+    'unidad': CATEGORY,
+    'stock': FLOAT32,
+    'precio': FLOAT32,
+    'total': FLOAT32,
+    'familia': CATEGORY,
+}
+
+ANALYSIS_SCHEMA = {
+    'codigo': TEXT,
+    'descripcion': TEXT,
+    'unidad': CATEGORY,
+    'consumo': FLOAT32,
+    'curva': CATEGORY,
+    'servicio': CATEGORY,
+    'consumo_diario': FLOAT32,
+    'stock': FLOAT32,
+    'familia': CATEGORY,
+    'dias_cobertura': FLOAT32,
+    'estado_stock': CATEGORY,
+    'fecha_quiebre': CATEGORY,
+}
+
+
+def _interned(series: pd.Series) -> pd.Series:
+    """Mismos valores, con un solo objeto str por valor distinto"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    shared = np.array([sys.intern(value) if isinstance(value, str) else value
+                       for value in uniques] + [np.nan], dtype=object)
+    return pd.Series(shared[codes], index=series.index, dtype=object)
+
+
+def _float32_if_lossless(series: pd.Series) -> pd.Series:
+    if series.dtype.kind != 'f' or series.dtype == np.float32:
+        return series
+    values = series.to_numpy()
+    compact = values.astype(np.float32)
+    if not np.array_equal(compact.astype(values.dtype), values, equal_nan=True):
+        return series
+    return pd.Series(compact, index=series.index)
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, str]) -> pd.DataFrame:
+    """Copia de df con los dtypes compactos del esquema (columnas ausentes se ignoran)"""
+    df = df.copy()
+    for column, kind in schema.items():
+        if column not in df.columns:
+            continue
+        if kind == CATEGORY:
+            df[column] = df[column].astype('category').cat.remove_unused_categories()
+        elif kind == FLOAT32:
+            df[column] = _float32_if_lossless(df[column])
+        elif kind == TEXT and df[column].dtype == object:
+            df[column] = _interned(df[column])
+    return df
+
+
+def fill_labels(series: pd.Series, value) -> pd.Series:
+    """fillna que también funciona en columnas category sin ese valor"""
+    if not series.isna().any():
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def widen_floats(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia de df con las columnas float32 en float64 (para agregar y exportar)"""
+    float32_columns = [column for column, dtype in df.dtypes.items() if dtype == np.float32]
+    if not float32_columns:
+        return df
+    return df.astype({column: np.float64 for column in float32_columns})
@@ -0,0 +1,175 @@
+"""
+Snapshots Parquet de los datos parseados y del análisis de cobertura.
+
+Cada análisis se guarda por sitio y período en <raíz>/<sitio>/<inicio>_<fin>/:
+    curva_abc.parquet   curva_abc_data del procesador
+    stock.parquet       stock_data
+    analisis.parquet    resultado de calculate_coverage_analysis
+    meta.json           período, días, huellas de los archivos y fecha
+
+Parquet conserva los dtypes del esquema compacto (category, float32), así
+que reabrir un análisis es una lectura mapeada en memoria sin volver a
+parsear los Excel. meta.json se escribe al final: un snapshot sin meta.json
+está incompleto y se ignora.
+"""
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from data_processor import ERPDataProcessor
+from pipeline_log import get_logger, log_event
+
+logger = get_logger('snapshot_store')
+
+SNAPSHOT_DIR = os.environ.get(
+    'STOCK_SNAPSHOT_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'snapshots')
+)
+DEFAULT_SITE = os.environ.get('STOCK_SITE', 'principal')
+COMPRESSION = 'zstd'
+
+# Archivo Parquet -> atributo del procesador
+FRAMES = {
+    'curva_abc': 'curva_abc_data',
+    'stock': 'stock_data',
+    'analisis': 'consolidated_data',
+}
+META_FIELDS = ['analysis_period_start', 'analysis_period_end', 'analysis_days', 'source_digests']
+META_FILE = 'meta.json'
+
+# Columnas del listado de snapshots
+LIST_COLUMNS = ['sitio', 'inicio', 'fin', 'dias', 'productos', 'creado', 'ruta']
+
+
+def slugify(text: str) -> str:
+    """Nombre de carpeta seguro: letras, dígitos, '.', '-' y '_', nunca '.' ni '..'"""
+    slug = re.sub(r'[^\w.-]+', '_', str(text)).strip('_')
+    return slug if slug.strip('.') else 'sitio'
+
+
+def _period_key(date_text: str) -> str:
+    """'01/09/2025' -> '2025-09-01' (ordenable); otros formatos se normalizan como slug"""
+    try:
+        return datetime.strptime(date_text, "%d/%m/%Y").strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return slugify(date_text)
+
+
+class SnapshotStore:
+    """Snapshots por sitio y período en un directorio local"""
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+
+    def path(self, site: str, start: str, end: str) -> str:
+        return os.path.join(self.root, slugify(site), f"{_period_key(start)}_{_period_key(end)}")
+
+    def save(self, site: str, processor: ERPDataProcessor) -> str:
+        """
+        Guarda los DataFrames disponibles del procesador (reemplaza un
+        snapshot anterior del mismo sitio y período). Retorna la ruta
+        """
+        start = time.perf_counter()
+        directory = self.path(site, processor.analysis_period_start, processor.analysis_period_end)
+        os.makedirs(directory, exist_ok=True)
+
+        # Se invalida el snapshot anterior antes de reemplazar sus archivos
+        meta_path = os.path.join(directory, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        rows = {}
+        for name, field in FRAMES.items():
+            df = getattr(processor, field)
+            target = os.path.join(directory, f"{name}.parquet")
+            if df is None:
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            df.to_parquet(target + '.tmp', engine='pyarrow', compression=COMPRESSION, index=False)
+            os.replace(target + '.tmp', target)
+            rows[name] = len(df)
+
+        meta = {field: getattr(processor, field, None) for field in META_FIELDS}
+        meta.update({'sitio': site, 'filas': rows, 'creado': datetime.now().isoformat(timespec='seconds')})
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as handle:
+            # Escalares numpy (ej: días del período) como números de Python
+            json.dump(meta, handle, ensure_ascii=False, indent=2,
+                      default=lambda value: value.item() if hasattr(value, 'item') else str(value))
+        os.replace(meta_path + '.tmp', meta_path)
+
+        log_event(logger, logging.INFO, "snapshot_guardado", sitio=site, ruta=directory,
+                  segundos=round(time.perf_counter() - start, 3), **rows)
+        return directory
+
+    def load(self, site: str, start: str, end: str) -> ERPDataProcessor:
+        """Procesador con los DataFrames y el período del snapshot"""
+        return self.load_path(self.path(site, start, end))
+
+    def load_path(self, directory: str) -> ERPDataProcessor:
+        start = time.perf_counter()
+        meta_path = os.path.join(directory, META_FILE)
+        if not os.path.exists(meta_path):
+            raise Exception(f"No existe el snapshot: {directory}")
+        with open(meta_path, encoding='utf-8') as handle:
+            meta = json.load(handle)
+
+        processor = ERPDataProcessor()
+        for field in META_FIELDS:
+            if meta.get(field) is not None:
+                setattr(processor, field, meta[field])
+        for name, field in FRAMES.items():
+            if name in meta['filas']:
+                setattr(processor, field, pd.read_parquet(
+                    os.path.join(directory, f"{name}.parquet"), engine='pyarrow', memory_map=True
+                ))
+                if name != 'analisis':
+                    processor.reader_backends[name] = 'snapshot'
+
+        log_event(logger, logging.INFO, "snapshot_cargado", sitio=meta.get('sitio'), ruta=directory,
+                  segundos=round(time.perf_counter() - start, 3))
+        return processor
+
+    def list_snapshots(self, site: Optional[str] = None) -> pd.DataFrame:
+        """Snapshots completos, del más reciente al más antiguo por período"""
+        rows = []
+        sites = [slugify(site)] if site is not None else (
+            sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []
+        )
+        for site_dir in sites:
+            site_path = os.path.join(self.root, site_dir)
+            if not os.path.isdir(site_path):
+                continue
+            for period in os.listdir(site_path):
+                meta_path = os.path.join(site_path, period, META_FILE)
+                if not os.path.exists(meta_path):
+                    continue
+                with open(meta_path, encoding='utf-8') as handle:
+                    meta = json.load(handle)
+                filas = meta.get('filas', {})
+                rows.append({
+                    'sitio': meta.get('sitio', site_dir),
+                    'inicio': meta.get('analysis_period_start'),
+                    'fin': meta.get('analysis_period_end'),
+                    'dias': meta.get('analysis_days'),
+                    'productos': filas.get('analisis', filas.get('stock')),
+                    'creado': meta.get('creado'),
+                    'ruta': os.path.join(site_path, period),
+                    '_orden': period,
+                })
+
+        snapshots = pd.DataFrame(rows, columns=LIST_COLUMNS + ['_orden'])
+        return (snapshots.sort_values(['_orden', 'sitio'], ascending=False)
+                .drop(columns='_orden').reset_index(drop=True))
+
+    def latest(self, site: str) -> Optional[ERPDataProcessor]:
+        """Snapshot del período más reciente del sitio (None si no hay)"""
+        snapshots = self.list_snapshots(site)
+        if snapshots.empty:
+            return None
+        return self.load_path(snapshots['ruta'].iloc[0])
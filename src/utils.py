@@ -1,45 +1,115 @@
 import pandas as pd
+import numpy as np
 import streamlit as st
 from io import BytesIO
+import itertools
 import xlsxwriter
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 import base64
 
+import schema
+from analyzer import StockAnalyzer, rollup
+
+# Desde este tamaño el reporte se escribe en modo constant_memory
+CONSTANT_MEMORY_ROWS = 50_000
+TABLE_CHUNK_ROWS = 10_000
+# Pasos que informa el progreso: las 6 hojas y el guardado del archivo
+REPORT_STEPS = 7
+
+
+def _cell_values(column: pd.Series) -> list:
+    """
+    Valores de Python para escribir una columna: vacíos como None (celda en
+    blanco) e infinitos como texto, igual que to_excel
+    """
+    values = column.astype(object).where(column.notna(), None)
+    if pd.api.types.is_float_dtype(column):
+        values[np.isposinf(column)] = 'inf'
+        values[np.isneginf(column)] = '-inf'
+    return values.tolist()
+
+
 class ExcelExporter:
     """Clase para exportar reportes a Excel con formato profesional"""
     
-    def __init__(self):
+    def __init__(self, constant_memory: Optional[bool] = None):
+        """
+        constant_memory: escribe cada hoja fila por fila a disco (memoria
+        constante). None lo activa desde CONSTANT_MEMORY_ROWS productos
+        """
         self.workbook = None
         self.formats = {}
+        self.constant_memory = constant_memory
+        self.progress = None
+        self._step = 0
+        self._label = ''
+    
+    def _advance(self, label: str):
+        """Inicio de un paso del reporte"""
+        self._step += 1
+        self._label = label
+        self._notify()
     
-    def create_professional_report(self, data: pd.DataFrame, analysis_data: Dict, processor=None) -> BytesIO:
-        """Crea reporte profesional en Excel"""
+    def _notify(self):
+        # El callback puede lanzar una excepción para cancelar el reporte
+        if self.progress is not None:
+            self.progress(self._step, REPORT_STEPS, self._label)
+    
+    def create_professional_report(self, data: pd.DataFrame, analysis_data: Dict, processor=None,
+                                   progress: Optional[Callable[[int, int, str], None]] = None,
+                                   analyzer: Optional[StockAnalyzer] = None) -> BytesIO:
+        """
+        Crea reporte profesional en Excel. progress(paso, total, nombre) se
+        llama al iniciar cada hoja y entre bloques de filas; analyzer es el
+        analizador de esos datos, del que salen los críticos y el cubo de
+        agregados (se crea si no se entrega)
+        """
+        if analyzer is None:
+            analyzer = StockAnalyzer(data)
+        self.progress = progress
+        self._step = 0
         output = BytesIO()
+        # Agregados y celdas en float64 (sin ruido de float32 en el Excel)
+        data = schema.widen_floats(data)
+        
+        constant_memory = self.constant_memory
+        if constant_memory is None:
+            constant_memory = len(data) >= CONSTANT_MEMORY_ROWS
+        # En constant_memory las filas de cada hoja se escriben en orden creciente
+        options = {'constant_memory': constant_memory}
         
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs={'options': options}) as writer:
             self.workbook = writer.book
             self._create_formats()
             
             # Hoja 1: Resumen Ejecutivo
+            self._advance('Resumen Ejecutivo')
             self._create_executive_summary(writer, analysis_data)
             
             # Hoja 2: Productos Críticos
-            critical_products = data[data['estado_stock'] == 'CRÍTICO']
+            self._advance('Productos Críticos')
+            critical_products = schema.widen_floats(analyzer.get_critical_products())
             self._create_critical_products_sheet(writer, critical_products)
             
             # Hoja 3: Análisis Completo
+            self._advance('Análisis Completo')
             self._create_complete_analysis_sheet(writer, data)
             
             # Hoja 4: Reporte de Reposición
+            self._advance('Reporte Reposición')
             replenishment = self._generate_replenishment_data(data)
             self._create_replenishment_sheet(writer, replenishment)
             
             # Hoja 5: Métricas por Curva
-            self._create_curva_metrics_sheet(writer, data)
+            self._advance('Métricas por Curva')
+            self._create_curva_metrics_sheet(writer, analyzer.get_cube())
             
             # Hoja 6: Análisis de Stock Actual
+            self._advance('Stock Actual Completo')
             self._create_stock_analysis_sheet(writer, data, processor)
+            
+            self._advance('Guardando archivo')
         
         output.seek(0)
         return output
@@ -76,6 +146,32 @@ class ExcelExporter:
             'border': self.workbook.add_format({'border': 1})
         }
     
+    def _write_table(self, ws, df: pd.DataFrame, startrow: int, row_formats=None, cell_format=None,
+                     column_formats: Optional[Dict[int, object]] = None):
+        """
+        Encabezados en startrow y una fila por registro debajo, cada celda
+        escrita una vez. row_formats da el formato de cada fila (por defecto
+        cell_format para todas); column_formats, el de cada celda de las
+        columnas indicadas ({posición: formatos por fila})
+        """
+        ws.write_row(startrow, 0, [str(column) for column in df.columns], self.formats['header'])
+        row_formats = itertools.repeat(cell_format) if row_formats is None else iter(row_formats)
+        special = {col: iter(formats) for col, formats in sorted((column_formats or {}).items())}
+        # Por bloques: solo TABLE_CHUNK_ROWS filas convertidas a objetos de Python a la vez
+        for start in range(0, len(df), TABLE_CHUNK_ROWS):
+            if start:
+                self._notify()
+            chunk = df.iloc[start:start + TABLE_CHUNK_ROWS]
+            columns = [_cell_values(chunk[column]) for column in chunk.columns]
+            for row_num, (values, row_format) in enumerate(zip(zip(*columns), row_formats),
+                                                           startrow + 1 + start):
+                col = 0
+                for special_col, formats in special.items():
+                    ws.write_row(row_num, col, values[col:special_col], row_format)
+                    ws.write(row_num, special_col, values[special_col], next(formats))
+                    col = special_col + 1
+                ws.write_row(row_num, col, values[col:], row_format)
+    
     def _create_executive_summary(self, writer, analysis_data):
         """Crea hoja de resumen ejecutivo"""
         ws = writer.book.add_worksheet('Resumen Ejecutivo')
@@ -84,8 +180,9 @@ class ExcelExporter:
         ws.merge_range('A1:F1', 'ANÁLISIS DE STOCK CRÍTICO - RESUMEN EJECUTIVO', self.formats['title'])
         ws.merge_range('A2:F2', f'Generado el: {datetime.now().strftime("%d/%m/%Y %H:%M")} | Desarrollado por Adeodato Cornejo', self.formats['border'])
         
-        # KPIs principales
+        # KPIs principales y distribución por Curva ABC, fila por fila
         ws.write('A4', 'INDICADORES CLAVE', self.formats['header'])
+        ws.write('D4', 'DISTRIBUCIÓN POR CURVA ABC', self.formats['header'])
         
         kpis = [
             ('Total de Productos Analizados', analysis_data.get('total_productos', 0)),
@@ -94,22 +191,19 @@ class ExcelExporter:
             ('% Productos Críticos', analysis_data.get('porcentaje_critico', '0%')),
             ('Valor Total Inventario', analysis_data.get('valor_inventario', '$0'))
         ]
-        
-        for i, (metric, value) in enumerate(kpis, 5):
-            ws.write(f'A{i}', metric, self.formats['border'])
-            ws.write(f'B{i}', value, self.formats['border'])
-        
-        # Distribución por Curva ABC
-        ws.write('D4', 'DISTRIBUCIÓN POR CURVA ABC', self.formats['header'])
         curva_data = [
             ('Curva A (Críticos)', analysis_data.get('productos_curva_a', 0)),
             ('Curva B (Importantes)', analysis_data.get('productos_curva_b', 0)),
             ('Curva C (Normales)', analysis_data.get('productos_curva_c', 0))
         ]
         
-        for i, (curva, count) in enumerate(curva_data, 5):
-            ws.write(f'D{i}', curva, self.formats['border'])
-            ws.write(f'E{i}', count, self.formats['border'])
+        for i, (metric, value) in enumerate(kpis, 5):
+            ws.write(f'A{i}', metric, self.formats['border'])
+            ws.write(f'B{i}', value, self.formats['border'])
+            if i - 5 < len(curva_data):
+                curva, count = curva_data[i - 5]
+                ws.write(f'D{i}', curva, self.formats['border'])
+                ws.write(f'E{i}', count, self.formats['border'])
         
         # Ajustar anchos de columna
         ws.set_column('A:A', 25)
@@ -124,24 +218,16 @@ class ExcelExporter:
             ws.write('A1', 'No hay productos en estado crítico', self.formats['title'])
             return
         
-        critical_products.to_excel(
-            writer, sheet_name='Productos Críticos', index=False, startrow=1
-        )
-        
-        ws = writer.sheets['Productos Críticos']
+        ws = writer.book.add_worksheet('Productos Críticos')
         
         # Título
         ws.merge_range('A1:H1', 'PRODUCTOS EN ESTADO CRÍTICO', self.formats['title'])
         
-        # Formatear headers
-        for col_num, value in enumerate(critical_products.columns.values):
-            ws.write(1, col_num, value, self.formats['header'])
-        
-        # Formatear datos con colores según criticidad
-        for row_num in range(len(critical_products)):
-            for col_num in range(len(critical_products.columns)):
-                cell_format = self.formats['critical'] if row_num < 5 else self.formats['warning']
-                ws.write(row_num + 2, col_num, critical_products.iloc[row_num, col_num], cell_format)
+        # Colores según criticidad: los 5 primeros en rojo, el resto en amarillo
+        row_formats = itertools.chain(
+            itertools.repeat(self.formats['critical'], 5), itertools.repeat(self.formats['warning'])
+        )
+        self._write_table(ws, critical_products, 1, row_formats)
         
         # Ajustar anchos
         ws.set_column('A:A', 10)  # Código
@@ -150,74 +236,53 @@ class ExcelExporter:
     
     def _create_complete_analysis_sheet(self, writer, data):
         """Crea hoja de análisis completo"""
-        data.to_excel(writer, sheet_name='Análisis Completo', index=False, startrow=1)
-        
-        ws = writer.sheets['Análisis Completo']
+        ws = writer.book.add_worksheet('Análisis Completo')
         ws.merge_range('A1:J1', 'ANÁLISIS COMPLETO DE INVENTARIO', self.formats['title'])
         
-        # Headers
-        for col_num, value in enumerate(data.columns.values):
-            ws.write(1, col_num, value, self.formats['header'])
-        
-        # Formatear según estado
-        for row_num in range(len(data)):
-            status = data.iloc[row_num]['estado_stock']
-            format_map = {
-                'CRÍTICO': self.formats['critical'],
-                'BAJO': self.formats['warning'],
-                'NORMAL': self.formats['normal'],
-                'ALTO': self.formats['border']
-            }
-            row_format = format_map.get(status, self.formats['border'])
-            
-            for col_num in range(len(data.columns)):
-                ws.write(row_num + 2, col_num, data.iloc[row_num, col_num], row_format)
+        # Formato de cada fila según estado
+        format_map = {
+            'CRÍTICO': self.formats['critical'],
+            'BAJO': self.formats['warning'],
+            'NORMAL': self.formats['normal'],
+            'ALTO': self.formats['border']
+        }
+        row_formats = data['estado_stock'].astype(object).map(format_map).fillna(self.formats['border'])
+        self._write_table(ws, data, 1, row_formats)
     
     def _create_replenishment_sheet(self, writer, replenishment_data):
         """Crea hoja de reporte de reposición"""
-        replenishment_data.to_excel(
-            writer, sheet_name='Reporte Reposición', index=False, startrow=1
-        )
-        
-        ws = writer.sheets['Reporte Reposición']
+        ws = writer.book.add_worksheet('Reporte Reposición')
         ws.merge_range('A1:H1', 'REPORTE DE REPOSICIÓN SUGERIDA', self.formats['title'])
         
-        # Headers y formato
-        for col_num, value in enumerate(replenishment_data.columns.values):
-            ws.write(1, col_num, value, self.formats['header'])
-        
-        # Formatear según prioridad
-        for row_num in range(len(replenishment_data)):
-            priority = replenishment_data.iloc[row_num]['Prioridad']
-            row_format = self.formats['critical'] if priority == 1 else self.formats['warning']
-            
-            for col_num in range(len(replenishment_data.columns)):
-                ws.write(row_num + 2, col_num, replenishment_data.iloc[row_num, col_num], row_format)
+        # Formato según prioridad
+        if 'Prioridad' in replenishment_data.columns:
+            row_formats = np.where(replenishment_data['Prioridad'] == 1,
+                                   self.formats['critical'], self.formats['warning'])
+        else:
+            row_formats = None
+        self._write_table(ws, replenishment_data, 1, row_formats)
     
-    def _create_curva_metrics_sheet(self, writer, data):
+    def _create_curva_metrics_sheet(self, writer, cube):
         """Crea hoja de métricas por curva"""
         ws = writer.book.add_worksheet('Métricas por Curva')
         
         ws.merge_range('A1:F1', 'MÉTRICAS POR CURVA ABC', self.formats['title'])
         
-        # Calcular métricas por curva
-        curva_stats = data.groupby('curva').agg({
-            'codigo': 'count',
-            'stock': ['sum', 'mean'],
-            'consumo_diario': ['sum', 'mean'],
-            'dias_cobertura': ['mean', 'min', 'max']
-        }).round(2)
-        
-        # Aplanar columnas multi-nivel
-        curva_stats.columns = ['_'.join(col).strip() for col in curva_stats.columns.values]
-        curva_stats = curva_stats.reset_index()
+        # Métricas por curva desde el cubo de agregados
+        by_curva = rollup(cube, ['curva'])
+        curva_stats = pd.DataFrame({
+            'codigo_count': by_curva['productos'],
+            'stock_sum': by_curva['stock'],
+            'stock_mean': by_curva['stock_promedio'],
+            'consumo_diario_sum': by_curva['consumo_diario'],
+            'consumo_diario_mean': by_curva['consumo_promedio'],
+            'dias_cobertura_mean': by_curva['cobertura_promedio'],
+            'dias_cobertura_min': by_curva['cobertura_min'],
+            'dias_cobertura_max': by_curva['cobertura_max'],
+        }).round(2).reset_index()
         
         # Escribir datos
-        curva_stats.to_excel(writer, sheet_name='Métricas por Curva', index=False, startrow=2)
-        
-        # Formatear
-        for col_num, value in enumerate(curva_stats.columns.values):
-            ws.write(2, col_num, value, self.formats['header'])
+        self._write_table(ws, curva_stats, 2)
     
     def _create_stock_analysis_sheet(self, writer, data, processor=None):
         """Crea hoja de análisis de stock actual COMPLETO con explicaciones"""
@@ -238,65 +303,41 @@ class ExcelExporter:
         ws.write('A7', '3. Estado = Crítico si cobertura < umbral por Curva ABC', self.formats['border'])
         ws.write('A8', '4. SIN CONSUMO = Productos no consumidos en el período analizado', self.formats['border'])
         
-        # Obtener TODOS los productos de stock (no solo los que tienen consumo)
-        # Aquí necesitamos acceder al stock_data original del procesador
-        # Por ahora, trabajamos con los datos disponibles y agregamos info
-        
-        stock_analysis = []
-        
-        # Primero, agregar productos que SÍ tienen consumo
-        for _, row in data.iterrows():
-            codigo = row['codigo']
-            descripcion = row['descripcion']
-            stock_actual = row['stock']
-            consumo_diario = row['consumo_diario']
-            dias_cobertura = row['dias_cobertura']
-            estado_cobertura = row['estado_stock']
-            curva = row['curva']
-            
-            if consumo_diario > 0:
-                observacion = f"Período: {period_start}-{period_end} ({period_days} días). Consumo: {consumo_diario:.2f}/día"
-            else:
-                observacion = f"Producto en inventario pero NO consumido en período {period_start}-{period_end}"
-            
-            stock_analysis.append([
-                codigo,
-                descripcion,
-                stock_actual,
-                consumo_diario,
-                dias_cobertura,
-                estado_cobertura,
-                curva,
-                observacion
-            ])
-        
-        # Headers actualizados
-        headers = ['Código', 'Descripción', 'Stock Actual', 'Consumo Diario', 'Días Cobertura', 'Estado', 'Curva ABC', 'Observaciones']
-        
-        for col_num, header in enumerate(headers):
-            ws.write(10, col_num, header, self.formats['header'])  # Fila 10 para dejar espacio a explicaciones
-        
-        # Datos (empezar en fila 11)
-        for row_num, row_data in enumerate(stock_analysis, 11):
-            for col_num, value in enumerate(row_data):
-                # Formatear según el estado
-                if col_num == 5:  # Columna de estado
-                    if value == 'CRÍTICO':
-                        cell_format = self.formats['critical']
-                    elif value == 'BAJO':
-                        cell_format = self.formats['warning']
-                    elif 'NO CONSUMIDO' in str(value):
-                        # Crear formato especial para sin consumo
-                        no_consumption_format = self.workbook.add_format({
-                            'bg_color': '#F0F8FF', 'font_color': '#4169E1', 'border': 1, 'italic': True
-                        })
-                        cell_format = no_consumption_format
-                    else:
-                        cell_format = self.formats['normal']
-                else:
-                    cell_format = self.formats['border']
-                
-                ws.write(row_num, col_num, value, cell_format)
+        # Observación por producto: plantillas con y sin consumo
+        consumo = data['consumo_diario'].to_numpy(dtype=float)
+        with_consumption = f"Período: {period_start}-{period_end} ({period_days} días). Consumo: "
+        without_consumption = f"Producto en inventario pero NO consumido en período {period_start}-{period_end}"
+        observaciones = np.where(
+            consumo > 0,
+            np.char.add(np.char.add(with_consumption, np.char.mod('%.2f', consumo)), '/día'),
+            without_consumption
+        )
+        
+        stock_analysis = pd.DataFrame({
+            'Código': data['codigo'],
+            'Descripción': data['descripcion'],
+            'Stock Actual': data['stock'],
+            'Consumo Diario': data['consumo_diario'],
+            'Días Cobertura': data['dias_cobertura'],
+            'Estado': data['estado_stock'],
+            'Curva ABC': data['curva'],
+            'Observaciones': observaciones,
+        })
+        
+        # Formato de la columna de estado
+        estado = data['estado_stock'].astype(str)
+        no_consumption_format = self.workbook.add_format({
+            'bg_color': '#F0F8FF', 'font_color': '#4169E1', 'border': 1, 'italic': True
+        })
+        status_formats = np.select(
+            [estado == 'CRÍTICO', estado == 'BAJO', estado.str.contains('NO CONSUMIDO', regex=False)],
+            [self.formats['critical'], self.formats['warning'], no_consumption_format],
+            self.formats['normal']
+        )
+        
+        # Fila 10 para dejar espacio a explicaciones; datos desde la fila 11
+        self._write_table(ws, stock_analysis, 10, cell_format=self.formats['border'],
+                          column_formats={5: status_formats})
         
         # Ajustar anchos de columna
         ws.set_column('A:A', 10)  # Código
@@ -312,9 +353,9 @@ class ExcelExporter:
         
         # Calcular estadísticas
         total_productos = len(stock_analysis)
-        productos_con_consumo = len([x for x in stock_analysis if x[3] != 0 and x[3] != "N/A"])
+        productos_con_consumo = int((data['consumo_diario'] != 0).sum())
         productos_sin_consumo = total_productos - productos_con_consumo
-        productos_criticos = len([x for x in stock_analysis if x[5] == 'CRÍTICO'])
+        productos_criticos = int((estado == 'CRÍTICO').sum())
         
         ws.merge_range(f'A{summary_row}:H{summary_row}', 'RESUMEN EJECUTIVO', self.formats['title'])
         
@@ -358,7 +399,7 @@ class ExcelExporter:
         )
         
         # Prioridad
-        needs_replenishment['prioridad'] = needs_replenishment['estado_stock'].map({
+        needs_replenishment['prioridad'] = needs_replenishment['estado_stock'].astype(object).map({
             'CRÍTICO': 1, 'BAJO': 2
         })
         
@@ -442,41 +483,43 @@ class AlertManager:
     """Gestiona alertas y notificaciones del sistema"""
     
     @staticmethod
-    def check_critical_alerts(data: pd.DataFrame) -> List[Dict]:
-        """Verifica alertas críticas en el inventario"""
+    def check_critical_alerts(data: pd.DataFrame, analyzer: Optional[StockAnalyzer] = None) -> List[Dict]:
+        """
+        Verifica alertas críticas en el inventario. Con el analizador de esos
+        datos los conteos por estado y curva salen de su índice de partición
+        """
         alerts = []
+        if analyzer is None:
+            analyzer = StockAnalyzer(data)
         
         # Productos sin stock
-        no_stock = data[data['stock'] <= 0]
-        if len(no_stock) > 0:
+        no_stock = int((data['stock'] <= 0).sum())
+        if no_stock > 0:
             alerts.append({
                 'type': 'error',
                 'title': 'Productos sin Stock',
-                'message': f'{len(no_stock)} productos están sin stock',
-                'count': len(no_stock)
+                'message': f'{no_stock} productos están sin stock',
+                'count': no_stock
             })
         
         # Productos críticos
-        critical = data[data['estado_stock'] == 'CRÍTICO']
-        if len(critical) > 0:
+        critical = analyzer.count(estado_stock='CRÍTICO')
+        if critical > 0:
             alerts.append({
                 'type': 'warning',
                 'title': 'Stock Crítico',
-                'message': f'{len(critical)} productos en estado crítico',
-                'count': len(critical)
+                'message': f'{critical} productos en estado crítico',
+                'count': critical
             })
         
         # Productos Curva A con problemas
-        curva_a_problems = data[
-            (data['curva'] == 'A') & 
-            (data['estado_stock'].isin(['CRÍTICO', 'BAJO']))
-        ]
-        if len(curva_a_problems) > 0:
+        curva_a_problems = analyzer.count(curva='A', estado_stock=['CRÍTICO', 'BAJO'])
+        if curva_a_problems > 0:
             alerts.append({
                 'type': 'warning',
                 'title': 'Productos Críticos Curva A',
-                'message': f'{len(curva_a_problems)} productos de alta importancia con problemas de stock',
-                'count': len(curva_a_problems)
+                'message': f'{curva_a_problems} productos de alta importancia con problemas de stock',
+                'count': curva_a_problems
             })
         
         return alerts
@@ -0,0 +1,74 @@
+"""
+Pruebas de las vistas memoizadas de StockAnalyzer, que comparten todas las
+sesiones de Streamlit (get_analyzer).
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from analyzer import StockAnalyzer
+
+
+def make_analysis(n_products: int = 500, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'codigo': np.arange(1, n_products + 1).astype(str),
+        'descripcion': [f"PRODUCTO {i}" for i in range(n_products)],
+        'curva': rng.choice(['A', 'B', 'C'], n_products),
+        'estado_stock': rng.choice(['CRÍTICO', 'BAJO', 'NORMAL', 'ALTO'], n_products),
+        'servicio': rng.choice(['Almuerzo', 'Cena'], n_products),
+        'familia': rng.choice(['LACTEOS', 'PAN'], n_products),
+        'stock': rng.uniform(0, 100, n_products),
+        'consumo_diario': rng.choice([0.0, 1.0, 2.5], n_products),
+        'dias_cobertura': rng.uniform(0, 60, n_products),
+    })
+
+
+def test_figures_and_frames_are_private_copies():
+    analyzer = StockAnalyzer(make_analysis())
+
+    fig = analyzer.create_critical_products_chart()
+    fig.update_layout(title="modificado")
+    assert analyzer.create_critical_products_chart().layout.title.text == "Top 15 Productos Más Críticos"
+
+    cube = analyzer.get_cube()
+    cube['productos'] = 0
+    assert analyzer.get_cube()['productos'].sum() == 500
+    rollup = analyzer.rollup(['curva'])
+    rollup.drop(columns='productos', inplace=True)
+    assert 'productos' in analyzer.rollup(['curva']).columns
+
+
+def test_shared_views_are_read_only():
+    analyzer = StockAnalyzer(make_analysis())
+
+    with pytest.raises(TypeError):
+        analyzer.get_summary_metrics()['productos_criticos'] = 0
+    with pytest.raises(ValueError):
+        analyzer.rows(estado_stock='CRÍTICO')[0] = -1
+    with pytest.raises(ValueError):
+        analyzer.product_rows(['dias_cobertura'])[0] = -1
+
+
+def test_concurrent_sessions_see_one_view():
+    analyzer = StockAnalyzer(make_analysis(20_000))
+
+    def session(_):
+        return (analyzer.get_summary_metrics(), analyzer.sorted_positions(['dias_cobertura']),
+                analyzer.count(curva='A', estado_stock=['CRÍTICO', 'BAJO']))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(session, range(32)))
+
+    metrics, order, count = results[0]
+    for other_metrics, other_order, other_count in results[1:]:
+        assert other_metrics is metrics and other_order is order and other_count == count
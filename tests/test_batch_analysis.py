@@ -0,0 +1,58 @@
+"""
+Pruebas del manifiesto y las carpetas de salida del análisis por lotes.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'benchmarks'))
+
+from synthetic import make_curva_abc_sheet, make_stock_sheet
+from batch_analysis import SitePair, analyze_site, read_manifest
+from snapshot_store import slugify
+
+
+def write_manifest(directory, sites):
+    path = os.path.join(directory, 'sitios.csv')
+    with open(path, 'w', encoding='utf-8') as handle:
+        handle.write('sitio,curva_abc,stock\n')
+        for site in sites:
+            handle.write(f'{site},abc.xlsx,stock.xlsx\n')
+    return path
+
+
+@pytest.mark.parametrize('site', ['..', '.', '../x', '/tmp/x', 'a/../../b', ''])
+def test_slug_stays_inside_output(site):
+    slug = slugify(site)
+    assert os.sep not in slug and slug not in ('.', '..')
+
+
+def test_site_output_stays_inside_output_dir(tmp_path):
+    make_curva_abc_sheet(50).to_excel(tmp_path / 'abc.xlsx', header=False, index=False)
+    make_stock_sheet(50).to_excel(tmp_path / 'stock.xlsx', header=False, index=False)
+    output_dir = tmp_path / 'salida'
+    pair = SitePair('../fuera', str(tmp_path / 'abc.xlsx'), str(tmp_path / 'stock.xlsx'))
+    summary = analyze_site(pair, str(output_dir))
+
+    assert summary['estado'] == 'ok'
+    assert not (tmp_path / 'fuera').exists()
+    assert os.listdir(output_dir) == [slugify('../fuera')]
+    assert 'analisis.csv' in os.listdir(output_dir / slugify('../fuera'))
+
+
+def test_manifest_rejects_repeated_sites(tmp_path):
+    with pytest.raises(ValueError, match='repetidos'):
+        read_manifest(write_manifest(tmp_path, ['Casino Norte', 'Sur', 'Casino Norte']))
+    # Nombres distintos con la misma carpeta también se pisarían
+    with pytest.raises(ValueError, match='repetidos'):
+        read_manifest(write_manifest(tmp_path, ['Casino Norte', 'Casino_Norte']))
+
+
+def test_manifest_keeps_distinct_sites(tmp_path):
+    pairs = read_manifest(write_manifest(tmp_path, ['Norte', 'Sur']))
+    assert [pair.site for pair in pairs] == ['Norte', 'Sur']
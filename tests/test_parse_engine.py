@@ -0,0 +1,67 @@
+"""
+Pruebas de la decodificación numérica de celdas del ERP (decode_numbers).
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_processor import ERPDataProcessor
+from parse_engine import decode_numbers
+
+
+def decode(texts, comma_as_decimal=True):
+    return decode_numbers(np.array(texts, dtype=object), comma_as_decimal)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1 234', 1234.0),
+    ('1 234,5', 1234.5),
+    ('1\u00a0234', 1234.0),
+    ('1\u00a0234,56', 1234.56),
+    ('12\u202f345.6', 12345.6),
+    ('-1 234 567', -1234567.0),
+    (' 1\u00a0234,5\u00a0', 1234.5),
+    ('1.234,56', 1234.56),
+    ('1,234.56', 1234.56),
+    ('1,5', 1.5),
+])
+def test_thousands_separators(text, expected):
+    values, parsed = decode([text])
+    assert parsed[0] and values[0] == expected
+
+
+@pytest.mark.parametrize('text', ['1 23', '1234 567', '1 234.567,5', '1  234', '12 abc'])
+def test_malformed_groups_are_not_numbers(text):
+    values, parsed = decode([text])
+    assert not parsed[0] and np.isnan(values[0])
+
+
+def test_without_comma_as_decimal_matches_float():
+    values, parsed = decode(['1 234', '1\u00a0234', '1.5'], comma_as_decimal=False)
+    assert parsed.tolist() == [False, False, True]
+    assert values[2] == 1.5
+
+
+def test_curva_abc_keeps_space_grouped_consumption():
+    df = pd.DataFrame([
+        [101, 'LECHE ENTERA', '1\u00a0234,5'],
+        [102, 'PAN MOLDE', '2 000'],
+    ])
+    result = ERPDataProcessor()._parse_curva_abc_frame(df)
+    assert result['consumo'].tolist() == [1234.5, 2000.0]
+
+
+def test_stock_keeps_space_grouped_amounts():
+    df = pd.DataFrame([
+        [101, 'LECHE ENTERA', 'KG', '1 234,5', 1000.0, '1 234 500'],
+    ])
+    result = ERPDataProcessor()._parse_stock_frame(df)
+    assert result[['stock', 'precio', 'total']].values.tolist() == [[1234.5, 1000.0, 1234500.0]]
@@ -0,0 +1,72 @@
+"""
+Pruebas de ReportJobManager: sesiones que se unen a un mismo reporte,
+lo abandonan o lo cancelan.
+
+Uso:
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from report_jobs import ReportJobManager, CANCELLED, DONE
+
+
+def blocking_build(release: threading.Event):
+    """Reporte que avisa progreso hasta que se libera (o se cancela)"""
+    def build(job):
+        while not release.wait(0.01):
+            job.report(1, 2, 'hoja')
+        return b'reporte'
+    return build
+
+
+def wait(job):
+    for _ in range(500):
+        if job.finished:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"el trabajo {job.id} no terminó")
+
+
+def test_cancel_with_other_session_only_detaches():
+    jobs = ReportJobManager()
+    release = threading.Event()
+    job = jobs.submit('huella', blocking_build(release), 'a')
+    assert jobs.submit('huella', blocking_build(release), 'b') is job
+
+    assert not jobs.cancel(job.id, 'a')
+    assert not job.cancel_requested
+    release.set()
+    wait(job)
+    assert job.status == DONE
+
+
+def test_join_abandon_cancel_stops_the_job():
+    jobs = ReportJobManager()
+    release = threading.Event()
+    job = jobs.submit('huella', blocking_build(release), 'a')
+    jobs.submit('huella', blocking_build(release), 'b')
+
+    # b reemplaza su reporte (nuevo análisis): ya no lo sigue
+    jobs.release(job.id, 'b')
+    assert jobs.cancel(job.id, 'a')
+    wait(job)
+    assert job.status == CANCELLED
+
+
+def test_closed_session_does_not_keep_the_job():
+    open_sessions = {'a', 'b'}
+    jobs = ReportJobManager(session_alive=open_sessions.__contains__)
+    release = threading.Event()
+    job = jobs.submit('huella', blocking_build(release), 'a')
+    jobs.submit('huella', blocking_build(release), 'b')
+
+    # b cierra la pestaña sin liberar el reporte
+    open_sessions.discard('b')
+    assert jobs.cancel(job.id, 'a')
+    wait(job)
+    assert job.status == CANCELLED